@@ -1,11 +1,21 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
+import time
+import threading
+from collections import OrderedDict
+from db import tracing
+from db.catalog import catalog
+from logic.backlog import backlog_cache
+from logic.deniers import denier_key, denier_sort_key
+from logic.jobs import schedule_jobs
+from logic.paging import paginate, DEFAULT_PAGE_LIMIT
+from web import health, http_cache, metrics
+from web.http_cache import matching_etag
 import json
+import hashlib
 import traceback
-import re
-import sys
-from db.queries import DBQueries
+from db.queries import get_db, MACHINE_CONFIG_COLUMNS, REWINDER_CONFIG_COLUMNS
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "ciplas_master_cord_secret")
@@ -14,27 +24,52 @@ app.secret_key = os.environ.get("SECRET_KEY", "ciplas_master_cord_secret")
 def is_authenticated():
     return session.get('authenticated', False)
 
-def infer_denier_from_description(descripcion):
-    """Infer denier value from product description when denier column is null.
-    E.g. 'CABUYA ECO 12x1K VERDE' -> '12000', 'CABUYA CLA 9X1' -> '9000'
-    """
-    if not descripcion:
-        return None
-    match = re.search(r'(\d+)\s*[xX]\s*1', descripcion)
-    if match:
-        multiplier = int(match.group(1))
-        return str(multiplier * 1000)
-    return None
+# Metrics first so request timings include the compression done by http_cache
+metrics.init_app(app, token=os.environ.get("METRICS_TOKEN"), is_authenticated=is_authenticated)
+metrics.cache_sources['catalog'] = catalog.counts
+http_cache.init_app(app)
+# Liveness/readiness for load balancers; readiness serves a background DB probe
+_probe_db = None
+
+def _ping_db():
+    """One tiny query per probe, on a client reused across probes"""
+    global _probe_db
+    if _probe_db is None:
+        _probe_db = get_db()
+    _probe_db.ping()
+
+health.init_app(app, probe_fn=_ping_db)
+
+# Generated plans keyed by ETag (input version + request parameters + day);
+# written from request threads and job workers
+PLAN_CACHE_SIZE = 32
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+# Progress stream (seconds between job polls / between keep-alive comments)
+SSE_INTERVAL = 0.25
+SSE_HEARTBEAT = 15
+
+
+@app.before_request
+def start_db_trace():
+    tracing.start_request()
+
+@app.after_request
+def finish_db_trace(response):
+    tracing.finish_response(request.endpoint or request.path, response)
+    return response
 
 @app.before_request
 def check_auth():
-    if request.endpoint and 'static' not in request.endpoint and request.endpoint != 'login' and not is_authenticated():
+    # /metrics checks its own credentials (session or bearer token for scrapers); health probes are public
+    if request.endpoint and request.endpoint not in http_cache.ASSET_ENDPOINTS and request.endpoint not in ('login', 'metrics') and request.endpoint not in health.HEALTH_ENDPOINTS and not is_authenticated():
         return redirect(url_for('login'))
 
 @app.route('/')
 def dashboard():
-    from db.queries import DBQueries
-    db = DBQueries()
+    from db.queries import get_db
+    db = get_db()
     return render_template('dashboard.html', active_page='dashboard', title='Dashboard')
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -66,99 +101,27 @@ def toggle_theme():
 
 @app.route('/backlog')
 def backlog():
-    from db.queries import DBQueries
-    db = DBQueries()
+    from db.queries import get_db
+    db = get_db()
     orders = db.get_orders()
-    deniers = db.get_deniers()
+    deniers = list(catalog.deniers(db).values())
     
-    # Ensure critical deniers exist in DB
-    existing_names = {d['name'] for d in deniers}
+    # Ensure critical deniers exist in DB (under any capitalization)
+    existing_names = set(catalog.deniers(db))
     if "6000 expo" not in existing_names or "12000 expo" not in existing_names:
         try:
             for crit in ["6000 expo", "12000 expo"]:
                 if crit not in existing_names:
                     db.create_denier(crit, 37.0)
-            deniers = db.get_deniers()
+            deniers = list(catalog.deniers(db).values())
         except:
             pass
-    def denier_sort_key(d):
-        name = d.get('name', '0')
-        numeric_part = name.split(' ')[0]
-        try:
-            return (float(numeric_part), name)
-        except ValueError:
-            return (0.0, name)
-            
-    deniers.sort(key=denier_sort_key)
-    
-    pending_requirements = db.get_pending_requirements()
-    inventarios_cabuyas = db.get_inventarios_cabuyas()
-    rewinder_configs = db.get_rewinder_denier_configs()
+    deniers.sort(key=lambda d: denier_sort_key(d.get('name', '0')))
     
-    # Calculate Kg/h for each denier in rewinder config
-    kgh_map = {}
-    for cfg in rewinder_configs:
-        tm_min = cfg.get('tm_minutos', 0)
-        if tm_min > 0:
-            kgh_map[str(cfg['denier'])] = (60 / tm_min) * 0.8
-        else:
-            kgh_map[str(cfg['denier'])] = 0
+    # Same materialized backlog the scheduler plans from (rows load through /api/backlog)
+    backlog_list = backlog_cache.entries(db)
 
-    # Build cabuya lookup for manual orders
-    cabuya_lookup = {c['codigo']: c for c in inventarios_cabuyas}
-    
-    # Process "Automatic" requirements
-    backlog_list = []
-    for req in pending_requirements:
-        kg_req = abs(req['requerimientos'] or 0)
-        # Determine denier name
-        d_val = req.get('denier')
-        if d_val is not None:
-            d_name = str(int(d_val)) if isinstance(d_val, (int, float)) else str(d_val)
-        else:
-            d_name = infer_denier_from_description(req.get('descripcion'))
-        
-        # Calculate h_proceso
-        kgh = kgh_map.get(d_name, 0)
-        h_proceso = kg_req / kgh if kgh > 0 else 0
-        
-        backlog_list.append({
-            'codigo': req['codigo'],
-            'descripcion': req['descripcion'],
-            'requerimientos': kg_req,
-            'prioridad': req.get('prioridad', False),
-            'origen': 'Automatico',
-            'h_proceso': h_proceso
-        })
-    
-    # Process "Manual" requirements from orders
-    for o in orders:
-        if o.get('cabuya_codigo'):
-            kg_pending = o['total_kg']
-            codigo = o['cabuya_codigo']
-            
-            # Lookup denier from cabuya info
-            cabuya_info = cabuya_lookup.get(codigo, {})
-            d_val = cabuya_info.get('denier')
-            if d_val is not None:
-                d_name = str(int(d_val)) if isinstance(d_val, (int, float)) else str(d_val)
-            else:
-                d_name = infer_denier_from_description(cabuya_info.get('descripcion'))
-            
-            # Calculate h_proceso
-            kgh = kgh_map.get(d_name, 0)
-            h_proceso = kg_pending / kgh if kgh > 0 else 0
-
-            backlog_list.append({
-                'codigo': codigo,
-                'descripcion': '(Pedido Manual)',
-                'requerimientos': kg_pending,
-                'prioridad': True,
-                'origen': 'Manual',
-                'h_proceso': h_proceso
-            })
-
-    total_pending_kg = sum(req['requerimientos'] for req in backlog_list)
+    total_pending_kg = sum(req['kg'] for req in backlog_list)
     total_h_proceso = sum(req['h_proceso'] for req in backlog_list)
     
     return render_template('backlog.html', 
@@ -166,39 +129,62 @@ def backlog():
                          title='Backlog', 
                          orders=orders, 
                          deniers=deniers, 
-                         backlog_list=backlog_list,
-                         inventarios_cabuyas=inventarios_cabuyas,
+                         backlog_count=len(backlog_list),
                          total_pending_kg=total_pending_kg,
                          total_h_proceso=total_h_proceso)
 
+def _page_args(sort_fields, default_sort):
+    """offset/limit/q/sort/desc from the query string of a list endpoint"""
+    sort = request.args.get('sort', default_sort)
+    return {
+        'q': request.args.get('q', ''),
+        'sort': sort if sort in sort_fields else default_sort,
+        'desc': request.args.get('desc', '0') in ('1', 'true'),
+        'offset': request.args.get('offset', 0, type=int),
+        'limit': request.args.get('limit', DEFAULT_PAGE_LIMIT, type=int),
+    }
+
+@app.route('/api/backlog', methods=['GET'])
+def api_backlog():
+    """Page of the materialized backlog: ?q=<prefix>&sort=kg&desc=1&offset=0&limit=50&origen=Manual"""
+    rows = backlog_cache.entries(get_db())
+    origen = request.args.get('origen')
+    if origen:
+        rows = [r for r in rows if r['origen'] == origen]
+    args = _page_args({'codigo', 'descripcion', 'denier', 'kg', 'h_proceso', 'prioridad', 'origen'}, None)
+    return jsonify(paginate(rows, **args))
+
+@app.route('/api/cabuyas', methods=['GET'])
+def api_cabuyas():
+    """Page of the cabuya catalog: ?q=<prefix>&sort=codigo&desc=0&offset=0&limit=50&pending=1"""
+    rows = catalog.inventory(get_db())
+    if request.args.get('pending') in ('1', 'true'):
+        rows = [r for r in rows if (r.get('requerimientos') or 0) < 0]
+    args = _page_args({'codigo', 'descripcion', 'denier', 'existencia', 'inventario_seguridad', 'requerimientos', 'grupo', 'estado', 'color'}, 'codigo')
+    return jsonify(paginate(rows, **args))
+
 @app.route('/backlog/add', methods=['POST'])
 def add_backlog():
-    db = DBQueries()
+    db = get_db()
     kg = request.form.get('kg', type=float)
     cabuya_codigo = request.form.get('cabuya_codigo')
     
     if cabuya_codigo and kg:
-        cabuyas = db.get_inventarios_cabuyas()
-        product = next((c for c in cabuyas if c['codigo'] == cabuya_codigo), None)
+        product = catalog.cabuya(db, cabuya_codigo)
         
         if product:
-            denier_val = product.get('denier')
-            if denier_val:
-                # Handle alphanumeric deniers like "12000 EXPO"
-                if isinstance(denier_val, (int, float)):
-                    denier_name = str(int(denier_val))
-                else:
-                    denier_name = str(denier_val)
-            else:
-                denier_name = infer_denier_from_description(product.get('descripcion'))
+            # Handles numeric, alphanumeric ("12000 EXPO") and description-only deniers
+            denier_name = denier_key(product.get('denier'), product.get('descripcion'))
             
             if denier_name:
-                deniers = db.get_deniers()
-                denier_obj = next((d for d in deniers if d['name'] == denier_name), None)
+                denier_obj = catalog.denier(db, denier_name)
                 
                 if denier_obj:
                     req_date = datetime.now().strftime('%Y-%m-%d')
-                    db.create_order(denier_obj['id'], kg, req_date, cabuya_codigo)
+                    base_version = db.get_input_version()
+                    result = db.create_order(denier_obj['id'], kg, req_date, cabuya_codigo)
+                    if result.data:
+                        backlog_cache.refresh_order(db, result.data[0]['id'], base_version)
                     flash(f"Pedido manual de {kg}kg para {cabuya_codigo} registrado", "success")
                 else:
                     flash(f"Error: No se encontró el Denier '{denier_name}' para el producto", "error")
@@ -211,7 +197,7 @@ def add_backlog():
 
 @app.route('/backlog/edit', methods=['POST'])
 def edit_backlog():
-    db = DBQueries()
+    db = get_db()
     order_id = request.form.get('order_id')
     denier_id = request.form.get('denier_id')
     kg = request.form.get('kg', type=float)
@@ -219,156 +205,279 @@ def edit_backlog():
     cabuya_codigo = request.form.get('cabuya_codigo')
     
     if order_id and denier_id and kg and req_date:
+        base_version = db.get_input_version()
         db.update_order(order_id, denier_id, kg, req_date, cabuya_codigo)
+        backlog_cache.refresh_order(db, order_id, base_version)
         flash(f"Pedido #{order_id[:6]} actualizado", "success")
     return redirect(url_for('backlog'))
 
 @app.route('/backlog/delete/<order_id>', methods=['POST'])
 def delete_backlog(order_id):
-    db = DBQueries()
+    db = get_db()
+    base_version = db.get_input_version()
     db.delete_order(order_id)
+    backlog_cache.refresh_order(db, order_id, base_version)
     flash("Pedido eliminado", "success")
     return redirect(url_for('backlog'))
 
 @app.route('/programming')
 def programming():
-    db = DBQueries()
+    db = get_db()
     sc_data = db.get_all_scheduling_data()
     return render_template('programming.html', active_page='programming', title='Programación', sc_data=sc_data)
 
-@app.route('/api/generate_schedule', methods=['POST'])
-def api_generate_schedule():
-    from db.queries import DBQueries
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+def _sse_response(events):
+    """text/event-stream response, unbuffered by proxies"""
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _schedule_etag(input_version, params):
+    """ETag of a generated plan: input version + request parameters + day
+    (plans start "today", so the date is part of the key)"""
+    if not input_version:
+        return None
+    key_src = json.dumps([input_version, str(datetime.now().date()), params], sort_keys=True)
+    return hashlib.sha256(key_src.encode('utf-8')).hexdigest()[:32]
+
+def _cached_plan(etag):
+    """Cached plan for etag (marked recently used) or None"""
+    if not etag:
+        return None
+    with _plan_cache_lock:
+        plan = _plan_cache.get(etag)
+        if plan is not None:
+            _plan_cache.move_to_end(etag)
+        return plan
+
+def _cache_plan(etag, result):
+    if etag:
+        with _plan_cache_lock:
+            _plan_cache[etag] = result
+            _plan_cache.move_to_end(etag)
+            while len(_plan_cache) > PLAN_CACHE_SIZE:
+                _plan_cache.popitem(last=False)
+
+def _build_schedule(db, params, input_version, job=None):
+    """Fetch the scheduling inputs and run the planner (request thread or job worker)"""
     from integrations.openai_ia import generate_production_schedule
-    
-    data = request.json or {}
-    strategy = data.get('strategy', 'kg')
-    
-    db = DBQueries()
-    sc_data = db.get_all_scheduling_data()
-    pending_requirements = db.get_pending_requirements()
-    
-    # ============================================================
-    # BUILD BACKLOG SUMMARY DIRECTLY FROM PENDING REQUIREMENTS
-    # This is the ONLY source of truth (matches exactly what backlog.html shows)
-    # ============================================================
-    backlog_summary = {}
-    
-    # The pending_requirements come directly from inventarios_cabuyas where requerimientos < 0
-    # Each record has: codigo, descripcion, denier (float or null), requerimientos (negative), prioridad
-    for req in pending_requirements:
-        codigo = req['codigo']
-        kg_req = abs(req['requerimientos'] or 0)
-        if kg_req <= 0.1:
-            continue
-        
-        # Get denier name for this product
-        # Column 'denier' is a float (e.g. 2000.0, 18000.0) or null
-        denier_val = req.get('denier')
-        if denier_val is not None:
-            # Handle alphanumeric deniers like "12000 EXPO"
-            if isinstance(denier_val, (int, float)):
-                d_name = str(int(denier_val))
-            else:
-                d_name = str(denier_val)
-        else:
-            # Try to infer denier from description (e.g. '12x1K' -> '12000')
-            d_name = infer_denier_from_description(req.get('descripcion'))
-        
-        if not d_name:
-            # Skip products where we can't determine the denier
-            continue
-        
-        # Calculate h_proceso (hours on 1 post) for this reference
-        rw_cap = sc_data['rewinder_capacities'].get(d_name, {})
-        rw_rate = rw_cap.get('kg_per_hour', 0)
-        h_proceso = kg_req / rw_rate if rw_rate > 0 else 0
-        
-        backlog_summary[codigo] = {
-            'description': req.get('descripcion', ''),
-            'kg_total': kg_req,
-            'is_priority': req.get('prioridad', False),
-            'denier': d_name,
-            'h_proceso': h_proceso
-        }
-    
-    # Also add manual orders (if any have cabuya_codigo set)
-    for o in sc_data['orders']:
-        codigo = o.get('cabuya_codigo')
-        if not codigo:
-            continue
-        
-        kg_pending = (o['total_kg'] - (o.get('produced_kg') or 0))
-        if kg_pending <= 0.1:
-            continue
-        
-        d_name = o.get('deniers', {}).get('name') if o.get('deniers') else None
-        if not d_name:
-            continue
-        
-        if codigo in backlog_summary:
-            # Don't double count - automatic requirement already covers this
-            pass
-        else:
-            rw_cap = sc_data['rewinder_capacities'].get(d_name, {})
-            rw_rate = rw_cap.get('kg_per_hour', 0)
-            h_proceso = kg_pending / rw_rate if rw_rate > 0 else 0
-            
-            backlog_summary[codigo] = {
-                'description': '(Pedido Manual)',
-                'kg_total': kg_pending,
-                'is_priority': True,
-                'denier': d_name,
-                'h_proceso': h_proceso
-            }
 
-    torsion_overrides = data.get('torsion_overrides', {})
-    rewinder_overrides = data.get('rewinder_overrides', {})
+    if job:
+        job.update(stage='datos')
+    sc_data = db.get_all_scheduling_data(input_version)
+    # Same materialized backlog /backlog shows (automatic rows win over manual orders)
+    backlog_summary = backlog_cache.summary(db, input_version)
 
+    if job:
+        job.update(stage='simulacion')
+    start = time.perf_counter()
     result = generate_production_schedule(
         orders=sc_data['orders'],
         rewinder_capacities=sc_data['rewinder_capacities'],
         shifts=sc_data['shifts'],
         torsion_capacities=sc_data['torsion_capacities'],
         backlog_summary=backlog_summary,
-        strategy=strategy,
-        torsion_overrides=torsion_overrides,
-        rewinder_overrides=rewinder_overrides
+        strategy=params.get('strategy', 'kg'),
+        torsion_overrides=params.get('torsion_overrides', {}),
+        rewinder_overrides=params.get('rewinder_overrides', {}),
+        progress_callback=(lambda p: job.update(**p)) if job else None,
+        cancel_event=job.cancel_event if job else None
     )
+    metrics.record_schedule(time.perf_counter() - start, len(backlog_summary), result)
+    return result
+
+@app.route('/api/generate_schedule', methods=['POST'])
+def api_generate_schedule():
+    data = request.json or {}
+    run_async = bool(data.pop('async', False))
     
-    return jsonify(result)
+    db = get_db()
+    input_version = db.get_input_version()
+    etag = _schedule_etag(input_version, data)
+    if etag:
+        matched = matching_etag(etag)
+        cached = None if matched else _cached_plan(etag)
+        if matched or cached is not None:
+            metrics.record_cache('plan', hit=True)
+        if matched:
+            response = app.response_class(status=304)
+            response.set_etag(matched)
+            return response
+        if cached is not None:
+            response = jsonify(cached)
+            response.set_etag(etag)
+            return response
+
+    metrics.record_cache('plan', hit=False)
+    if run_async:
+        # Identical pending requests (same inputs and parameters) share one job. Without an
+        # input version the key does not pin the data, so a finished job is never reused.
+        key = etag or hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+        def run(job):
+            result = _build_schedule(get_db(), data, input_version, job)
+            _cache_plan(etag, result)
+            job.update(stage='listo', etag=etag)
+            return result
+
+        job = schedule_jobs.submit(key, run, reuse_finished=etag is not None)
+        return jsonify({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": url_for('api_schedule_job', job_id=job.id),
+            "events_url": url_for('api_schedule_job_events', job_id=job.id),
+            "cancel_url": url_for('api_cancel_schedule_job', job_id=job.id)
+        }), 202
+
+    result = _build_schedule(db, data, input_version)
+    _cache_plan(etag, result)
+    response = jsonify(result)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+@app.route('/api/schedule_jobs/<job_id>', methods=['GET'])
+def api_schedule_job(job_id):
+    job = schedule_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/schedule_jobs/<job_id>/events', methods=['GET'])
+def api_schedule_job_events(job_id):
+    """Server-Sent Events: 'progress' while the planner runs, then one 'done' event
+    with the final job state (including the plan)"""
+    job = schedule_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+
+    def stream():
+        last_progress = None
+        last_sent = time.monotonic()
+        while not job.finished:
+            progress = job.progress
+            if progress is not last_progress:
+                last_progress = progress
+                last_sent = time.monotonic()
+                yield _sse('progress', {"status": job.status, **progress})
+            elif time.monotonic() - last_sent > SSE_HEARTBEAT:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(SSE_INTERVAL)
+        yield _sse('done', job.to_dict())
+
+    return _sse_response(stream())
+
+@app.route('/api/schedule_jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_schedule_job(job_id):
+    # Shared jobs keep running while other requests are still waiting on them
+    job = schedule_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    return jsonify({**job.to_dict(include_result=False), "cancelled": job.cancelled})
+
+def _chat_parts(client, db, input_version, question, stream):
+    """{'text': ...} and {'tool': name, 'arguments': {...}} items of one consultant answer"""
+    from integrations import ai_chat, ai_tools
+    from integrations.ai_context import ai_context
+    if ai_chat.AI_CHAT_MODE == 'tools':
+        # The model asks for exactly the backlog/capacity data it needs through local functions
+        toolbox = ai_tools.Toolbox(db, input_version)
+        yield from ai_tools.chat_with_tools(client, ai_tools.build_messages(question), toolbox, stream=stream)
+        return
+    # Aggregated backlog digest (token-budgeted, cached per input version) in the prompt
+    messages = ai_chat.build_messages(question, ai_context.digest(db, input_version))
+    if not stream:
+        yield {"text": ai_chat.complete(client, messages)}
+        return
+    deltas = ai_chat.stream_completion(client, messages)
+    try:
+        for text in deltas:
+            yield {"text": text}
+    finally:
+        deltas.close()
 
 @app.route('/api/ai_chat', methods=['POST'])
 def api_ai_chat():
-    data = request.json
-    user_message = data.get('message')
-    from db.queries import DBQueries
-    db = DBQueries()
-    orders = db.get_orders()
-    
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
+    from integrations import ai_chat
+    from integrations.ai_cache import ai_response_cache
+    data = request.json or {}
+    user_message = (data.get('message') or '').strip()
+    if not user_message:
+        return jsonify({"error": "Mensaje vacío"}), 400
+    db = get_db()
+    input_version = db.get_input_version()
+    stream = bool(data.get('stream'))
+
+    # Same (or near-identical) question on an unchanged backlog: no OpenAI round trip
+    cached = ai_response_cache.get(user_message, input_version)
+    if input_version:
+        metrics.record_cache('ai_chat', cached is not None)
+    if cached:
+        answer, match = cached
+        if not stream:
+            return jsonify({"response": answer, "cached": match})
+        return _sse_response(iter([_sse('delta', {"text": answer}), _sse('done', {"response": answer, "cached": match})]))
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": f"Eres el asistente inteligente de la planta Ciplas. Tienes acceso al backlog actual: {orders}. Responde de forma profesional y técnica."},
-                {"role": "user", "content": user_message}
-            ]
-        )
-        return jsonify({"response": response.choices[0].message.content})
+        client = ai_chat.get_openai_client()
+        parts = _chat_parts(client, db, input_version, user_message, stream)
+        if not stream:
+            parts = list(parts)
     except Exception as e:
         return jsonify({"error": str(e)})
 
+    if not stream:
+        answer = "".join(p['text'] for p in parts if 'text' in p)
+        ai_response_cache.put(user_message, input_version, answer)
+        return jsonify({"response": answer, "tools": [p for p in parts if 'tool' in p]})
+
+    def events():
+        """'tool' events for each local function call, 'delta' events with each text
+        chunk, then 'done' with the full answer (or 'error')"""
+        texts = []
+        try:
+            for part in parts:
+                if 'tool' in part:
+                    yield _sse('tool', part)
+                    continue
+                texts.append(part['text'])
+                yield _sse('delta', {"text": part['text']})
+            answer = "".join(texts)
+            # Only complete answers are cached (not ones cut short by a disconnect)
+            ai_response_cache.put(user_message, input_version, answer)
+            yield _sse('done', {"response": answer})
+        except Exception as e:
+            yield _sse('error', {"error": str(e)})
+        finally:
+            # Runs on client disconnect too: stops the upstream completion
+            parts.close()
+
+    return _sse_response(events())
+
+@app.route('/api/ai_cache/stats', methods=['GET'])
+def api_ai_cache_stats():
+    from integrations.ai_cache import ai_response_cache
+    return jsonify(ai_response_cache.stats())
+
 @app.route('/api/ai_scenario', methods=['POST'])
 def api_ai_scenario():
-    from db.queries import DBQueries
     from integrations.openai_ia import get_ai_optimization_scenario
-    db = DBQueries()
-    orders = db.get_orders()
-    reports = [] 
-    scenario = get_ai_optimization_scenario(orders, reports)
+    db = get_db()
+    input_version = db.get_input_version()
+    # Same inputs as the main scheduler: repeated clicks on an unchanged backlog reuse the plan
+    etag = _schedule_etag(input_version, {"scenario": "ai"})
+    scenario = _cached_plan(etag)
+    if etag:
+        metrics.record_cache('plan', scenario is not None)
+    if scenario is None:
+        scenario = get_ai_optimization_scenario(db, input_version)
+        if 'error' not in scenario:
+            _cache_plan(etag, scenario)
     return jsonify({"response": scenario})
 
 @app.route('/api/save_schedule', methods=['POST'])
@@ -376,34 +485,43 @@ def api_save_schedule():
     data = request.json
     name = data.get('name', 'Programación IA')
     plan = data.get('plan')
+    base_scenario_id = data.get('base_scenario_id')
     
     if not plan:
         return jsonify({"error": "No hay plan para guardar"}), 400
         
-    db = DBQueries()
+    db = get_db()
     try:
-        db.save_scheduling_scenario(name, plan)
+        db.save_scheduling_scenario(name, plan, base_scenario_id)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/config')
-def config():
-    from db.queries import DBQueries
-    db = DBQueries()
-    machines = db.get_machines_torsion()
-    deniers = db.get_deniers()
-    rewinder_configs = db.get_rewinder_denier_configs()
-    machine_denier_configs = db.get_machine_denier_configs()
-    inventarios_cabuyas = db.get_inventarios_cabuyas()
-    
-    machine_configs_mapped = {}
-    for c in machine_denier_configs:
-        m_id = c['machine_id']
-        if m_id not in machine_configs_mapped:
-            machine_configs_mapped[m_id] = {}
-        machine_configs_mapped[m_id][str(c['denier'])] = c
-    
+@app.route('/api/schedules', methods=['GET'])
+def api_list_schedules():
+    limit = request.args.get('limit', 10, type=int)
+    db = get_db()
+    return jsonify(db.list_saved_schedules(limit))
+
+@app.route('/api/schedules/<scenario_id>', methods=['GET'])
+def api_get_schedule(scenario_id):
+    db = get_db()
+    scenario = db.get_saved_schedule(scenario_id)
+    if not scenario:
+        return jsonify({"error": "Programación no encontrada"}), 404
+    return jsonify(scenario)
+
+@app.route('/debug/db_calls')
+def debug_db_calls():
+    """Routes with the most Supabase calls (or bytes / db_ms) per request"""
+    limit = request.args.get('limit', 10, type=int)
+    sort = request.args.get('sort', 'calls')
+    return jsonify(tracing.top_routes(limit, sort))
+
+CONFIG_TABS = ('torsion', 'rewinder', 'catalog', 'shifts', 'cabuyas')
+
+def _shift_calendar(db):
+    """Next 30 days with their configured working hours (24h when not set)"""
     today = datetime.now().date()
     start_date = today + timedelta(days=1)
     end_date = start_date + timedelta(days=29)
@@ -420,27 +538,67 @@ def config():
             'hours': shifts_dict.get(str(curr), 24)
         })
         curr += timedelta(days=1)
+    return calendar
+
+def _config_tab_data(db, tab):
+    """Template context of one /config tab (only the queries that tab needs)"""
+    if tab == 'torsion':
+        machine_configs_mapped = {}
+        for c in db.get_machine_denier_configs(MACHINE_CONFIG_COLUMNS):
+            machine_configs_mapped.setdefault(c['machine_id'], {})[str(c['denier'])] = c
+        return {
+            'machines': db.get_machines_torsion(),
+            'deniers': list(catalog.deniers(db).values()),
+            'machine_configs': machine_configs_mapped
+        }
+    if tab == 'rewinder':
+        rewinder_configs = db.get_rewinder_denier_configs(REWINDER_CONFIG_COLUMNS)
+        return {
+            'deniers': list(catalog.deniers(db).values()),
+            'rewinder_configs': {str(c['denier']): c for c in rewinder_configs}
+        }
+    if tab == 'catalog':
+        return {'deniers': db.get_deniers()}
+    if tab == 'shifts':
+        return {'calendar': _shift_calendar(db)}
+    # cabuyas: rows load through /api/cabuyas
+    return {}
 
+@app.route('/config')
+def config():
+    tab = request.args.get('tab', 'torsion')
+    if tab not in CONFIG_TABS:
+        tab = 'torsion'
+    context = _config_tab_data(get_db(), tab)
     return render_template('config.html', 
                          active_page='config', 
                          title='Configuración',
-                         machines=machines,
-                         deniers=deniers,
-                         machine_configs=machine_configs_mapped,
-                         rewinder_configs={str(c['denier']): c for c in rewinder_configs},
-                         calendar=calendar,
-                         inventarios_cabuyas=inventarios_cabuyas)
+                         tab=tab,
+                         **context)
+
+@app.route('/api/config/<tab>', methods=['GET'])
+def api_config_tab(tab):
+    """Data of one /config tab, plus its rendered markup with ?render=1"""
+    if tab not in CONFIG_TABS:
+        return jsonify({"error": f"Pestaña desconocida: {tab}"}), 404
+    if tab == 'cabuyas':
+        return jsonify({"tab": tab, "data": paginate(catalog.inventory(get_db()), **_page_args(set(), 'codigo'))})
+    context = _config_tab_data(get_db(), tab)
+    payload = {"tab": tab, "data": context}
+    if request.args.get('render') in ('1', 'true'):
+        payload["html"] = render_template(f'partials/config_{tab}.html', **context)
+    return jsonify(payload)
 
 @app.route('/config/torsion/update', methods=['POST'])
 def update_torsion():
-    db = DBQueries()
+    db = get_db()
     machine_id = request.form.get('machine_id')
     if not machine_id:
         flash("Error: No se especificó la máquina", "error")
         return redirect(url_for('config'))
     
-    deniers = db.get_deniers()
-    updated_count = 0
+    deniers = list(catalog.deniers(db).values())
+    rows = []
     for d in deniers:
         denier_name = d['name']
         denier_safe = denier_name.replace(' ', '_')
@@ -449,31 +607,37 @@ def update_torsion():
         husos = request.form.get(f"husos_{denier_safe}", type=int)
         
         if rpm is not None and torsiones is not None and husos is not None:
-            db.upsert_machine_denier_config(machine_id, denier_name, rpm, torsiones, husos)
-            updated_count += 1
+            rows.append({
+                "machine_id": machine_id,
+                "denier": denier_name,
+                "rpm": rpm,
+                "torsiones_metro": torsiones,
+                "husos": husos
+            })
     
+    updated_count = db.bulk_upsert_machine_denier_configs(rows)
     flash(f"✓ Configuración de {machine_id} actualizada ({updated_count} deniers)", "success")
     return redirect(url_for('config'))
 
 @app.route('/config/rewinder/update', methods=['POST'])
 def update_rewinder():
-    db = DBQueries()
-    deniers = db.get_deniers()
-    updated_count = 0
+    db = get_db()
+    deniers = list(catalog.deniers(db).values())
+    rows = []
     for d in deniers:
         denier_name = d['name']
         denier_safe = denier_name.replace(' ', '_')
         mp = request.form.get(f"mp_{denier_safe}", type=float)
         tm = request.form.get(f"tm_{denier_safe}", type=float)
         if mp is not None and tm is not None:
-            db.upsert_rewinder_denier_config(denier_name, mp, tm)
-            updated_count += 1
+            rows.append({"denier": denier_name, "mp_segundos": mp, "tm_minutos": tm})
+    updated_count = db.bulk_upsert_rewinder_denier_configs(rows)
     flash(f"✓ Configuración Rewinder actualizada ({updated_count} deniers)", "success")
     return redirect(url_for('config', tab='rewinder'))
 
 @app.route('/config/denier/add', methods=['POST'])
 def add_denier():
-    db = DBQueries()
+    db = get_db()
     name = request.form.get('name')
     cycle = request.form.get('cycle', type=float)
     if name and cycle:
@@ -483,43 +647,44 @@ def add_denier():
 
 @app.route('/config/shifts/update', methods=['POST'])
 def update_shifts():
-    db = DBQueries()
-    updated = 0
+    db = get_db()
+    rows = []
     for key, value in request.form.items():
         if key.startswith('shift_'):
             date_str = key.replace('shift_', '')
-            db.upsert_shift(date_str, int(value))
-            updated += 1
+            rows.append({"date": date_str, "working_hours": int(value)})
+    updated = db.bulk_upsert_shifts(rows)
     flash(f"✓ Calendario actualizado ({updated} días)", "success")
     return redirect(url_for('config', tab='shifts'))
 
 @app.route('/config/cabuyas/update', methods=['POST'])
 def update_cabuyas():
-    db = DBQueries()
-    updated_count = 0
+    db = get_db()
+    security_values = {}
     for key, value in request.form.items():
         if key.startswith('sec_'):
             codigo = key.replace('sec_', '')
             try:
-                security_val = float(value)
-                db.update_cabuya_inventory_security(codigo, security_val)
-                updated_count += 1
+                security_values[codigo] = float(value)
             except ValueError:
                 continue
+    updated_count = db.bulk_update_cabuya_inventory_security(security_values)
     if updated_count > 0:
         flash(f"✓ {updated_count} niveles de seguridad actualizados", "success")
     return redirect(url_for('config', tab='cabuyas'))
 
 @app.route('/config/cabuyas/priority', methods=['POST'])
 def update_cabuya_priority():
-    db = DBQueries()
+    db = get_db()
     data = request.json
     codigo = data.get('codigo')
     prioridad = data.get('prioridad')
     
     if codigo is not None:
         try:
+            base_version = db.get_input_version()
             db.update_cabuya_priority(codigo, bool(prioridad))
+            backlog_cache.refresh_requirement(db, codigo, base_version)
             return jsonify(success=True)
         except Exception as e:
             return jsonify(success=False, error=str(e)), 500
@@ -528,28 +693,6 @@ def update_cabuya_priority():
 
 
 # Health check
-@app.route('/health')
-def health():
-    diagnostics = {
-        "status": "online",
-        "python": sys.version,
-        "path": sys.path,
-        "environment": {
-            "SUPABASE_URL": "set" if os.environ.get("SUPABASE_URL") else "missing",
-            "SUPABASE_KEY": "set" if os.environ.get("SUPABASE_KEY") else "missing"
-        }
-    }
-    try:
-        from db.queries import DBQueries
-        db = DBQueries()
-        db.get_deniers()
-        diagnostics["database"] = "connected"
-    except Exception as e:
-        diagnostics["database_error"] = str(e)
-        diagnostics["traceback"] = traceback.format_exc().split('\n')
-    
-    return jsonify(diagnostics)
-
 @app.errorhandler(Exception)
 def handle_exception(e):
     if hasattr(e, 'code') and isinstance(e.code, int) and e.code < 500:
@@ -0,0 +1,131 @@
+"""
+Shared, cached lookup index for the catalog tables.
+
+    codigo      -> cabuya row        (inventarios_cabuyas)
+    inventory   -> cabuya rows with stock columns, ordered by codigo (config/list endpoints)
+    denier key  -> denier row        (deniers)
+    denier key  -> rewinder Kg/h     (rewinder_denier_config)
+
+Denier keys are logic.deniers.denier_key() of the name, so '12000 EXPO' finds the
+row stored as '12000 Expo'. Each part is loaded in full on first use by the routes
+that need all rows and is dropped after CATALOG_TTL seconds or when DBQueries
+writes to its table. Cabuya point lookups never force a full load: with a cold
+cache they query the single row (deniers is a small table and is always loaded whole).
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logic.deniers import denier_key
+
+CATALOG_TTL = float(os.environ.get("CATALOG_TTL", 300))
+
+CABUYAS = "cabuyas"
+INVENTORY = "inventory"
+DENIERS = "deniers"
+REWINDER = "rewinder"
+
+
+def rewinder_kgh(tm_minutos: float) -> float:
+    """Rewinder Kg/h per post at 80% productivity"""
+    return (60 / tm_minutos) * 0.8 if tm_minutos and tm_minutos > 0 else 0
+
+
+class CatalogIndex:
+    def __init__(self, ttl: float = CATALOG_TTL):
+        self.ttl = ttl
+        self._parts: Dict[str, tuple] = {}   # part -> (loaded_at, {key: value})
+        self._points: Dict[tuple, tuple] = {}  # (part, key) -> (loaded_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry: Optional[tuple]) -> bool:
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def invalidate(self, *parts: str) -> None:
+        """Drop the given parts (all when none given), e.g. after a write"""
+        with self._lock:
+            if not parts:
+                self._parts.clear()
+                self._points.clear()
+                return
+            for part in parts:
+                self._parts.pop(part, None)
+                for key in [k for k in self._points if k[0] == part]:
+                    del self._points[key]
+
+    def _full(self, part: str, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._parts.get(part)
+            if self._fresh(entry):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        data = loader()
+        with self._lock:
+            self._parts[part] = (time.monotonic(), data)
+        return data
+
+    def _point(self, part: str, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            full = self._parts.get(part)
+            point = self._points.get((part, key))
+            if self._fresh(full):
+                self.hits += 1
+                return full[1].get(key)
+            if self._fresh(point):
+                self.hits += 1
+                return point[1]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._points[(part, key)] = (time.monotonic(), value)
+        return value
+
+    # --- Full maps ---
+    def cabuyas(self, db) -> Dict[str, Dict[str, Any]]:
+        """codigo -> cabuya row (codigo, descripcion, denier), ordered by codigo"""
+        from .queries import CABUYA_LOOKUP_COLUMNS
+        return self._full(CABUYAS, lambda: {c['codigo']: c for c in db.iter_inventarios_cabuyas(CABUYA_LOOKUP_COLUMNS)})
+
+    def inventory(self, db) -> List[Dict[str, Any]]:
+        """All cabuya rows with the stock/config columns, ordered by codigo"""
+        from .queries import CABUYA_CONFIG_COLUMNS
+        return self._full(INVENTORY, lambda: list(db.iter_inventarios_cabuyas(CABUYA_CONFIG_COLUMNS)))
+
+    def deniers(self, db) -> Dict[str, Dict[str, Any]]:
+        """canonical denier key ('12000 expo' for a row named '12000 Expo') -> denier row (id, name)"""
+        from .queries import DENIER_COLUMNS
+        return self._full(DENIERS, lambda: {denier_key(d['name']): d for d in db.get_deniers(DENIER_COLUMNS)})
+
+    def rewinder_kgh(self, db) -> Dict[str, float]:
+        """denier name -> rewinder Kg/h"""
+        from .queries import REWINDER_CONFIG_COLUMNS
+        return self._full(REWINDER, lambda: {
+            denier_key(c['denier']): rewinder_kgh(c.get('tm_minutos', 0))
+            for c in db.get_rewinder_denier_configs(REWINDER_CONFIG_COLUMNS)
+        })
+
+    # --- Point lookups ---
+    def cabuya(self, db, codigo: str) -> Optional[Dict[str, Any]]:
+        return self._point(CABUYAS, codigo, lambda: db.get_cabuya_by_codigo(codigo))
+
+    def denier(self, db, name: str) -> Optional[Dict[str, Any]]:
+        """Denier row for any spelling of its name (the table is small: served from the full map)"""
+        return self.deniers(db).get(denier_key(name))
+
+    def counts(self) -> Tuple[int, int]:
+        """(hits, misses), read consistently (exported on /metrics)"""
+        with self._lock:
+            return self.hits, self.misses
+
+    def stats(self) -> Dict[str, Any]:
+        hits, misses = self.counts()
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 3) if total else 0.0}
+
+
+# Process-wide index shared by all routes
+catalog = CatalogIndex()
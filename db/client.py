@@ -1,15 +1,40 @@
 import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING
+
+# The supabase SDK (httpx, gotrue, postgrest, ...) is most of a cold start, so it
+# is imported on the first real client instead of when the app module loads
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Optional for local, mandatory for Vercel (provided via UI)
 if os.path.exists('.env'):
+    from dotenv import load_dotenv
     load_dotenv()
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-def get_supabase_client() -> Client:
+# SUPABASE_BACKEND=memory swaps in the in-process fake (see db/fake_client.py)
+SUPABASE_BACKEND = os.environ.get("SUPABASE_BACKEND", "supabase")
+_fake_client = None
+
+def get_supabase_client() -> "Client":
+    if SUPABASE_BACKEND == "memory":
+        return get_fake_client()
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("SUPABASE_URL or SUPABASE_KEY not set in environment")
+    from supabase import create_client
     return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def get_fake_client():
+    """Process-wide in-memory client, seeded from SUPABASE_FIXTURES (JSON) when set"""
+    global _fake_client
+    if _fake_client is None:
+        from .fake_client import FakeSupabaseClient
+        fixtures = os.environ.get("SUPABASE_FIXTURES")
+        latency = float(os.environ.get("SUPABASE_FAKE_LATENCY", 0))
+        if fixtures:
+            _fake_client = FakeSupabaseClient.from_json(fixtures, latency=latency)
+        else:
+            _fake_client = FakeSupabaseClient(latency=latency)
+    return _fake_client
@@ -0,0 +1,325 @@
+"""
+In-memory stand-in for the Supabase client, for hermetic tests and benchmarks.
+
+Implements the query-builder subset DBQueries uses:
+    table().select/insert/update/upsert/delete
+    eq/neq/lt/gt/gte/lte/in_/is_, order, limit, execute
+    rpc("scheduling_input_version")
+plus the pending_backlog view. Select it with SUPABASE_BACKEND=memory (optionally
+SUPABASE_FIXTURES=path/to/fixtures.json), or pass it to DBQueries(client=...).
+
+    client = FakeSupabaseClient({"deniers": [{"name": "6000"}]}, latency=0.02)
+    DBQueries(client=client).get_deniers()
+    client.calls   # Counter of (table, operation) -> round trips
+"""
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+_EMBED_RE = re.compile(r"(\w+)\(([^)]*)\)")
+
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _sort_key(value: Any):
+    # NULLs last, numbers before strings (mirrors Postgres ordering closely enough)
+    if value is None:
+        return (2, 0)
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value))
+
+
+def _resolve_denier(raw: Any, descripcion: Optional[str]) -> Optional[str]:
+    """Python twin of resolve_denier_name() in migrations/create_pending_backlog_view.sql"""
+    if raw is not None and str(raw).strip():
+        text = str(raw).strip()
+        if re.fullmatch(r"\d+(\.\d+)?", text):
+            return str(int(float(text)))
+        return str(raw)
+    match = re.search(r"(\d+)\s*[xX]\s*1", descripcion or "")
+    return str(int(match.group(1)) * 1000) if match else None
+
+
+def pending_backlog_view(tables: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Python twin of the pending_backlog view"""
+    cabuyas = {c["codigo"]: c for c in tables.get("inventarios_cabuyas", [])}
+    deniers = {d.get("id"): d for d in tables.get("deniers", [])}
+    rows = []
+    for c in cabuyas.values():
+        if (c.get("requerimientos") or 0) < 0:
+            rows.append({
+                "codigo": c["codigo"],
+                "descripcion": c.get("descripcion"),
+                "denier": _resolve_denier(c.get("denier"), c.get("descripcion")),
+                "kg": abs(c["requerimientos"]),
+                "kg_total": abs(c["requerimientos"]),
+                "prioridad": bool(c.get("prioridad")),
+                "origen": "Automatico",
+                "order_id": None,
+            })
+    for o in tables.get("orders", []):
+        if not o.get("cabuya_codigo"):
+            continue
+        cab = cabuyas.get(o["cabuya_codigo"], {})
+        denier = deniers.get(o.get("denier_id"), {}).get("name") or _resolve_denier(cab.get("denier"), cab.get("descripcion"))
+        rows.append({
+            "codigo": o["cabuya_codigo"],
+            "descripcion": "(Pedido Manual)",
+            "denier": denier,
+            "kg": (o.get("total_kg") or 0) - (o.get("produced_kg") or 0),
+            "kg_total": o.get("total_kg"),
+            "prioridad": True,
+            "origen": "Manual",
+            "order_id": o.get("id"),
+        })
+    return rows
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self.client = client
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List[tuple] = []
+        self.limit_count = None
+
+    # --- Operations ---
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.operation, self.columns = "select", columns
+        return self
+
+    def insert(self, data):
+        self.operation, self.payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict: str = None):
+        self.operation, self.payload, self.on_conflict = "upsert", data, on_conflict
+        return self
+
+    def update(self, data):
+        self.operation, self.payload = "update", data
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    # --- Filters ---
+    def _filter(self, column: str, predicate: Callable[[Any], bool]):
+        self.filters.append(lambda row: predicate(row.get(column)))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v is not None and str(v) == str(value))
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v is not None and str(v) != str(value))
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and _sort_key(v) < _sort_key(value))
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and _sort_key(v) > _sort_key(value))
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and _sort_key(v) <= _sort_key(value))
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and _sort_key(v) >= _sort_key(value))
+
+    def in_(self, column, values):
+        allowed = {str(v) for v in values}
+        return self._filter(column, lambda v: v is not None and str(v) in allowed)
+
+    def is_(self, column, value):
+        if str(value).lower() == "null":
+            return self._filter(column, lambda v: v is None)
+        return self._filter(column, lambda v: v is (str(value).lower() == "true"))
+
+    def ilike(self, column, pattern):
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*").replace("_", ".") + "$", re.IGNORECASE)
+        return self._filter(column, lambda v: v is not None and bool(regex.match(str(v))))
+
+    def order(self, column: str, desc: bool = False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.limit_count = count
+        return self
+
+    # --- Execution ---
+    def execute(self) -> FakeResponse:
+        return self.client._execute(self)
+
+
+class FakeRPC:
+    def __init__(self, client: "FakeSupabaseClient", name: str, params: Dict[str, Any]):
+        self.client, self.name, self.params = client, name, params or {}
+
+    def execute(self) -> FakeResponse:
+        return self.client._execute_rpc(self)
+
+
+class FakeSupabaseClient:
+    VIEWS = {"pending_backlog": pending_backlog_view}
+
+    def __init__(self, fixtures: Dict[str, List[Dict[str, Any]]] = None, latency: float = 0.0,
+                 max_rows: Optional[int] = None):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.latency = latency
+        # Server-side cap on selected rows, like PostgREST's max-rows (None = unlimited)
+        self.max_rows = max_rows
+        self.calls = Counter()
+        self.rows_returned = Counter()
+        self.functions: Dict[str, Callable[..., Any]] = {"scheduling_input_version": self._input_version}
+        self._lock = threading.RLock()
+        for table, rows in (fixtures or {}).items():
+            self.seed(table, rows)
+
+    @classmethod
+    def from_json(cls, path: str, latency: float = 0.0) -> "FakeSupabaseClient":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), latency=latency)
+
+    def seed(self, table: str, rows: List[Dict[str, Any]]):
+        """Append fixture rows to a table (ids and timestamps are filled in when missing)"""
+        with self._lock:
+            target = self.tables.setdefault(table, [])
+            for row in rows:
+                target.append(self._with_defaults(dict(row)))
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.rows_returned.clear()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    # --- Client API ---
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any] = None) -> FakeRPC:
+        return FakeRPC(self, name, params)
+
+    # --- Internals ---
+    def _with_defaults(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        row.setdefault("updated_at", row["created_at"])
+        return row
+
+    def _tick(self, key: tuple, rows: int):
+        self.calls[key] += 1
+        self.rows_returned[key] += rows
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _input_version(self) -> str:
+        # Empty tables are skipped: selecting a missing table creates it and must not change the version
+        state = json.dumps({k: v for k, v in self.tables.items() if k != "scheduling_scenarios" and v},
+                           sort_keys=True, default=str)
+        return hashlib.md5(state.encode("utf-8")).hexdigest()
+
+    def _execute_rpc(self, rpc: FakeRPC) -> FakeResponse:
+        if rpc.name not in self.functions:
+            raise Exception(f"Could not find the function public.{rpc.name}")
+        with self._lock:
+            data = self.functions[rpc.name](**rpc.params)
+        self._tick(("rpc", rpc.name), 1)
+        return FakeResponse(data)
+
+    def _execute(self, q: FakeQuery) -> FakeResponse:
+        with self._lock:
+            if q.table_name in self.VIEWS:
+                if q.operation != "select":
+                    raise Exception(f"cannot {q.operation} view {q.table_name}")
+                source = self.VIEWS[q.table_name](self.tables)
+            else:
+                source = self.tables.setdefault(q.table_name, [])
+            handler = getattr(self, f"_do_{q.operation}")
+            data = handler(q, source)
+        self._tick((q.table_name, q.operation), len(data))
+        return FakeResponse(data, count=len(data))
+
+    def _matching(self, q: FakeQuery, source: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [r for r in source if all(f(r) for f in q.filters)]
+
+    def _do_select(self, q: FakeQuery, source):
+        rows = self._matching(q, source)
+        for column, desc in reversed(q.orders):
+            rows = sorted(rows, key=lambda r: _sort_key(r.get(column)), reverse=desc)
+        if q.limit_count is not None:
+            rows = rows[:q.limit_count]
+        if self.max_rows is not None:
+            rows = rows[:self.max_rows]
+        return [self._project(r, q.columns) for r in rows]
+
+    def _project(self, row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+        embeds = _EMBED_RE.findall(columns)
+        plain = [c.strip() for c in _EMBED_RE.sub("", columns).split(",") if c.strip()]
+        result = copy.deepcopy(row) if "*" in plain else {c: copy.deepcopy(row.get(c)) for c in plain}
+        for relation, rel_columns in embeds:
+            # Foreign key convention: orders.denier_id -> deniers.id
+            fk = f"{relation[:-1]}_id" if relation.endswith("s") else f"{relation}_id"
+            target = next((t for t in self.tables.get(relation, []) if t.get("id") == row.get(fk)), None)
+            result[relation] = self._project(target, rel_columns) if target else None
+        return result
+
+    def _do_insert(self, q: FakeQuery, source):
+        rows = q.payload if isinstance(q.payload, list) else [q.payload]
+        inserted = [self._with_defaults(copy.deepcopy(r)) for r in rows]
+        source.extend(inserted)
+        return copy.deepcopy(inserted)
+
+    def _do_upsert(self, q: FakeQuery, source):
+        rows = q.payload if isinstance(q.payload, list) else [q.payload]
+        keys = [k.strip() for k in (q.on_conflict or "id").split(",")]
+        result = []
+        for row in rows:
+            existing = next((r for r in source if all(str(r.get(k)) == str(row.get(k)) for k in keys)), None)
+            if existing:
+                existing.update(copy.deepcopy(row))
+                existing["updated_at"] = _now()
+                result.append(copy.deepcopy(existing))
+            else:
+                new_row = self._with_defaults(copy.deepcopy(row))
+                source.append(new_row)
+                result.append(copy.deepcopy(new_row))
+        return result
+
+    def _do_update(self, q: FakeQuery, source):
+        result = []
+        for row in self._matching(q, source):
+            row.update(copy.deepcopy(q.payload))
+            row["updated_at"] = _now()
+            result.append(copy.deepcopy(row))
+        return result
+
+    def _do_delete(self, q: FakeQuery, source):
+        matched = self._matching(q, source)
+        ids = {id(r) for r in matched}
+        source[:] = [r for r in source if id(r) not in ids]
+        return copy.deepcopy(matched)
@@ -0,0 +1,19 @@
+-- Migration: Compressed / delta-encoded storage for scheduling_scenarios.plan_data
+-- New rows store the plan in plan_blob (see db/scenario_codec.py):
+--   plan_encoding = 'zlib'        full plan, zlib-compressed JSON (base64)
+--   plan_encoding = 'zlib-delta'  delta against base_scenario_id (always a full row)
+--   plan_encoding = NULL          legacy row, plan stored raw in plan_data
+--
+-- After applying, convert existing rows with:
+--   python -c "from db.queries import DBQueries; print(DBQueries().compress_saved_schedules())"
+
+ALTER TABLE scheduling_scenarios ALTER COLUMN plan_data DROP NOT NULL;
+
+ALTER TABLE scheduling_scenarios ADD COLUMN IF NOT EXISTS plan_encoding TEXT;
+ALTER TABLE scheduling_scenarios ADD COLUMN IF NOT EXISTS plan_blob TEXT;
+ALTER TABLE scheduling_scenarios ADD COLUMN IF NOT EXISTS base_scenario_id UUID
+    REFERENCES scheduling_scenarios(id) ON DELETE RESTRICT;
+
+-- Finds legacy rows pending migration
+CREATE INDEX IF NOT EXISTS idx_scheduling_scenarios_legacy
+ON scheduling_scenarios(id) WHERE plan_encoding IS NULL;
@@ -0,0 +1,59 @@
+-- Migration: Create pending_backlog view
+-- Resolved backlog rows (automatic requirements + manual orders) so the app does not
+-- have to download inventarios_cabuyas and join/normalize deniers in Python.
+
+-- Normalizes a raw denier value: '12000.0' -> '12000', '6000 expo' -> '6000 expo'
+-- and falls back to the description pattern ('CABUYA ECO 12x1K' -> '12000').
+CREATE OR REPLACE FUNCTION resolve_denier_name(raw_denier TEXT, descripcion TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    multiplier TEXT;
+BEGIN
+    IF raw_denier IS NOT NULL AND btrim(raw_denier) <> '' THEN
+        IF raw_denier ~ '^\s*\d+(\.\d+)?\s*$' THEN
+            RETURN trunc(raw_denier::NUMERIC)::BIGINT::TEXT;
+        END IF;
+        RETURN raw_denier;
+    END IF;
+    multiplier := substring(descripcion FROM '(\d+)\s*[xX]\s*1');
+    IF multiplier IS NULL THEN
+        RETURN NULL;
+    END IF;
+    RETURN (multiplier::BIGINT * 1000)::TEXT;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE VIEW pending_backlog AS
+-- Automatic requirements: inventory rows with negative requirements
+SELECT
+    c.codigo,
+    c.descripcion,
+    resolve_denier_name(c.denier::TEXT, c.descripcion) AS denier,
+    abs(c.requerimientos) AS kg,
+    abs(c.requerimientos) AS kg_total,
+    COALESCE(c.prioridad, FALSE) AS prioridad,
+    'Automatico'::TEXT AS origen,
+    NULL::UUID AS order_id
+FROM inventarios_cabuyas c
+WHERE c.requerimientos < 0
+
+UNION ALL
+
+-- Manual orders linked to a cabuya code
+SELECT
+    o.cabuya_codigo AS codigo,
+    '(Pedido Manual)'::TEXT AS descripcion,
+    COALESCE(d.name, resolve_denier_name(c.denier::TEXT, c.descripcion)) AS denier,
+    o.total_kg - COALESCE(o.produced_kg, 0) AS kg,
+    o.total_kg AS kg_total,
+    TRUE AS prioridad,
+    'Manual'::TEXT AS origen,
+    o.id AS order_id
+FROM orders o
+LEFT JOIN deniers d ON d.id = o.denier_id
+LEFT JOIN inventarios_cabuyas c ON c.codigo = o.cabuya_codigo
+WHERE o.cabuya_codigo IS NOT NULL;
+
+-- Speeds up the automatic branch of the view
+CREATE INDEX IF NOT EXISTS idx_inventarios_cabuyas_pending
+ON public.inventarios_cabuyas(codigo) WHERE requerimientos < 0;
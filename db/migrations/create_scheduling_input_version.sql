@@ -0,0 +1,25 @@
+-- Migration: scheduling_input_version() RPC
+-- Returns a single cheap stamp that changes whenever any scheduling input changes, so the
+-- app can skip re-fetching tables and re-simulating plans (see DBQueries.get_input_version).
+-- Tables with an updated_at trigger use row count + max(updated_at); small tables without
+-- it are hashed entirely.
+
+CREATE OR REPLACE FUNCTION scheduling_input_version()
+RETURNS TEXT AS $$
+    SELECT md5(concat_ws('|',
+        (SELECT count(*) || ':' || COALESCE(max(updated_at)::TEXT, '') FROM inventarios_cabuyas),
+        (SELECT count(*) || ':' || COALESCE(max(updated_at)::TEXT, '') FROM machine_denier_config),
+        (SELECT count(*) || ':' || COALESCE(max(updated_at)::TEXT, '') FROM rewinder_denier_config),
+        (SELECT count(*) || ':' || COALESCE(max(updated_at)::TEXT, '') FROM shifts),
+        (SELECT md5(COALESCE(string_agg(o::TEXT, ',' ORDER BY o.id), '')) FROM orders o),
+        (SELECT md5(COALESCE(string_agg(d::TEXT, ',' ORDER BY d.id), '')) FROM deniers d),
+        (SELECT md5(COALESCE(string_agg(m::TEXT, ',' ORDER BY m.id), '')) FROM machines_torsion m)
+    ));
+$$ LANGUAGE sql STABLE;
+
+-- shifts has an updated_at column but no trigger yet
+DROP TRIGGER IF EXISTS update_shifts_updated_at ON shifts;
+CREATE TRIGGER update_shifts_updated_at
+BEFORE UPDATE ON shifts
+FOR EACH ROW
+EXECUTE FUNCTION update_updated_at_column();
@@ -1,20 +1,64 @@
+import os
+import threading
 from .client import get_supabase_client
-from typing import List, Dict, Any
-from supabase import create_client, Client
+from .tracing import trace_client
+from .catalog import catalog, CABUYAS, INVENTORY, DENIERS, REWINDER
+from typing import List, Dict, Any, Callable, Iterator
 from logic.formulas import get_n_optimo_rew, get_kgh_torsion
+from logic.deniers import resolve_denier
+from logic.backlog import pending_kg_by_denier
+from .scenario_codec import encode_plan, decode_plan, ENCODING_DELTA
+
+# Rows per page for keyset-paginated reads. Supabase caps responses at 1000 rows by
+# default (PostgREST max-rows); a larger page would come back short and end the keyset
+# loop early, silently dropping rows, so the configured size is clamped to the cap.
+POSTGREST_MAX_ROWS = 1000
+PAGE_SIZE = min(int(os.environ.get("SUPABASE_PAGE_SIZE", POSTGREST_MAX_ROWS)), POSTGREST_MAX_ROWS)
+
+# Column projections used by the routes (avoid shipping unused columns)
+DENIER_COLUMNS = "id, name"
+CABUYA_LOOKUP_COLUMNS = "codigo, descripcion, denier"
+CABUYA_PENDING_COLUMNS = "codigo, descripcion, denier, requerimientos, prioridad"
+CABUYA_CONFIG_COLUMNS = "codigo, estado, grupo, existencia, denier, color, descripcion, inventario_seguridad, requerimientos"
+MACHINE_CONFIG_COLUMNS = "machine_id, denier, rpm, torsiones_metro, husos"
+REWINDER_CONFIG_COLUMNS = "denier, mp_segundos, tm_minutos"
+SCENARIO_LIST_COLUMNS = "id, scenario_name, created_at"
+
+# Last scheduling snapshot per process, reused while scheduling_input_version() is unchanged
+_scheduling_cache = {"version": None, "data": None}
+_scheduling_cache_lock = threading.Lock()
+
+# Max rows per bulk request (keeps PostgREST payloads well below request limits)
+BULK_CHUNK_SIZE = 500
+
+def _chunks(rows: List[Dict[str, Any]], size: int = BULK_CHUNK_SIZE):
+    """Yield consecutive slices of at most `size` rows"""
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
 
 class DBQueries:
-    def __init__(self):
-        self.supabase = get_supabase_client()
+    def __init__(self, client=None):
+        self.supabase = trace_client(client or get_supabase_client())
+
+    def ping(self) -> None:
+        """Cheapest round trip (one denier id): used by the background health probe"""
+        self.supabase.table("deniers").select("id").limit(1).execute()
 
     # --- Deniers ---
-    def get_deniers(self) -> List[Dict[str, Any]]:
-        response = self.supabase.table("deniers").select("*").execute()
+    def get_deniers(self, columns: str = "*") -> List[Dict[str, Any]]:
+        response = self.supabase.table("deniers").select(columns).execute()
         return response.data
 
+    def get_denier_by_name(self, name: str, columns: str = DENIER_COLUMNS) -> Dict[str, Any]:
+        """Get a single denier by name (None if not found)"""
+        response = self.supabase.table("deniers").select(columns).eq("name", name).limit(1).execute()
+        return response.data[0] if response.data else None
+
     def create_denier(self, name: str, cycle_time: float):
         data = {"name": name, "cycle_time_standard": cycle_time}
-        return self.supabase.table("deniers").insert(data).execute()
+        result = self.supabase.table("deniers").insert(data).execute()
+        catalog.invalidate(DENIERS)
+        return result
 
     # --- Machines Torsion ---
     def get_machines_torsion(self) -> List[Dict[str, Any]]:
@@ -70,9 +114,9 @@ class DBQueries:
         return self.supabase.table("reports").insert(data).execute()
 
     # --- Machine-Denier Configurations ---
-    def get_machine_denier_configs(self) -> List[Dict[str, Any]]:
+    def get_machine_denier_configs(self, columns: str = "*") -> List[Dict[str, Any]]:
         """Get all machine-denier configurations with calculated Kg/h"""
-        response = self.supabase.table("machine_denier_config").select("*").execute()
+        response = self.supabase.table("machine_denier_config").select(columns).execute()
         return response.data if response.data else []
     
     def upsert_machine_denier_config(self, machine_id: str, denier: str, rpm: int, torsiones_metro: int, husos: int):
@@ -87,15 +131,19 @@ class DBQueries:
         # Use upsert to create or update
         return self.supabase.table("machine_denier_config").upsert(data, on_conflict="machine_id,denier").execute()
     
+    def bulk_upsert_machine_denier_configs(self, rows: List[Dict[str, Any]]) -> int:
+        """Create or update many machine-denier configurations in one request per chunk"""
+        return self._bulk_upsert("machine_denier_config", rows, "machine_id,denier")
+
     def get_config_for_machine(self, machine_id: str) -> List[Dict[str, Any]]:
         """Get all denier configurations for a specific machine"""
         response = self.supabase.table("machine_denier_config").select("*").eq("machine_id", machine_id).execute()
         return response.data if response.data else []
     
     # --- Rewinder-Denier Configurations ---
-    def get_rewinder_denier_configs(self) -> List[Dict[str, Any]]:
+    def get_rewinder_denier_configs(self, columns: str = "*") -> List[Dict[str, Any]]:
         """Get all rewinder denier configurations"""
-        response = self.supabase.table("rewinder_denier_config").select("*").execute()
+        response = self.supabase.table("rewinder_denier_config").select(columns).execute()
         return response.data if response.data else []
     
     def upsert_rewinder_denier_config(self, denier: str, mp_segundos: float, tm_minutos: float):
@@ -105,8 +153,16 @@ class DBQueries:
             "mp_segundos": mp_segundos,
             "tm_minutos": tm_minutos
         }
-        return self.supabase.table("rewinder_denier_config").upsert(data, on_conflict="denier").execute()
+        result = self.supabase.table("rewinder_denier_config").upsert(data, on_conflict="denier").execute()
+        catalog.invalidate(REWINDER)
+        return result
     
+    def bulk_upsert_rewinder_denier_configs(self, rows: List[Dict[str, Any]]) -> int:
+        """Create or update many rewinder denier configurations in one request per chunk"""
+        count = self._bulk_upsert("rewinder_denier_config", rows, "denier")
+        catalog.invalidate(REWINDER)
+        return count
+
     # --- Shifts ---
     def get_shifts(self, start_date: str = None, end_date: str = None) -> List[Dict[str, Any]]:
         """Get shifts for a date range"""
@@ -126,17 +182,53 @@ class DBQueries:
         }
         return self.supabase.table("shifts").upsert(data, on_conflict="date").execute()
     
+    def bulk_upsert_shifts(self, rows: List[Dict[str, Any]]) -> int:
+        """Create or update many shifts (date, working_hours) in one request per chunk"""
+        return self._bulk_upsert("shifts", rows, "date")
+
+    # --- Bulk Helper ---
+    def _bulk_upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str) -> int:
+        """Upsert rows into `table` in chunks of BULK_CHUNK_SIZE. Returns the number of rows sent."""
+        for chunk in _chunks(rows):
+            self.supabase.table(table).upsert(chunk, on_conflict=on_conflict).execute()
+        return len(rows)
+
     # --- Scheduling Helper ---
-    def get_all_scheduling_data(self) -> Dict[str, Any]:
-        """Get all data needed for production scheduling"""
+    def get_input_version(self) -> str:
+        """Single stamp of all scheduling inputs (see migrations/create_scheduling_input_version.sql).
+        Returns None when the RPC is unavailable, which disables version-based caching."""
+        try:
+            response = self.supabase.rpc("scheduling_input_version").execute()
+        except Exception:
+            return None
+        return response.data or None
+
+    def get_all_scheduling_data(self, input_version: str = None) -> Dict[str, Any]:
+        """Get all data needed for production scheduling.
+        Served from the process cache while the input version is unchanged; the
+        returned dicts are shared, so callers must not mutate them."""
+        version = input_version or self.get_input_version()
+        if version:
+            with _scheduling_cache_lock:
+                if _scheduling_cache["version"] == version:
+                    return dict(_scheduling_cache["data"])
+        data = self._fetch_scheduling_data()
+        if version:
+            with _scheduling_cache_lock:
+                _scheduling_cache["version"] = version
+                _scheduling_cache["data"] = data
+        return dict(data)
+
+    def _fetch_scheduling_data(self) -> Dict[str, Any]:
+        """Fetch and compute all scheduling data from the database"""
         orders = self.get_orders()
-        rewinder_configs = self.get_rewinder_denier_configs()
-        torsion_configs = self.get_machine_denier_configs()
+        rewinder_configs = self.get_rewinder_denier_configs(REWINDER_CONFIG_COLUMNS)
+        torsion_configs = self.get_machine_denier_configs(MACHINE_CONFIG_COLUMNS)
         
         # Convert rewinder configs to a dict keyed by denier
         rewinder_dict = {}
         for config in rewinder_configs:
-            denier = config['denier']
+            denier = resolve_denier(config['denier']) or config['denier']
             tm_min = config['tm_minutos']
             # Calculate Kg per hour at 80% productivity
             kg_per_hour = (60 / tm_min) * 0.8 if tm_min > 0 else 0
@@ -153,49 +245,43 @@ class DBQueries:
         # Calculate Torsion capacities per denier
         torsion_capacities = {}
         
-        # Get all unique deniers from configs to ensure coverage
-        # Normalize to string to handle potential type mismatches (int vs str)
-        all_config_deniers = {str(c['denier']) for c in torsion_configs if c.get('denier')}
+        # Group configs by canonical denier ('6000', '6000.0' and 6000 are the same key)
+        configs_by_denier = {}
+        for c in torsion_configs:
+            denier = resolve_denier(c.get('denier'))
+            if denier is not None:
+                configs_by_denier.setdefault(denier, []).append(c)
         
-        for denier_key in all_config_deniers:
-            # Find all machines that can produce this denier (comparing as strings)
-            compatible_torsion = [c for c in torsion_configs if str(c.get('denier', '')) == denier_key]
-            
+        for denier, compatible_torsion in configs_by_denier.items():
             # Sum capacities
             total_kgh = 0
             machines_details = []
             
             for config in compatible_torsion:
-                # Try to get numeric denier value from name (e.g., '12000' -> 12000, '6000 expo' -> 6000)
-                try:
-                    # Use split to get the first numeric part
-                    denier_val = float(denier_key.split(' ')[0])
-                    # Calculating theoretical capacity (100% OEE, 0% Waste) to match UI Configuration display
-                    # User expects calculation based directly on the 52.15 Kg/h shown in UI, not the net effective capacity
-                    kgh = get_kgh_torsion(
-                        denier=denier_val,
-                        rpm=config['rpm'],
-                        torsiones_metro=config['torsiones_metro'],
-                        husos=config['husos'],
-                        oee=1.0, 
-                        desperdicio=0.0
-                    )
-                    
-                    if kgh <= 0:
-                        continue
-
-                    total_kgh += kgh
-                    machines_details.append({
-                        "machine_id": config['machine_id'],
-                        "kgh": round(kgh, 2),
-                        "husos": config['husos'],
-                        "rpm": config['rpm'],
-                        "torsiones_metro": config['torsiones_metro']
-                    })
-                except ValueError:
+                # Calculating theoretical capacity (100% OEE, 0% Waste) to match UI Configuration display
+                # User expects calculation based directly on the 52.15 Kg/h shown in UI, not the net effective capacity
+                kgh = get_kgh_torsion(
+                    denier=denier.base,
+                    rpm=config['rpm'],
+                    torsiones_metro=config['torsiones_metro'],
+                    husos=config['husos'],
+                    oee=1.0, 
+                    desperdicio=0.0
+                )
+                
+                if kgh <= 0:
                     continue
+
+                total_kgh += kgh
+                machines_details.append({
+                    "machine_id": config['machine_id'],
+                    "kgh": round(kgh, 2),
+                    "husos": config['husos'],
+                    "rpm": config['rpm'],
+                    "torsiones_metro": config['torsiones_metro']
+                })
             
-            torsion_capacities[denier_key] = {
+            torsion_capacities[denier] = {
                 "total_kgh": round(total_kgh, 2),
                 "machines": machines_details
             }
@@ -207,40 +293,169 @@ class DBQueries:
             "shifts": self.get_shifts(), # Fetch all defined shifts
             "machines": self.get_machines_torsion(),
             "machine_denier_configs": torsion_configs, # Raw list of all configs
-            "pending_requirements": self.get_pending_requirements(),
-            "inventarios_cabuyas": self.get_inventarios_cabuyas()
+            # Kg of pending requirements per denier (the page lists rows through /api/cabuyas)
+            "pending_by_denier": pending_kg_by_denier(self.iter_pending_requirements(CABUYA_PENDING_COLUMNS))
         }
 
     # --- Saved Schedules ---
-    def save_scheduling_scenario(self, name: str, plan_data: Dict[str, Any]):
-        data = {
-            "scenario_name": name,
-            "plan_data": plan_data
-        }
+    def save_scheduling_scenario(self, name: str, plan_data: Dict[str, Any], base_scenario_id: str = None):
+        """Save a plan compressed. With base_scenario_id the plan is stored as a delta
+        against that scenario's root (full) plan when that is smaller."""
+        base_plan, root_id = None, None
+        if base_scenario_id:
+            base_plan, root_id = self._load_root_plan(base_scenario_id)
+        data = {"scenario_name": name, "plan_data": None, "base_scenario_id": None}
+        data.update(encode_plan(plan_data, base_plan))
+        if data["plan_encoding"] == ENCODING_DELTA:
+            data["base_scenario_id"] = root_id
         return self.supabase.table("scheduling_scenarios").insert(data).execute()
 
-    def get_saved_schedules(self, limit: int = 10):
-        return self.supabase.table("scheduling_scenarios").select("*").order("created_at", desc=True).limit(limit).execute()
+    def _get_scenario_row(self, scenario_id: str) -> Dict[str, Any]:
+        response = self.supabase.table("scheduling_scenarios").select("*").eq("id", scenario_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def _load_root_plan(self, scenario_id: str):
+        """Return (plan, root_id) for the full (non-delta) plan a new delta should target"""
+        row = self._get_scenario_row(scenario_id)
+        if not row:
+            return None, None
+        if row.get("plan_encoding") == ENCODING_DELTA:
+            row = self._get_scenario_row(row["base_scenario_id"])
+        return decode_plan(row), row["id"]
+
+    def list_saved_schedules(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """List the latest saved scenarios (metadata only, without plan_data)"""
+        response = self.supabase.table("scheduling_scenarios").select(SCENARIO_LIST_COLUMNS).order("created_at", desc=True).limit(limit).execute()
+        return response.data if response.data else []
+
+    def get_saved_schedule(self, scenario_id: str) -> Dict[str, Any]:
+        """Get a single saved scenario including its decoded plan_data (None if not found)"""
+        row = self._get_scenario_row(scenario_id)
+        if not row:
+            return None
+        base_plan = None
+        if row.get("plan_encoding") == ENCODING_DELTA:
+            base_plan = decode_plan(self._get_scenario_row(row["base_scenario_id"]))
+        row["plan_data"] = decode_plan(row, base_plan)
+        row.pop("plan_blob", None)
+        return row
+
+    def compress_saved_schedules(self, batch_size: int = 50) -> int:
+        """Migrate legacy rows (raw plan_data JSON) to the compressed format. Returns rows migrated."""
+        migrated = 0
+        while True:
+            response = self.supabase.table("scheduling_scenarios").select("id, plan_data").is_("plan_encoding", "null").limit(batch_size).execute()
+            rows = response.data or []
+            for row in rows:
+                data = {"plan_data": None}
+                data.update(encode_plan(row.get("plan_data")))
+                self.supabase.table("scheduling_scenarios").update(data).eq("id", row["id"]).execute()
+            migrated += len(rows)
+            if len(rows) < batch_size:
+                return migrated
 
     # --- Inventarios Cabuyas ---
-    def get_inventarios_cabuyas(self) -> List[Dict[str, Any]]:
+    def iter_inventarios_cabuyas(self, columns: str = "*", page_size: int = None, pending_only: bool = False) -> Iterator[Dict[str, Any]]:
+        """Stream cabuyas inventory records ordered by codigo, one keyset page at a time.
+        With pending_only=True only rows with negative requirements are yielded."""
+        if columns != "*" and "codigo" not in [c.strip() for c in columns.split(",")]:
+            columns = f"codigo, {columns}" # Keyset column is always needed
+
+        def query():
+            q = self.supabase.table("inventarios_cabuyas").select(columns)
+            return q.lt("requerimientos", 0) if pending_only else q
+        return self._iter_keyset(query, "codigo", page_size)
+
+    def _iter_keyset(self, query: Callable[[], Any], key: str, page_size: int = None) -> Iterator[Dict[str, Any]]:
+        """Rows of query() ordered by the unique column `key`, one page (at most the server cap) at a time"""
+        page_size = min(page_size or PAGE_SIZE, POSTGREST_MAX_ROWS)
+        last = None
+        while True:
+            q = query()
+            if last is not None:
+                q = q.gt(key, last)
+            rows = q.order(key).limit(page_size).execute().data or []
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1][key]
+
+    def get_cabuya_by_codigo(self, codigo: str, columns: str = CABUYA_LOOKUP_COLUMNS) -> Dict[str, Any]:
+        """Get a single cabuya inventory record by codigo (None if not found)"""
+        response = self.supabase.table("inventarios_cabuyas").select(columns).eq("codigo", codigo).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def get_inventarios_cabuyas(self, columns: str = "*") -> List[Dict[str, Any]]:
         """Get all cabuyas inventory records"""
-        response = self.supabase.table("inventarios_cabuyas").select("*").order("codigo").execute()
-        return response.data if response.data else []
+        return list(self.iter_inventarios_cabuyas(columns))
 
     def bulk_insert_cabuyas(self, data: List[Dict[str, Any]]):
         """Bulk insert cabuyas inventory records"""
-        return self.supabase.table("inventarios_cabuyas").upsert(data, on_conflict="codigo").execute()
+        count = self._bulk_upsert("inventarios_cabuyas", data, "codigo")
+        catalog.invalidate(CABUYAS, INVENTORY)
+        return count
+
+    def bulk_update_cabuya_inventory_security(self, security_values: Dict[str, float]) -> int:
+        """Update the security inventory value of many cabuyas (codigo -> value) in one request per chunk.
+        Only existing codes are touched so the upsert never creates partial inventory rows."""
+        if not security_values:
+            return 0
+        codes = list(security_values.keys())
+        existing = set()
+        for chunk in _chunks(codes):
+            response = self.supabase.table("inventarios_cabuyas").select("codigo").in_("codigo", chunk).execute()
+            existing.update(r['codigo'] for r in (response.data or []))
+        rows = [{"codigo": c, "inventario_seguridad": v} for c, v in security_values.items() if c in existing]
+        count = self._bulk_upsert("inventarios_cabuyas", rows, "codigo")
+        catalog.invalidate(INVENTORY)
+        return count
 
     def update_cabuya_inventory_security(self, codigo: str, security_value: float):
         """Update the security inventory value for a specific cabuya"""
-        return self.supabase.table("inventarios_cabuyas").update({"inventario_seguridad": security_value}).eq("codigo", codigo).execute()
+        result = self.supabase.table("inventarios_cabuyas").update({"inventario_seguridad": security_value}).eq("codigo", codigo).execute()
+        catalog.invalidate(INVENTORY)
+        return result
 
-    def get_pending_requirements(self) -> List[Dict[str, Any]]:
-        """Get all cabuyas inventory records with negative requirements"""
-        response = self.supabase.table("inventarios_cabuyas").select("*").lt("requerimientos", 0).order("requerimientos", desc=False).execute()
-        return response.data if response.data else []
+    def iter_pending_requirements(self, columns: str = "*", page_size: int = None) -> Iterator[Dict[str, Any]]:
+        """Stream cabuyas inventory records with negative requirements (ordered by codigo)"""
+        return self.iter_inventarios_cabuyas(columns, page_size=page_size, pending_only=True)
+
+    def get_pending_requirements(self, columns: str = "*") -> List[Dict[str, Any]]:
+        """Get all cabuyas inventory records with negative requirements, largest requirement first"""
+        return sorted(self.iter_pending_requirements(columns), key=lambda r: r['requerimientos'])
+
+    # --- Pending Backlog (view, see migrations/create_pending_backlog_view.sql) ---
+    def get_pending_backlog(self, order_id: str = None, codigo: str = None, page_size: int = None) -> List[Dict[str, Any]]:
+        """Get resolved backlog rows (codigo, descripcion, denier, kg, kg_total, prioridad, origen, order_id),
+        optionally only those of one order or one cabuya code.
+        Automatic requirements come first (largest kg first), then manual orders.
+        The view is read in keyset pages (automatic rows are unique by codigo, manual ones
+        by order_id) so backlogs above the server row cap are not truncated."""
+        def query(automatic: bool):
+            def build():
+                q = self.supabase.table("pending_backlog").select("*")
+                q = q.eq("origen", "Automatico") if automatic else q.neq("origen", "Automatico")
+                if order_id:
+                    q = q.eq("order_id", order_id)
+                if codigo:
+                    q = q.eq("codigo", codigo)
+                return q
+            return build
+
+        # Automatic requirements have no order_id
+        rows = [] if order_id else list(self._iter_keyset(query(True), "codigo", page_size))
+        rows += self._iter_keyset(query(False), "order_id", page_size)
+        rows.sort(key=lambda r: -(r.get('kg') or 0))
+        rows.sort(key=lambda r: r.get('origen') or '')
+        return rows
 
     def update_cabuya_priority(self, codigo: str, prioridad: bool):
         """Update the priority status for a specific cabuya"""
         return self.supabase.table("inventarios_cabuyas").update({"prioridad": prioridad}).eq("codigo", codigo).execute()
+
+def get_db() -> DBQueries:
+    """Return the configured backend: DB_BACKEND=supabase (default) or snapshot (read-only SQLite)"""
+    if os.environ.get("DB_BACKEND", "supabase") == "snapshot":
+        from .snapshot import SnapshotQueries
+        return SnapshotQueries()
+    return DBQueries()
@@ -0,0 +1,110 @@
+"""
+Storage format for scheduling_scenarios.plan_data.
+
+Plans are stored compressed (zlib over compact JSON, base64 for transport) in
+`plan_blob`, optionally as a structural delta against a base scenario:
+
+    plan_encoding = 'zlib'        -> plan_blob is the full plan
+    plan_encoding = 'zlib-delta'  -> plan_blob is a delta against base_scenario_id
+    plan_encoding = NULL          -> legacy row, plan_data holds the raw JSON
+
+Delta nodes are tagged dicts:
+    {"v": value}                          replace with value
+    {"d": {key: node}, "r": [keys]}       dict: changed keys / removed keys
+    {"l": {index: node}, "n": len, "t": [tail]}
+                                          list: changed items, new length, appended items
+"""
+import base64
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+ENCODING_FULL = "zlib"
+ENCODING_DELTA = "zlib-delta"
+
+
+def _compress(obj: Any) -> str:
+    raw = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii")
+
+
+def _decompress(blob: str) -> Any:
+    return json.loads(zlib.decompress(base64.b64decode(blob)).decode("utf-8"))
+
+
+def diff(old: Any, new: Any) -> Optional[Dict[str, Any]]:
+    """Structural delta turning `old` into `new` (None when they are equal)"""
+    if old == new and type(old) is type(new):
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {}
+        for key, value in new.items():
+            if key not in old:
+                changed[key] = {"v": value}
+            else:
+                node = diff(old[key], value)
+                if node is not None:
+                    changed[key] = node
+        removed = [key for key in old if key not in new]
+        node = {"d": changed}
+        if removed:
+            node["r"] = removed
+        return node
+    if isinstance(old, list) and isinstance(new, list):
+        changed = {}
+        for idx in range(min(len(old), len(new))):
+            item = diff(old[idx], new[idx])
+            if item is not None:
+                changed[str(idx)] = item
+        node = {"l": changed, "n": len(new)}
+        if len(new) > len(old):
+            node["t"] = new[len(old):]
+        return node
+    return {"v": new}
+
+
+def patch(old: Any, node: Optional[Dict[str, Any]]) -> Any:
+    """Apply a delta produced by diff() to `old` (old is not mutated)"""
+    if node is None:
+        return old
+    if "v" in node:
+        return node["v"]
+    if "d" in node:
+        removed = set(node.get("r", []))
+        result = {k: v for k, v in old.items() if k not in removed}
+        for key, child in node["d"].items():
+            result[key] = patch(old.get(key), child)
+        return result
+    if "l" in node:
+        result = list(old[:node["n"]])
+        for idx, child in node["l"].items():
+            result[int(idx)] = patch(result[int(idx)], child)
+        result.extend(node.get("t", []))
+        return result
+    raise ValueError(f"Nodo delta inválido: {list(node.keys())}")
+
+
+def encode_plan(plan: Dict[str, Any], base_plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Encode a plan for storage. When base_plan is given the delta is used only if it
+    is smaller than the full compressed plan. Returns the columns to write."""
+    full_blob = _compress(plan)
+    if base_plan is not None:
+        delta_blob = _compress(diff(base_plan, plan))
+        if len(delta_blob) < len(full_blob):
+            return {"plan_encoding": ENCODING_DELTA, "plan_blob": delta_blob}
+    return {"plan_encoding": ENCODING_FULL, "plan_blob": full_blob}
+
+
+def decode_plan(row: Dict[str, Any], base_plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Decode the plan stored in a scheduling_scenarios row. Delta rows need the
+    decoded plan of their base scenario."""
+    encoding = row.get("plan_encoding")
+    if not encoding:
+        return row.get("plan_data")
+    if encoding == ENCODING_FULL:
+        return _decompress(row["plan_blob"])
+    if encoding == ENCODING_DELTA:
+        if base_plan is None:
+            raise ValueError("El escenario es un delta y requiere el plan base")
+        return patch(base_plan, _decompress(row["plan_blob"]))
+    raise ValueError(f"Codificación de plan desconocida: {encoding}")
@@ -0,0 +1,201 @@
+"""
+Local SQLite snapshot of the scheduling inputs.
+
+Export everything the planner reads from Supabase into one SQLite file and read it
+back through SnapshotQueries, a read-only DBQueries backend. Select it with:
+
+    DB_BACKEND=snapshot
+    DB_SNAPSHOT_PATH=snapshot.sqlite   (default)
+
+Export a fresh snapshot from the live database with:
+
+    python -m db.snapshot export [path]
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from .queries import DBQueries, PAGE_SIZE
+
+DEFAULT_SNAPSHOT_PATH = "snapshot.sqlite"
+
+# Snapshot table -> indexed key columns. Every row is also stored whole as JSON in `data`.
+SNAPSHOT_TABLES = {
+    "deniers": ["name"],
+    "machines_torsion": ["id"],
+    "orders": ["id", "cabuya_codigo"],
+    "machine_denier_config": ["machine_id", "denier"],
+    "rewinder_denier_config": ["denier"],
+    "shifts": ["date"],
+    "inventarios_cabuyas": ["codigo", "denier", "requerimientos"],
+    "pending_backlog": ["codigo", "denier", "origen"],
+}
+
+
+class ReadOnlySnapshotError(RuntimeError):
+    pass
+
+
+class _ReadOnlyClient:
+    """Stands in for the Supabase client so write methods fail with a clear message"""
+    def table(self, name: str):
+        raise ReadOnlySnapshotError(f"El snapshot local es de solo lectura (tabla '{name}')")
+
+    def rpc(self, name: str, *args, **kwargs):
+        raise ReadOnlySnapshotError(f"El snapshot local no soporta RPC ('{name}')")
+
+
+def _project(row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+    if columns == "*":
+        return row
+    keys = [c.strip() for c in columns.split(",")]
+    return {k: row.get(k) for k in keys}
+
+
+def export_snapshot(db: DBQueries, path: str = DEFAULT_SNAPSHOT_PATH) -> Dict[str, int]:
+    """Write all scheduling inputs read through `db` into a new SQLite file at `path`.
+    Returns the number of rows exported per table."""
+    sources = {
+        "deniers": db.get_deniers,
+        "machines_torsion": db.get_machines_torsion,
+        "orders": db.get_orders,
+        "machine_denier_config": db.get_machine_denier_configs,
+        "rewinder_denier_config": db.get_rewinder_denier_configs,
+        "shifts": db.get_shifts,
+        "inventarios_cabuyas": db.iter_inventarios_cabuyas,
+        "pending_backlog": db.get_pending_backlog,
+    }
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    counts = {}
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        for table, keys in SNAPSHOT_TABLES.items():
+            cols = ", ".join(f"{k}" for k in keys)
+            conn.execute(f"CREATE TABLE {table} (seq INTEGER PRIMARY KEY, {cols}, data TEXT NOT NULL)")
+            for k in keys:
+                conn.execute(f"CREATE INDEX idx_{table}_{k} ON {table}({k})")
+            placeholders = ", ".join("?" for _ in range(len(keys) + 1))
+            rows = ((*(r.get(k) for k in keys), json.dumps(r, default=str)) for r in sources[table]())
+            cur = conn.executemany(f"INSERT INTO {table} ({cols}, data) VALUES ({placeholders})", rows)
+            counts[table] = cur.rowcount
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("input_version", db.get_input_version() or ""),
+            ("exported_at", datetime.now().isoformat()),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return counts
+
+
+class SnapshotQueries(DBQueries):
+    """Read-only DBQueries backend over a SQLite snapshot written by export_snapshot()"""
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("DB_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Snapshot no encontrado: {self.path}")
+        self.supabase = _ReadOnlyClient()
+        self._local = threading.local()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, table: str, where: str = "", params: tuple = (), order: str = "seq", columns: str = "*") -> List[Dict[str, Any]]:
+        sql = f"SELECT data FROM {table} {where} ORDER BY {order}"
+        return [_project(json.loads(r[0]), columns) for r in self._conn.execute(sql, params)]
+
+    def ping(self) -> None:
+        """Health probe on the SQLite file (the read-only client has no tables)"""
+        self._conn.execute("SELECT 1").fetchone()
+
+    # --- Reads ---
+    def get_deniers(self, columns: str = "*") -> List[Dict[str, Any]]:
+        return self._rows("deniers", columns=columns)
+
+    def get_denier_by_name(self, name: str, columns: str = "*") -> Dict[str, Any]:
+        rows = self._rows("deniers", "WHERE name = ?", (name,), columns=columns)
+        return rows[0] if rows else None
+
+    def get_cabuya_by_codigo(self, codigo: str, columns: str = "*") -> Dict[str, Any]:
+        rows = self._rows("inventarios_cabuyas", "WHERE codigo = ?", (codigo,), columns=columns)
+        return rows[0] if rows else None
+
+    def get_machines_torsion(self) -> List[Dict[str, Any]]:
+        return self._rows("machines_torsion")
+
+    def get_orders(self) -> List[Dict[str, Any]]:
+        return self._rows("orders")
+
+    def get_machine_denier_configs(self, columns: str = "*") -> List[Dict[str, Any]]:
+        return self._rows("machine_denier_config", columns=columns)
+
+    def get_config_for_machine(self, machine_id: str) -> List[Dict[str, Any]]:
+        return self._rows("machine_denier_config", "WHERE machine_id = ?", (machine_id,))
+
+    def get_rewinder_denier_configs(self, columns: str = "*") -> List[Dict[str, Any]]:
+        return self._rows("rewinder_denier_config", columns=columns)
+
+    def get_shifts(self, start_date: str = None, end_date: str = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if start_date:
+            clauses.append("date >= ?")
+            params.append(str(start_date))
+        if end_date:
+            clauses.append("date <= ?")
+            params.append(str(end_date))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._rows("shifts", where, tuple(params), order="date")
+
+    def iter_inventarios_cabuyas(self, columns: str = "*", page_size: int = None, pending_only: bool = False) -> Iterator[Dict[str, Any]]:
+        where = "WHERE requerimientos < 0" if pending_only else ""
+        cursor = self._conn.execute(f"SELECT data FROM inventarios_cabuyas {where} ORDER BY codigo")
+        while True:
+            rows = cursor.fetchmany(page_size or PAGE_SIZE)
+            if not rows:
+                return
+            for r in rows:
+                yield _project(json.loads(r[0]), columns)
+
+    def get_pending_backlog(self, order_id: str = None, codigo: str = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if order_id:
+            clauses.append("json_extract(data, '$.order_id') = ?")
+            params.append(order_id)
+        if codigo:
+            clauses.append("codigo = ?")
+            params.append(codigo)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._rows("pending_backlog", where, tuple(params), order="origen, json_extract(data, '$.kg') DESC")
+
+    def get_input_version(self) -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'input_version'").fetchone()
+        # Prefix keeps snapshot and live caches apart even for the same source version
+        return f"snapshot:{row[0]}" if row and row[0] else f"snapshot:{os.path.getmtime(self.path)}"
+
+    def list_saved_schedules(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return []
+
+    def get_saved_schedule(self, scenario_id: str) -> Dict[str, Any]:
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("Uso: python -m db.snapshot export [ruta]")
+        sys.exit(1)
+    target = sys.argv[2] if len(sys.argv) > 2 else os.environ.get("DB_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    print(export_snapshot(DBQueries(), target))
@@ -0,0 +1,225 @@
+"""
+Supabase call tracing grouped per request.
+
+Every query executed through a TracingClient records table, operation, filters,
+latency, row count and response size into the current request trace. When a request
+finishes, the trace is folded into per-route statistics and a warning is logged if it
+crossed the call-count / byte thresholds or repeated the same query shape (N+1).
+Streamed responses (SSE) keep querying while the body is sent, so finish_response()
+closes their trace when the stream ends instead of in after_request.
+
+    DB_TRACE=0                  disable tracing
+    DB_TRACE_MAX_CALLS=10       warn above this many calls per request
+    DB_TRACE_MAX_BYTES=1000000  warn above this many response bytes per request
+    DB_TRACE_N1_THRESHOLD=5     warn when one query shape repeats this many times
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.environ.get("DB_TRACE", "1") != "0"
+MAX_CALLS = int(os.environ.get("DB_TRACE_MAX_CALLS", 10))
+MAX_BYTES = int(os.environ.get("DB_TRACE_MAX_BYTES", 1_000_000))
+N1_THRESHOLD = int(os.environ.get("DB_TRACE_N1_THRESHOLD", 5))
+
+OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+FILTERS = {"eq", "neq", "lt", "gt", "lte", "gte", "in_", "is_", "like", "ilike", "match", "or_"}
+
+
+@dataclass
+class CallRecord:
+    table: str
+    operation: str
+    filters: List[str]
+    latency_ms: float
+    rows: int
+    bytes: int
+
+    @property
+    def shape(self) -> str:
+        """Query shape without values, used to spot N+1 patterns"""
+        columns = ",".join(f.split("=")[0] for f in self.filters)
+        return f"{self.operation} {self.table}({columns})"
+
+
+@dataclass
+class RequestTrace:
+    calls: List[CallRecord] = field(default_factory=list)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(c.bytes for c in self.calls)
+
+    @property
+    def total_latency_ms(self) -> float:
+        return sum(c.latency_ms for c in self.calls)
+
+    def repeated_shapes(self) -> Dict[str, int]:
+        counts = Counter(c.shape for c in self.calls)
+        return {shape: n for shape, n in counts.items() if n >= N1_THRESHOLD}
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("db_trace", default=None)
+_route_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+# Called with each CallRecord (metrics and other observers hook in here)
+call_listeners = []
+
+
+def start_request() -> None:
+    _current_trace.set(RequestTrace())
+
+
+def finish_request(route: str, trace: Optional[RequestTrace] = None) -> Optional[RequestTrace]:
+    """Close the current (or the given) trace, fold it into the route stats and warn on offenders"""
+    if trace is None:
+        trace = _current_trace.get()
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+    if trace is None:
+        return None
+    repeated = trace.repeated_shapes()
+    with _stats_lock:
+        stats = _route_stats.setdefault(route, {
+            "requests": 0, "calls": 0, "max_calls": 0, "bytes": 0, "max_bytes": 0,
+            "db_ms": 0.0, "warnings": 0, "n_plus_one": Counter()
+        })
+        stats["requests"] += 1
+        stats["calls"] += len(trace.calls)
+        stats["max_calls"] = max(stats["max_calls"], len(trace.calls))
+        stats["bytes"] += trace.total_bytes
+        stats["max_bytes"] = max(stats["max_bytes"], trace.total_bytes)
+        stats["db_ms"] += trace.total_latency_ms
+        stats["n_plus_one"].update(repeated.keys())
+        offender = len(trace.calls) > MAX_CALLS or trace.total_bytes > MAX_BYTES or repeated
+        if offender:
+            stats["warnings"] += 1
+    if offender:
+        logger.warning(
+            "DB trace %s: %d llamadas, %d bytes, %.1f ms%s", route, len(trace.calls),
+            trace.total_bytes, trace.total_latency_ms,
+            f", posible N+1: {repeated}" if repeated else ""
+        )
+    return trace
+
+
+def finish_response(route: str, response) -> None:
+    """finish_request() now, or when a streamed response is closed (its queries run while it is sent)"""
+    if getattr(response, "is_streamed", False):
+        trace = _current_trace.get()
+        response.call_on_close(lambda: finish_request(route, trace))
+    else:
+        finish_request(route)
+
+
+def top_routes(limit: int = 10, sort: str = "calls") -> List[Dict[str, Any]]:
+    """Per-route stats ordered by average calls (sort='calls'), bytes or db_ms per request"""
+    rows = []
+    with _stats_lock:
+        for route, s in _route_stats.items():
+            n = s["requests"]
+            rows.append({
+                "route": route,
+                "requests": n,
+                "avg_calls": round(s["calls"] / n, 1),
+                "max_calls": s["max_calls"],
+                "avg_bytes": int(s["bytes"] / n),
+                "max_bytes": s["max_bytes"],
+                "avg_db_ms": round(s["db_ms"] / n, 1),
+                "warnings": s["warnings"],
+                "n_plus_one": dict(s["n_plus_one"]),
+            })
+    key = {"calls": "avg_calls", "bytes": "avg_bytes", "db_ms": "avg_db_ms"}.get(sort, "avg_calls")
+    return sorted(rows, key=lambda r: r[key], reverse=True)[:limit]
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _route_stats.clear()
+
+
+def _record(call: CallRecord) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.calls.append(call)
+    for listener in call_listeners:
+        listener(call)
+
+
+def _response_size(data: Any) -> int:
+    try:
+        return len(json.dumps(data, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _TracedQuery:
+    """Proxy over a query builder that records the chain and times execute()"""
+    def __init__(self, builder, table: str, operation: str = "select"):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._filters: List[str] = []
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if name in OPERATIONS:
+                self._operation = name
+            elif name in FILTERS and args:
+                value = str(args[1])[:40] if len(args) > 1 else ""
+                self._filters.append(f"{name}:{args[0]}={value}")
+            if hasattr(result, "execute"):
+                self._builder = result
+                return self
+            return result
+        return call
+
+    def execute(self):
+        start = time.perf_counter()
+        response = self._builder.execute()
+        data = getattr(response, "data", None)
+        _record(CallRecord(
+            table=self._table,
+            operation=self._operation,
+            filters=self._filters,
+            latency_ms=(time.perf_counter() - start) * 1000,
+            rows=len(data) if isinstance(data, list) else int(data is not None),
+            bytes=_response_size(data),
+        ))
+        return response
+
+
+class TracingClient:
+    """Wraps a Supabase (or fake) client so every executed query is traced"""
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _TracedQuery(self._client.table(name), name)
+
+    def rpc(self, name: str, *args, **kwargs):
+        return _TracedQuery(self._client.rpc(name, *args, **kwargs), f"rpc:{name}", "rpc")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def trace_client(client):
+    """Wrap `client` for tracing unless DB_TRACE=0 (or it is already wrapped)"""
+    if not TRACE_ENABLED or isinstance(client, TracingClient):
+        return client
+    return TracingClient(client)
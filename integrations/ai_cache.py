@@ -0,0 +1,185 @@
+"""
+Response cache for repeated AI consultant questions.
+
+Answers are keyed by the normalized question (lowercase, no accents or punctuation)
+plus the scheduling input version, so any change to the backlog or the plant
+configuration makes them miss. Entries expire after AI_CACHE_TTL seconds and the
+least recently used are evicted beyond AI_CACHE_SIZE.
+
+Optionally (AI_CACHE_SIMILARITY > 0) near-duplicate questions ("¿qué está pendiente
+de 12000?" / "que hay pendiente para 12000") can also hit: each question is embedded
+locally by hashing its word unigrams/bigrams and character trigrams (Spanish
+stopwords dropped) into a fixed-size vector, and the most similar cached question of
+the same version is used when the cosine similarity is at least AI_CACHE_SIMILARITY
+and both mention exactly the same numbers, negations and comparative qualifiers (so
+6000 never answers for 12000, "no prioritarias" for "prioritarias" nor "prioridad
+baja" for "prioridad alta"). Other opposites can still slip through, so the default
+is exact matches only; 0.85 is a reasonable threshold when enabling it.
+
+    AI_CACHE_SIZE=256
+    AI_CACHE_TTL=600
+    AI_CACHE_SIMILARITY=0     (exact matches only)
+"""
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+AI_CACHE_SIZE = int(os.environ.get("AI_CACHE_SIZE", 256))
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", 600))
+AI_CACHE_SIMILARITY = float(os.environ.get("AI_CACHE_SIMILARITY", 0))
+
+VECTOR_DIM = 512
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+# Ignored by the similarity match (kept in the exact key)
+STOPWORDS = frozenset(
+    "a al con de del el en es esta estan hay la las lo los me para por se son su sus un una y".split())
+# Words that flip the meaning: must be the same for a similar hit
+NEGATIONS = frozenset("no sin ni nunca excepto".split())
+# Comparatives and qualifiers whose opposite asks for a different answer (mayor/menor, alta/baja...)
+QUALIFIERS = frozenset((
+    "mayor menor mas menos mejor peor maximo maxima minimo minima "
+    "alta alto altas altos baja bajo bajas bajos "
+    "lenta lento lentas lentos rapida rapido rapidas rapidos "
+    "primero primera primeros primeras ultimo ultima ultimos ultimas "
+    "antes despues hoy manana ayer ascendente descendente"
+).split())
+
+
+def normalize(question: str) -> str:
+    """Lowercase, accents and punctuation removed, single spaces"""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_WORD_RE.findall(text))
+
+
+def guard_terms(normalized: str) -> FrozenSet[str]:
+    """Numbers, negations and qualifiers of a question: similar questions must share them exactly"""
+    words = normalized.split()
+    return frozenset(w for w in words if w in NEGATIONS or w in QUALIFIERS or _NUMBER_RE.fullmatch(w))
+
+
+def embed(normalized: str) -> Dict[int, float]:
+    """Sparse unit vector of hashed word 1-2 grams and character 3-grams"""
+    words = [w for w in normalized.split() if w not in STOPWORDS]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vector: Dict[int, float] = {}
+    for gram in grams:
+        slot = zlib.crc32(gram.encode()) % VECTOR_DIM
+        vector[slot] = vector.get(slot, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class _Entry:
+    __slots__ = ("answer", "vector", "guards", "created")
+
+    def __init__(self, answer: str, vector: Dict[int, float], guards: FrozenSet[str]):
+        self.answer = answer
+        self.vector = vector
+        self.guards = guards
+        self.created = time.monotonic()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL,
+                 similarity: float = AI_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def get(self, question: str, version: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(answer, 'exact' | 'similar') or None. Never hits without an input version."""
+        if not version:
+            return None
+        normalized = normalize(question)
+        with self._lock:
+            entry = self._entries.get((version, normalized))
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end((version, normalized))
+                self.exact_hits += 1
+                return entry.answer, "exact"
+            if self.similarity > 0:
+                key = self._most_similar(version, normalized)
+                if key is not None:
+                    self._entries.move_to_end(key)
+                    self.similar_hits += 1
+                    return self._entries[key].answer, "similar"
+            self.misses += 1
+        return None
+
+    def _most_similar(self, version: str, normalized: str) -> Optional[Tuple[str, str]]:
+        vector = embed(normalized)
+        guards = guard_terms(normalized)
+        best, best_score = None, self.similarity
+        for key, entry in self._entries.items():
+            if key[0] != version or entry.guards != guards or self._expired(entry):
+                continue
+            score = cosine(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def put(self, question: str, version: Optional[str], answer: str) -> None:
+        if not version or not answer:
+            return
+        normalized = normalize(question)
+        entry = _Entry(answer, embed(normalized), guard_terms(normalized))
+        with self._lock:
+            self._entries[(version, normalized)] = entry
+            self._entries.move_to_end((version, normalized))
+            # Entries of an older input version can never hit again
+            for key in [k for k in self._entries if k[0] != version]:
+                del self._entries[key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "similarity_threshold": self.similarity,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            }
+
+
+# Process-wide cache shared by the chat routes
+ai_response_cache = ResponseCache()
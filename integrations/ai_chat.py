@@ -0,0 +1,72 @@
+"""
+OpenAI client and message assembly for the AI consultant (/api/ai_chat).
+
+    OPENAI_BACKEND=openai (default) | fake   fake = integrations/fake_openai.py, no network
+    OPENAI_MODEL=gpt-4o-mini
+    AI_CHAT_MODE=tools (default) | digest    tools = the model calls local functions
+                                             (integrations/ai_tools.py); digest = backlog
+                                             summary in the prompt (integrations/ai_context.py)
+
+The OpenAI SDK is imported on first use and the client is reused across requests.
+stream_completion() yields the answer as it is generated; closing the generator
+(e.g. when the browser disconnects) closes the upstream stream.
+"""
+import os
+import threading
+from typing import Any, Dict, Iterator, List
+
+AI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BACKEND = os.environ.get("OPENAI_BACKEND", "openai")
+AI_CHAT_MODE = os.environ.get("AI_CHAT_MODE", "tools")
+
+SYSTEM_PROMPT = (
+    "Eres el asistente inteligente de la planta Ciplas. "
+    "Responde de forma profesional y técnica, usando solo los datos del resumen del backlog.\n\n"
+    "{context}"
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Process-wide client (the fake one with OPENAI_BACKEND=fake)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if OPENAI_BACKEND == "fake":
+                from .fake_openai import FakeOpenAI
+                _client = FakeOpenAI()
+            else:
+                from openai import OpenAI
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _client
+
+
+def build_messages(question: str, context: str) -> List[Dict[str, Any]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT.format(context=context)},
+        {"role": "user", "content": question},
+    ]
+
+
+def complete(client, messages: List[Dict[str, Any]], model: str = AI_MODEL) -> str:
+    response = client.chat.completions.create(model=model, messages=messages)
+    return response.choices[0].message.content
+
+
+def stream_completion(client, messages: List[Dict[str, Any]], model: str = AI_MODEL) -> Iterator[str]:
+    """Text deltas of a streamed completion, as they arrive"""
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+    finally:
+        # Stops the HTTP response from OpenAI when we stop early (client gone)
+        close = getattr(stream, "close", None)
+        if close:
+            close()
@@ -0,0 +1,142 @@
+"""
+Compact backlog digest for the AI consultant's system prompt.
+
+Instead of the raw order rows, the prompt gets an aggregated summary:
+
+    - totals per denier (pending kg, references, priority kg, torsion kg/h)
+    - the top-N priority references by pending kg
+    - torsion machine capacities (kg/h per denier)
+
+The digest is kept under AI_CONTEXT_TOKENS (estimated at ~4 characters per token):
+the priority list is shortened first, then the smallest deniers are folded into a
+remainder line. It is cached against the scheduling input version, so repeated
+questions on an unchanged backlog cost no database reads.
+
+    AI_CONTEXT_TOKENS=1500   token budget of the digest
+    AI_CONTEXT_TOP_N=15      priority references listed (before budget trimming)
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from logic.backlog import MIN_PENDING_KG, backlog_cache
+from logic.deniers import denier_sort_key
+
+AI_CONTEXT_TOKENS = int(os.environ.get("AI_CONTEXT_TOKENS", 1500))
+AI_CONTEXT_TOP_N = int(os.environ.get("AI_CONTEXT_TOP_N", 15))
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for mixed Spanish text and numbers)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _kg(value: float) -> str:
+    return f"{value:,.0f} kg"
+
+
+def denier_totals(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Pending kg, reference count and priority kg per denier ('Desconocido' when unknown)"""
+    totals: Dict[str, Dict[str, float]] = {}
+    for e in entries:
+        if e['kg'] <= MIN_PENDING_KG:
+            continue
+        t = totals.setdefault(e['denier'] or 'Desconocido', {"kg": 0.0, "refs": 0, "kg_prioridad": 0.0})
+        t["kg"] += e['kg']
+        t["refs"] += 1
+        if e['prioridad']:
+            t["kg_prioridad"] += e['kg']
+    return totals
+
+
+def priority_references(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Priority rows with pending kg, largest first"""
+    rows = [e for e in entries if e['prioridad'] and e['kg'] > MIN_PENDING_KG]
+    return sorted(rows, key=lambda e: -e['kg'])
+
+
+def machine_capacities(torsion_capacities: Dict[str, Any]) -> Dict[str, List[Tuple[str, float]]]:
+    """machine_id -> [(denier, kg/h)] from get_all_scheduling_data()['torsion_capacities']"""
+    machines: Dict[str, List[Tuple[str, float]]] = {}
+    for denier in sorted(torsion_capacities, key=denier_sort_key):
+        for m in torsion_capacities[denier].get('machines', []):
+            machines.setdefault(m['machine_id'], []).append((str(denier), m['kgh']))
+    return dict(sorted(machines.items()))
+
+
+def render_digest(entries: List[Dict[str, Any]], torsion_capacities: Dict[str, Any],
+                  budget: int = AI_CONTEXT_TOKENS, top_n: int = AI_CONTEXT_TOP_N) -> str:
+    """Digest text within `budget` tokens"""
+    totals = denier_totals(entries)
+    priority = priority_references(entries)
+    machines = machine_capacities(torsion_capacities)
+
+    kg_total = sum(t["kg"] for t in totals.values())
+    header = (f"Backlog pendiente: {sum(int(t['refs']) for t in totals.values())} referencias, {_kg(kg_total)}; "
+              f"{len(priority)} prioritarias ({_kg(sum(e['kg'] for e in priority))}).")
+
+    def denier_line(denier: str) -> str:
+        t = totals[denier]
+        cap = torsion_capacities.get(denier, {}).get('total_kgh', 0)
+        return (f"- {denier}: {_kg(t['kg'])} | {int(t['refs'])} refs | prioridad {_kg(t['kg_prioridad'])}"
+                f" | torsión {cap:.1f} kg/h")
+
+    machine_lines = [f"- {m}: " + ", ".join(f"{d}={kgh:.1f}" for d, kgh in caps) for m, caps in machines.items()]
+
+    def render(deniers: List[str], n_priority: int) -> str:
+        lines = [header, "", "Por denier (kg pendientes | referencias | kg prioritarios | capacidad torsión):"]
+        lines += [denier_line(d) for d in sorted(deniers, key=denier_sort_key)]
+        rest = [d for d in totals if d not in deniers]
+        if rest:
+            lines.append(f"- otros {len(rest)} deniers: {_kg(sum(totals[d]['kg'] for d in rest))}")
+        if n_priority:
+            lines += ["", f"Referencias prioritarias (top {n_priority} por kg):"]
+            lines += [f"- {e['codigo']} {e['descripcion'][:40]} ({e['denier'] or '?'}): {_kg(e['kg'])}"
+                      for e in priority[:n_priority]]
+        if machine_lines:
+            lines += ["", "Máquinas de torsión (kg/h por denier):"] + machine_lines
+        return "\n".join(lines)
+
+    # Largest deniers are kept when the list has to be folded
+    deniers = sorted(totals, key=lambda d: -totals[d]["kg"])
+    n_priority = min(top_n, len(priority))
+    text = render(deniers, n_priority)
+    while estimate_tokens(text) > budget and n_priority:
+        n_priority //= 2
+        text = render(deniers, n_priority)
+    while estimate_tokens(text) > budget and deniers:
+        deniers = deniers[:-1]
+        text = render(deniers, n_priority)
+    return text[:budget * CHARS_PER_TOKEN]
+
+
+class ContextBuilder:
+    """Digest cached against the scheduling input version (no caching when it is unavailable)"""
+
+    def __init__(self, backlog=backlog_cache, budget: int = AI_CONTEXT_TOKENS, top_n: int = AI_CONTEXT_TOP_N):
+        self.backlog = backlog
+        self.budget = budget
+        self.top_n = top_n
+        self._version: Optional[str] = None
+        self._text = ""
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def digest(self, db, input_version: str = None) -> str:
+        version = input_version or db.get_input_version()
+        with self._lock:
+            if version is not None and version == self._version:
+                return self._text
+        entries = self.backlog.entries(db, version)
+        capacities = db.get_all_scheduling_data(version)['torsion_capacities']
+        text = render_digest(entries, capacities, self.budget, self.top_n)
+        with self._lock:
+            self._version, self._text = version, text
+            self.builds += 1
+        return text
+
+
+# Process-wide digest shared by the chat routes
+ai_context = ContextBuilder()
@@ -0,0 +1,286 @@
+"""
+Local functions the AI consultant can call instead of reading the backlog from its prompt.
+
+    buscar_backlog        backlog rows by denier / code prefix / priority (largest first)
+    resumen_backlog       pending kg, references and priority kg per denier
+    capacidad_torsion     torsion kg/h per machine for a denier, with optional what-if
+                          rpm / torsiones_metro / husos (get_kgh_torsion)
+    simular_programa      quick what-if run of generate_torsion_schedule on the backlog
+                          (optionally only some deniers, other machine assignments)
+
+chat_with_tools() runs the model/function loop: every round the model either answers
+or asks for calls, which run locally against the shared backlog materialization and
+the cached scheduling data; only their small JSON results go back to the model.
+
+    AI_TOOL_ROUNDS=5              rounds of calls before the model must answer
+    AI_TOOL_RESULT_CHARS=4000     cap on each function result sent back
+"""
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from logic.backlog import MIN_PENDING_KG, backlog_cache
+from logic.deniers import Denier, denier_key, denier_sort_key, resolve_denier
+from logic.formulas import get_kgh_torsion
+from integrations.ai_chat import AI_MODEL
+from integrations.ai_context import denier_totals
+
+AI_TOOL_ROUNDS = int(os.environ.get("AI_TOOL_ROUNDS", 5))
+AI_TOOL_RESULT_CHARS = int(os.environ.get("AI_TOOL_RESULT_CHARS", 4000))
+
+# What-if simulations are capped so a chat question stays a quick run
+MAX_SIMULATION_DAYS = 30
+
+TOOLS_SYSTEM_PROMPT = (
+    "Eres el asistente inteligente de la planta Ciplas. Responde de forma profesional y técnica. "
+    "No tienes el backlog en el contexto: consulta los datos con las funciones disponibles y usa "
+    "exactamente las cifras que devuelven, sin inventar valores. Kg y kg/h redondeados a una decimal."
+)
+
+
+def _object(properties: Dict[str, Any], required: List[str] = ()) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": list(required)}
+
+
+TOOL_SPECS = [
+    {"type": "function", "function": {
+        "name": "buscar_backlog",
+        "description": "Referencias pendientes del backlog, de mayor a menor kg pendiente.",
+        "parameters": _object({
+            "denier": {"type": "string", "description": "Denier, p. ej. '12000' o '6000 expo'"},
+            "codigo": {"type": "string", "description": "Prefijo del código de la cabuya"},
+            "solo_prioritarias": {"type": "boolean"},
+            "limite": {"type": "integer", "description": "Máximo de referencias (por defecto 10)"},
+        })}},
+    {"type": "function", "function": {
+        "name": "resumen_backlog",
+        "description": "Kg pendientes, número de referencias y kg prioritarios por denier.",
+        "parameters": _object({})}},
+    {"type": "function", "function": {
+        "name": "capacidad_torsion",
+        "description": "Capacidad de torsión (kg/h) por máquina para un denier y horas para terminar "
+                       "su pendiente. rpm, torsiones_metro y husos simulan otra configuración.",
+        "parameters": _object({
+            "denier": {"type": "string"},
+            "maquina": {"type": "string", "description": "T11, T12, T14, T15 o T16"},
+            "rpm": {"type": "number"},
+            "torsiones_metro": {"type": "number"},
+            "husos": {"type": "integer"},
+        }, ["denier"])}},
+    {"type": "function", "function": {
+        "name": "simular_programa",
+        "description": "Simula el programa de torsión sobre el backlog actual y devuelve kg, días y "
+                       "resumen por denier y por máquina.",
+        "parameters": _object({
+            "deniers": {"type": "array", "items": {"type": "string"},
+                        "description": "Solo estos deniers (por defecto todo el backlog)"},
+            "asignaciones": {"type": "object",
+                             "description": "Máquina -> deniers permitidos, p. ej. {\"T11\": [\"6000\"]}",
+                             "additionalProperties": {"type": "array", "items": {"type": "string"}}},
+            "max_dias": {"type": "integer", "description": f"Horizonte en días (máximo {MAX_SIMULATION_DAYS})"},
+        })}},
+]
+
+
+class Toolbox:
+    """The functions of TOOL_SPECS bound to one request's DB and input version"""
+
+    def __init__(self, db, input_version: str = None):
+        self.db = db
+        self.input_version = input_version
+        self._entries = None
+        self._scheduling = None
+
+    @property
+    def entries(self) -> List[Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = backlog_cache.entries(self.db, self.input_version)
+        return self._entries
+
+    @property
+    def scheduling(self) -> Dict[str, Any]:
+        if self._scheduling is None:
+            self._scheduling = self.db.get_all_scheduling_data(self.input_version)
+        return self._scheduling
+
+    def call(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Run one function; the JSON result (or error) for the model, capped in size"""
+        fn: Optional[Callable] = getattr(self, name, None) if name in TOOL_NAMES else None
+        if fn is None:
+            result = {"error": f"Función desconocida: {name}"}
+        else:
+            try:
+                result = fn(**arguments)
+            except TypeError as e:
+                result = {"error": f"Argumentos inválidos: {e}"}
+            except Exception as e:
+                result = {"error": str(e)}
+        text = json.dumps(result, ensure_ascii=False, default=str)
+        if len(text) > AI_TOOL_RESULT_CHARS:
+            text = text[:AI_TOOL_RESULT_CHARS] + "...(truncado)"
+        return text
+
+    # --- Functions ---
+    def buscar_backlog(self, denier: str = None, codigo: str = None, solo_prioritarias: bool = False,
+                       limite: int = 10) -> Dict[str, Any]:
+        rows = [e for e in self.entries if e['kg'] > MIN_PENDING_KG]
+        if denier:
+            wanted = denier_key(denier)
+            rows = [e for e in rows if e['denier'] == wanted]
+        if codigo:
+            prefix = codigo.strip().upper()
+            rows = [e for e in rows if e['codigo'].upper().startswith(prefix)]
+        if solo_prioritarias:
+            rows = [e for e in rows if e['prioridad']]
+        rows = sorted(rows, key=lambda e: -e['kg'])
+        limite = max(1, min(int(limite), 50))
+        return {
+            "referencias": len(rows),
+            "kg_total": round(sum(e['kg'] for e in rows), 1),
+            "items": [{"codigo": e['codigo'], "descripcion": e['descripcion'], "denier": e['denier'],
+                       "kg": round(e['kg'], 1), "prioridad": e['prioridad'], "origen": e['origen']}
+                      for e in rows[:limite]],
+        }
+
+    def resumen_backlog(self) -> Dict[str, Any]:
+        totals = denier_totals(self.entries)
+        return {
+            "kg_total": round(sum(t["kg"] for t in totals.values()), 1),
+            "por_denier": [{"denier": d, "kg": round(t["kg"], 1), "referencias": int(t["refs"]),
+                            "kg_prioritarios": round(t["kg_prioridad"], 1)}
+                           for d, t in sorted(totals.items(), key=lambda kv: denier_sort_key(kv[0]))],
+        }
+
+    def capacidad_torsion(self, denier: str, maquina: str = None, rpm: float = None,
+                          torsiones_metro: float = None, husos: int = None) -> Dict[str, Any]:
+        d = resolve_denier(denier)
+        if d is None:
+            return {"error": f"Denier no reconocido: {denier}"}
+        capacities = self.scheduling['torsion_capacities']
+        # Variants run on their base denier's machines, as in the planner (get_machine_kgh)
+        config = capacities.get(d) or capacities.get(Denier(d.base)) or {"machines": []}
+        machines = []
+        for m in config['machines']:
+            if maquina and m['machine_id'] != maquina.upper():
+                continue
+            params = {"rpm": rpm or m['rpm'], "torsiones_metro": torsiones_metro or m['torsiones_metro'],
+                      "husos": husos or m['husos']}
+            # Same theoretical capacity (OEE 100%, no waste) the scheduler uses
+            kgh = get_kgh_torsion(denier=d.base, oee=1.0, desperdicio=0.0, **params)
+            machines.append({"maquina": m['machine_id'], "kgh": round(kgh, 2), **params})
+        total_kgh = sum(m["kgh"] for m in machines)
+        pending = sum(e['kg'] for e in self.entries if e['denier'] == d and e['kg'] > MIN_PENDING_KG)
+        return {
+            "denier": d,
+            "maquinas": machines,
+            "kgh_total": round(total_kgh, 2),
+            "kg_pendientes": round(pending, 1),
+            "horas_para_pendiente": round(pending / total_kgh, 1) if total_kgh > 0 else None,
+        }
+
+    def simular_programa(self, deniers: List[str] = None, asignaciones: Dict[str, List[str]] = None,
+                         max_dias: int = 14) -> Dict[str, Any]:
+        from integrations.openai_ia import generate_torsion_schedule
+
+        summary = backlog_cache.summary(self.db, self.input_version)
+        if deniers:
+            wanted = {denier_key(d) for d in deniers}
+            summary = {code: row for code, row in summary.items() if row['denier'] in wanted}
+        overrides = {m.upper(): {"refs": refs} for m, refs in (asignaciones or {}).items()}
+        result = generate_torsion_schedule(summary, self.scheduling['torsion_capacities'],
+                                           max_days=max(1, min(int(max_dias), MAX_SIMULATION_DAYS)),
+                                           torsion_overrides=overrides or None)
+        planned = result['resumen_programa']['total_kg']
+        backlog_kg = sum(row['kg_total'] for row in summary.values())
+        return {
+            "kg_backlog": round(backlog_kg, 1),
+            "kg_programados": round(planned, 1),
+            # 'fecha' is "<YYYY-MM-DD> Turno <n>"
+            "dias_con_produccion": len({t['fecha'].split()[0] for t in result['tabla_turnos']}),
+            "turnos_con_produccion": len(result['tabla_turnos']),
+            "por_denier": result['resumen_denier'],
+            "por_maquina": [{**m, "referencias": len(m['referencias'])} for m in result['resumen_maquinas']],
+        }
+
+
+TOOL_NAMES = {spec["function"]["name"] for spec in TOOL_SPECS}
+
+
+def build_messages(question: str) -> List[Dict[str, Any]]:
+    return [
+        {"role": "system", "content": TOOLS_SYSTEM_PROMPT},
+        {"role": "user", "content": question},
+    ]
+
+
+def _parse_arguments(raw: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    try:
+        args = json.loads(raw or "{}")
+    except ValueError:
+        return {}, "JSON de argumentos inválido"
+    return (args, None) if isinstance(args, dict) else ({}, "Los argumentos deben ser un objeto")
+
+
+def _round(client, messages, model, tools, tool_choice) -> Tuple[str, List[Dict[str, str]]]:
+    response = client.chat.completions.create(model=model, messages=messages, tools=tools, tool_choice=tool_choice)
+    message = response.choices[0].message
+    calls = [{"id": c.id, "name": c.function.name, "arguments": c.function.arguments}
+             for c in (getattr(message, "tool_calls", None) or [])]
+    return message.content or "", calls
+
+
+def _streamed_round(client, messages, model, tools, tool_choice):
+    """Yields {'text': delta} as the answer arrives; returns (content, calls) with the
+    tool call fragments of the stream reassembled"""
+    stream = client.chat.completions.create(model=model, messages=messages, tools=tools,
+                                            tool_choice=tool_choice, stream=True)
+    parts: List[str] = []
+    calls: Dict[int, Dict[str, str]] = {}
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                parts.append(delta.content)
+                yield {"text": delta.content}
+            for fragment in getattr(delta, "tool_calls", None) or []:
+                call = calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": ""})
+                call["id"] = fragment.id or call["id"]
+                if fragment.function is not None:
+                    call["name"] += fragment.function.name or ""
+                    call["arguments"] += fragment.function.arguments or ""
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return "".join(parts), [calls[i] for i in sorted(calls)]
+
+
+def chat_with_tools(client, messages: List[Dict[str, Any]], toolbox: Toolbox, model: str = AI_MODEL,
+                    stream: bool = False, max_rounds: int = AI_TOOL_ROUNDS) -> Iterator[Dict[str, Any]]:
+    """Model/function loop. Yields {'tool': name, 'arguments': {...}} for each local call
+    and {'text': ...} for the answer (chunk by chunk when streaming)."""
+    messages = list(messages)
+    for round_no in range(max_rounds + 1):
+        # Last round: the model has to answer with what it already has
+        tool_choice = "none" if round_no == max_rounds else "auto"
+        if stream:
+            content, calls = yield from _streamed_round(client, messages, model, TOOL_SPECS, tool_choice)
+        else:
+            content, calls = _round(client, messages, model, TOOL_SPECS, tool_choice)
+            if content and not calls:
+                yield {"text": content}
+        if not calls:
+            return
+        messages.append({
+            "role": "assistant",
+            "content": content or None,
+            "tool_calls": [{"id": c["id"], "type": "function",
+                            "function": {"name": c["name"], "arguments": c["arguments"]}} for c in calls],
+        })
+        for call in calls:
+            args, error = _parse_arguments(call["arguments"])
+            yield {"tool": call["name"], "arguments": args}
+            result = json.dumps({"error": error}, ensure_ascii=False) if error else toolbox.call(call["name"], args)
+            messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
@@ -0,0 +1,116 @@
+"""
+Offline stand-in for the OpenAI client, for hermetic tests and local development.
+
+Implements the subset the AI consultant uses:
+    chat.completions.create(model=..., messages=[...], tools=[...], stream=False|True)
+Select it with OPENAI_BACKEND=fake, or pass it wherever a client is expected.
+
+    client = FakeOpenAI(replies=[
+        {"tool_calls": [{"name": "buscar_backlog", "arguments": {"denier": "12000"}}]},
+        lambda messages: f"Resultado: {messages[-1]['content']}",
+    ], chunk_delay=0.05)
+    client.chat.completions.create(model="gpt-4o-mini", messages=[...])
+    client.requests   # every create() call, with its keyword arguments
+    client.streams    # every stream=True response (.closed, .chunks_sent)
+
+Queued replies are used in order, one per create() call: a string is the answer,
+{"tool_calls": [...]} asks for local function calls, and a callable receives the
+messages and returns either. Without replies the answer echoes the question and
+the size of the prompt it received.
+"""
+import json
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+def _message(content: str) -> SimpleNamespace:
+    return SimpleNamespace(role="assistant", content=content)
+
+
+def _tool_calls(calls: List[Dict[str, Any]], offset: int) -> List[SimpleNamespace]:
+    return [SimpleNamespace(id=f"call_{offset + i}", type="function",
+                            function=SimpleNamespace(name=c["name"], arguments=json.dumps(c.get("arguments", {}))))
+            for i, c in enumerate(calls)]
+
+
+def _completion(content: Optional[str], prompt_chars: int, tool_calls: List[SimpleNamespace] = None) -> SimpleNamespace:
+    message = _message(content)
+    message.tool_calls = tool_calls or None
+    usage = SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=len(content or "") // 4)
+    finish = "tool_calls" if tool_calls else "stop"
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason=finish)], usage=usage)
+
+
+class FakeStream:
+    """Iterator of completion chunks (word by word, tool call arguments in two
+    fragments), like openai.Stream"""
+
+    def __init__(self, content: str, delay: float = 0.0, tool_calls: List[SimpleNamespace] = None):
+        self._pieces = re.findall(r"\S+\s*|\s+", content or "")
+        self._tool_calls = tool_calls or []
+        self._delay = delay
+        self.chunks_sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self._pieces:
+            if self.closed:
+                return
+            if self._delay:
+                time.sleep(self._delay)
+            self.chunks_sent += 1
+            delta = SimpleNamespace(role="assistant", content=piece, tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        for index, call in enumerate(self._tool_calls):
+            args = call.function.arguments
+            for first, fragment in ((True, args[:len(args) // 2]), (False, args[len(args) // 2:])):
+                if self.closed:
+                    return
+                self.chunks_sent += 1
+                function = SimpleNamespace(name=call.function.name if first else None, arguments=fragment)
+                delta_call = SimpleNamespace(index=index, id=call.id if first else None,
+                                             type="function" if first else None, function=function)
+                delta = SimpleNamespace(role="assistant", content=None, tool_calls=[delta_call])
+                yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        self.closed = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _Completions:
+    def __init__(self, client: "FakeOpenAI"):
+        self._client = client
+
+    def create(self, **kwargs) -> Any:
+        # Snapshot of the conversation as sent (callers keep appending to their list)
+        messages = list(kwargs.get("messages") or [])
+        self._client.requests.append(dict(kwargs, messages=messages))
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        if self._client.replies:
+            reply = self._client.replies.pop(0)
+            if callable(reply):
+                reply = reply(messages)
+        else:
+            question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+            reply = f"(respuesta simulada) {question} [contexto: {prompt_chars} caracteres]"
+        content, tool_calls = reply, None
+        if isinstance(reply, dict):
+            content = reply.get("content")
+            tool_calls = _tool_calls(reply.get("tool_calls", []), len(self._client.requests))
+        if kwargs.get("stream"):
+            stream = FakeStream(content, self._client.chunk_delay, tool_calls)
+            self._client.streams.append(stream)
+            return stream
+        return _completion(content, prompt_chars, tool_calls)
+
+
+class FakeOpenAI:
+    def __init__(self, replies: List[str] = None, chunk_delay: float = 0.0):
+        self.replies = list(replies or [])
+        self.chunk_delay = chunk_delay
+        self.requests: List[Dict[str, Any]] = []
+        self.streams: List[FakeStream] = []
+        self.chat = SimpleNamespace(completions=_Completions(self))
@@ -7,6 +7,8 @@ import logging
 from dataclasses import dataclass, field
 from copy import deepcopy
 
+from logic.deniers import Denier, resolve_denier
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -14,10 +16,13 @@ logger = logging.getLogger(__name__)
 # CLASES DE DATOS
 # ============================================================================
 
+class PlanCancelled(Exception):
+    """La simulación se detuvo porque se pidió cancelar (cancel_event)"""
+
 @dataclass
 class TorsionMachine:
     machine_id: str
-    denier: int
+    denier: Denier
     kgh: float
     husos: int = 1
     
@@ -31,7 +36,7 @@ class TorsionMachine:
 
 @dataclass
 class RewinderConfig:
-    denier: int
+    denier: Denier
     kg_per_hour: float
     n_optimo: int
 
@@ -39,7 +44,7 @@ class RewinderConfig:
 class BacklogItem:
     ref: str
     description: str
-    denier: int
+    denier: Denier
     kg_pending: float
     priority: int = 0
     kg_initial: float = field(default=0.0)
@@ -63,7 +68,7 @@ class TorsionFocusedOptimizer:
     """
     def __init__(self, 
                  torsion_machines: List[TorsionMachine], 
-                 rewinder_configs: Dict[int, RewinderConfig],
+                 rewinder_configs: Dict[Denier, RewinderConfig],
                  shift_hours: float = 8.0,
                  torsion_overrides: Dict[str, Any] = None):
         
@@ -74,7 +79,9 @@ class TorsionFocusedOptimizer:
         # Mapa de máquinas (ID -> Objeto TorsionMachine genérico o lista)
         # Como las máquinas vienen por denier, normalizamos
         self.machine_specs = {} # ID -> {kgh_base, husos}
+        self.kgh_index = {} # (ID, Denier) -> kgh
         for m in torsion_machines:
+            self.kgh_index.setdefault((m.machine_id, m.denier), m.kgh)
             # Asumimos que kgh puede variar por denier, pero guardamos referencia
             if m.machine_id not in self.machine_specs:
                 self.machine_specs[m.machine_id] = {'husos': m.husos}
@@ -97,14 +104,14 @@ class TorsionFocusedOptimizer:
         if torsion_overrides:
             for m_id, data in torsion_overrides.items():
                 if m_id in self.compatibility_rules:
-                    # Convert ref strings to deniers (ints)
-                    # Note: The overrides send 'refs' which are DENIERS in string format (e.g. "6000").
-                    # We need to ensure we store them as ints.
+                    # Convert ref strings to numeric deniers
+                    # Note: The overrides send 'refs' which are DENIERS in string format (e.g. "6000", "6000 EXPO").
+                    # Compatibility is decided on the numeric base.
                     allowed_deniers = set()
                     for r in data.get('refs', []):
-                        try:
-                            allowed_deniers.add(int(r))
-                        except: pass
+                        denier = resolve_denier(r)
+                        if denier is not None:
+                            allowed_deniers.add(denier.base)
                     
                     if allowed_deniers:
                         self.compatibility_rules[m_id] = allowed_deniers
@@ -114,21 +121,26 @@ class TorsionFocusedOptimizer:
         self.backup_machine = 'T16' 
         self.max_active_machines = 4
 
-    def get_machine_kgh(self, machine_id: str, denier: int) -> float:
-        """Busca el KGH específico para esa combinación en la data de entrada"""
-        for m in self.torsion_machines:
-            if m.machine_id == machine_id and m.denier == denier:
-                return m.kgh
-        return 0.0
+    def get_machine_kgh(self, machine_id: str, denier: Denier) -> float:
+        """Busca el KGH específico para esa combinación en la data de entrada.
+        Variantes sin config propia ('6000 expo') usan la del denier base."""
+        kgh = self.kgh_index.get((machine_id, denier))
+        if kgh is None and denier.variant:
+            kgh = self.kgh_index.get((machine_id, Denier(denier.base)))
+        return kgh or 0.0
 
-    def calculate_machine_hours(self, denier: int, kg: float, machine_id: str) -> float:
+    def calculate_machine_hours(self, denier: Denier, kg: float, machine_id: str) -> float:
         kgh = self.get_machine_kgh(machine_id, denier)
         if kgh <= 0: return float('inf')
         return kg / kgh
 
-    def plan_production(self, backlog_items: List[BacklogItem], max_days: int = 60) -> Dict[str, Any]:
+    def plan_production(self, backlog_items: List[BacklogItem], max_days: int = 60,
+                        progress_callback=None, cancel_event=None) -> Dict[str, Any]:
         """
         Simulación basada en eventos discretos (Shift-based).
+        progress_callback(dict) se llama al final de cada turno con la fecha simulada,
+        el % de kg completado y las máquinas activas; si cancel_event (threading.Event)
+        se activa, la simulación se detiene con PlanCancelled.
         """
         # 1. Agrupar Backlog por Denier
         items_by_denier = defaultdict(list)
@@ -150,7 +162,7 @@ class TorsionFocusedOptimizer:
             # Encontrar máquinas compatibles
             compatible_m = []
             for m_id, allowed_deniers in self.compatibility_rules.items():
-                if m_id in self.main_machines and item.denier in allowed_deniers:
+                if m_id in self.main_machines and item.denier.base in allowed_deniers:
                     compatible_m.append(m_id)
             
             if not compatible_m:
@@ -182,11 +194,15 @@ class TorsionFocusedOptimizer:
         
         current_date = datetime.now()
         total_shifts = max_days * 3
+        total_kg = sum(i.kg_pending for i in pending_items)
+        produced_kg = 0.0
         
         # Tracking global stats
         machine_stats = defaultdict(lambda: {'total_kg': 0, 'total_hours': 0, 'items': set()})
         
         for shift_idx in range(total_shifts):
+            if cancel_event is not None and cancel_event.is_set():
+                raise PlanCancelled()
             day_offset = shift_idx // 3
             turn_idx = shift_idx % 3
             shift_date = current_date + timedelta(days=day_offset)
@@ -280,7 +296,7 @@ class TorsionFocusedOptimizer:
                          for donor_id in self.main_machines:
                              # Solo robar si la donor NO está corriendo ya ese item (obvio, está en cola)
                              for idx, item in enumerate(machine_queues[donor_id]):
-                                 if item.denier == target_denier:
+                                 if item.denier.base == target_denier:
                                      # Robar item
                                      del machine_queues[donor_id][idx]
                                      # Asignar a T16
@@ -344,6 +360,16 @@ class TorsionFocusedOptimizer:
             if turn_data['maquinas_activas'] > 0:
                 schedule.append(turn_data)
             
+            if progress_callback:
+                produced_kg += turn_data['total_kg']
+                progress_callback({
+                    'fecha': turn_data['fecha'],
+                    'pct_kg': round(100 * produced_kg / total_kg, 1) if total_kg > 0 else 100.0,
+                    'maquinas_activas': turn_data['maquinas_activas'],
+                    'turno': shift_idx + 1,
+                    'total_turnos': total_shifts
+                })
+            
             # Si no hay nada produciendo en ningún turno futuro (colas vacias y estados nulos), terminar
             if not any(machine_queues.values()) and not any(active_state.values()):
                 break
@@ -419,7 +445,9 @@ def generate_torsion_schedule(
     torsion_capacities: Dict[str, Any],
     max_days: int = 60,
     torsion_overrides: Dict[str, Any] = None,
-    rewinder_overrides: Dict[str, Any] = None
+    rewinder_overrides: Dict[str, Any] = None,
+    progress_callback=None,
+    cancel_event=None
 ) -> Dict[str, Any]:
     
     # 1. Parsear Inputs
@@ -428,8 +456,10 @@ def generate_torsion_schedule(
     
     # Construir objetos TorsionMachine con datos reales de DB
     for d_str, data in torsion_capacities.items():
+        d = resolve_denier(d_str)
+        if d is None:
+            continue
         try:
-            d = int(d_str)
             for m in data.get('machines', []):
                 torsion_machines.append(TorsionMachine(
                     machine_id=m['machine_id'],
@@ -449,17 +479,19 @@ def generate_torsion_schedule(
     # Process Rewinder Overrides
     if rewinder_overrides:
         for d_str, n_val in rewinder_overrides.items():
-            try:
-                d = int(d_str)
+            d = resolve_denier(d_str)
+            if d is not None:
                 rewinder_configs[d] = RewinderConfig(denier=d, kg_per_hour=0, n_optimo=n_val)
-            except: pass
     
     backlog_items = []
     for code, data in backlog_summary.items():
+        denier = resolve_denier(data.get('denier'), data.get('description'))
+        if denier is None:
+            continue
         backlog_items.append(BacklogItem(
             ref=code,
             description=data.get('description', ''),
-            denier=int(data['denier']),
+            denier=denier,
             kg_pending=float(data['kg_total']),
             priority=int(data.get('priority', 0))
         ))
@@ -468,7 +500,7 @@ def generate_torsion_schedule(
     optimizer = TorsionFocusedOptimizer(torsion_machines, rewinder_configs, torsion_overrides=torsion_overrides)
     
     # 3. Correr Plan
-    result = optimizer.plan_production(backlog_items, max_days)
+    result = optimizer.plan_production(backlog_items, max_days, progress_callback, cancel_event)
     
     return {
         "resumen_programa": {
@@ -498,45 +530,25 @@ def generate_production_schedule(**kwargs):
         kwargs.get('torsion_capacities', {}),
         max_days=60,
         torsion_overrides=kwargs.get('torsion_overrides'),
-        rewinder_overrides=kwargs.get('rewinder_overrides')
+        rewinder_overrides=kwargs.get('rewinder_overrides'),
+        progress_callback=kwargs.get('progress_callback'),
+        cancel_event=kwargs.get('cancel_event')
     )
 
-def get_ai_optimization_scenario(orders, reports):
-    """Helper DB -> Model"""
+def get_ai_optimization_scenario(db, input_version: str = None) -> Dict[str, Any]:
+    """Escenario automático con el mismo pipeline que /api/generate_schedule:
+    capacidades de torsión calculadas por get_all_scheduling_data (cacheadas por
+    versión de insumos) y el backlog materializado compartido (backlog_cache).
+    El planificador de torsión no usa capacidades de rebobinado, así que no se pasan."""
+    from logic.backlog import backlog_cache
     try:
-        from db.queries import DBQueries
-        db = DBQueries()
-        
-        # Obtener configuraciones
-        m_configs = db.get_machine_denier_configs() or []
-        
-        torsion_capacities = defaultdict(lambda: {"machines": []})
-        for cfg in m_configs:
-            d = str(cfg.get('denier'))
-            kgh = float(cfg.get('kgh', 0))
-            if kgh > 0:
-                torsion_capacities[d]["machines"].append({
-                    "machine_id": cfg.get('machine_id'),
-                    "kgh": kgh,
-                    "husos": int(cfg.get('husos', 1))
-                })
-
-        backlog_summary = {}
-        for o in orders:
-             code = o.get('id_cabuya') or o.get('code')
-             if code:
-                 backlog_summary[code] = {
-                     'kg_total': float(o.get('kg_pendientes', 0)),
-                     'description': o.get('descripcion', ''),
-                     'denier': int(o.get('denier_obj', {}).get('name', '0') or 0),
-                     'priority': 0
-                 }
-
-        return generate_torsion_schedule(
-            backlog_summary,
-            dict(torsion_capacities)
+        version = input_version or db.get_input_version()
+        sc_data = db.get_all_scheduling_data(version)
+        backlog_summary = backlog_cache.summary(db, version)
+        return generate_production_schedule(
+            backlog_summary=backlog_summary,
+            torsion_capacities=sc_data['torsion_capacities']
         )
-        
     except Exception as e:
         logger.error(f"Error: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -0,0 +1,157 @@
+"""
+Canonical backlog materialization shared by /backlog (display) and the scheduler.
+
+One entry per backlog row of the pending_backlog view, with the rewinder process
+hours computed from a single rate source:
+
+    {codigo, descripcion, denier, kg, kg_total, prioridad, origen, order_id, h_proceso}
+
+The materialized list is cached against the scheduling input version and patched
+in place when a single order or requirement changes, so routes that write one row
+do not force a full rebuild. Patches carry the input version read before the write:
+when the cache was not built at that version (another worker or instance changed the
+inputs meanwhile) it is invalidated instead of being re-stamped as current.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from db.catalog import catalog
+from logic.deniers import denier_key
+
+BACKLOG_TTL = float(os.environ.get("BACKLOG_TTL", 300))
+
+# Rows at or below this many kg are considered done by the scheduler
+MIN_PENDING_KG = 0.1
+
+
+def build_entry(row: Dict[str, Any], kgh_map: Dict[str, float]) -> Dict[str, Any]:
+    """Turn one pending_backlog row into a canonical backlog entry"""
+    kg = row.get('kg') or 0
+    denier = denier_key(row.get('denier'), row.get('descripcion'))
+    kgh = kgh_map.get(denier, 0)
+    return {
+        'codigo': row['codigo'],
+        'descripcion': row.get('descripcion') or '',
+        'denier': denier,
+        'kg': kg,
+        'kg_total': row.get('kg_total') or 0,
+        'prioridad': bool(row.get('prioridad')),
+        'origen': row.get('origen'),
+        'order_id': row.get('order_id'),
+        'h_proceso': kg / kgh if kgh > 0 else 0
+    }
+
+
+def schedule_summary(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per-reference backlog for the planner: one row per codigo (automatic rows win
+    over manual orders for the same code), skipping finished rows and unknown deniers"""
+    summary = {}
+    for e in entries:
+        if e['kg'] <= MIN_PENDING_KG or not e['denier'] or e['codigo'] in summary:
+            continue
+        summary[e['codigo']] = {
+            'description': e['descripcion'],
+            'kg_total': e['kg'],
+            'is_priority': e['prioridad'],
+            'denier': e['denier'],
+            'h_proceso': e['h_proceso']
+        }
+    return summary
+
+
+def pending_kg_by_denier(rows: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Kg of negative requirements per canonical denier ('Desconocido' when unknown)"""
+    totals: Dict[str, float] = {}
+    for r in rows:
+        denier = denier_key(r.get('denier'), r.get('descripcion')) or 'Desconocido'
+        totals[denier] = totals.get(denier, 0) + abs(r.get('requerimientos') or 0)
+    return totals
+
+
+def _sort_key(entry: Dict[str, Any]):
+    # Same order as the view query: automatic first, largest kg first
+    return (entry['origen'] != 'Automatico', -entry['kg'])
+
+
+class BacklogMaterializer:
+    def __init__(self, ttl: float = BACKLOG_TTL):
+        self.ttl = ttl
+        self._version: Optional[str] = None
+        self._built_at = 0.0
+        self._entries: List[Dict[str, Any]] = []
+        self._kgh_map: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def _fresh(self, version: Optional[str]) -> bool:
+        return (
+            version is not None and version == self._version
+            and time.monotonic() - self._built_at < self.ttl
+        )
+
+    def entries(self, db, input_version: str = None) -> List[Dict[str, Any]]:
+        """Canonical backlog entries (shared list, do not mutate)"""
+        version = input_version or db.get_input_version()
+        with self._lock:
+            if self._fresh(version):
+                return self._entries
+        kgh_map = catalog.rewinder_kgh(db)
+        entries = [build_entry(row, kgh_map) for row in db.get_pending_backlog()]
+        with self._lock:
+            self._entries, self._kgh_map = entries, kgh_map
+            self._version, self._built_at = version, time.monotonic()
+            self.builds += 1
+        return entries
+
+    def summary(self, db, input_version: str = None) -> Dict[str, Dict[str, Any]]:
+        return schedule_summary(self.entries(db, input_version))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+
+    # --- Incremental updates (call after the write succeeded) ---
+    def _patch(self, db, base_version: Optional[str], mutate) -> None:
+        # The write changed the input version; re-stamp so the next read hits
+        version = db.get_input_version()
+        with self._lock:
+            if self._version is None:
+                return
+            if base_version is None or self._version != base_version:
+                # The cache does not hold the inputs this write was applied to
+                self._version = None
+                return
+            entries = list(self._entries)
+            mutate(entries)
+            entries.sort(key=_sort_key)
+            self._entries, self._version = entries, version
+
+    def refresh_order(self, db, order_id: str, base_version: Optional[str]) -> None:
+        """Re-read one manual order from the view (after create/update/delete).
+        base_version is db.get_input_version() read before the write."""
+        if self._version is None:
+            return
+        rows = db.get_pending_backlog(order_id=order_id)
+
+        def mutate(entries):
+            entries[:] = [e for e in entries if e['order_id'] != order_id]
+            entries.extend(build_entry(r, self._kgh_map) for r in rows)
+        self._patch(db, base_version, mutate)
+
+    def refresh_requirement(self, db, codigo: str, base_version: Optional[str]) -> None:
+        """Re-read the automatic requirement of one cabuya (after priority/stock changes).
+        base_version is db.get_input_version() read before the write."""
+        if self._version is None:
+            return
+        rows = [r for r in db.get_pending_backlog(codigo=codigo) if r['origen'] == 'Automatico']
+
+        def mutate(entries):
+            entries[:] = [e for e in entries if not (e['codigo'] == codigo and e['origen'] == 'Automatico')]
+            entries.extend(build_entry(r, self._kgh_map) for r in rows)
+        self._patch(db, base_version, mutate)
+
+
+# Process-wide materialization shared by all routes
+backlog_cache = BacklogMaterializer()
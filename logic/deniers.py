@@ -0,0 +1,109 @@
+"""
+Canonical denier keys.
+
+Deniers show up as floats (12000.0), ints, strings ('6000', '12000 EXPO') or only in
+the product description ('CABUYA ECO 12x1K'). resolve_denier() turns any of those
+into an interned Denier: a str subclass holding the canonical text ('12000',
+'12000 expo') plus the numeric base and the variant suffix. Because it compares
+and hashes as its text, a Denier works as a key in the existing string-keyed maps.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+_NUMERIC_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(.*?)\s*$')
+_DESCRIPTION_RE = re.compile(r'(\d+)\s*[xX]\s*1')
+
+
+class Denier(str):
+    """Interned canonical denier: Denier.of(6000) is Denier.of('6000.0')"""
+    _interned: Dict[str, "Denier"] = {}
+
+    base: int
+    variant: str
+
+    def __new__(cls, base: int, variant: str = ''):
+        variant = ' '.join(variant.lower().split())
+        text = f"{base} {variant}" if variant else str(base)
+        cached = cls._interned.get(text)
+        if cached is not None:
+            return cached
+        obj = super().__new__(cls, text)
+        obj.base = base
+        obj.variant = variant
+        return cls._interned.setdefault(text, obj)
+
+    def __reduce__(self):
+        return (Denier, (self.base, self.variant))
+
+    @property
+    def sort_key(self):
+        return (self.base, self.variant)
+
+    # Numeric order ('2500' < '12000'); plain strings compare as text
+    def __lt__(self, other):
+        if isinstance(other, Denier):
+            return self.sort_key < other.sort_key
+        return str.__lt__(self, other)
+
+    def __gt__(self, other):
+        if isinstance(other, Denier):
+            return self.sort_key > other.sort_key
+        return str.__gt__(self, other)
+
+    def __le__(self, other):
+        return self == other or self < other
+
+    def __ge__(self, other):
+        return self == other or self > other
+
+    __eq__ = str.__eq__
+    __hash__ = str.__hash__
+
+
+@lru_cache(maxsize=4096)
+def _parse(value: Any) -> Optional[Denier]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return Denier(int(value))
+    match = _NUMERIC_RE.match(str(value))
+    if not match:
+        return None
+    return Denier(int(float(match.group(1))), match.group(2))
+
+
+@lru_cache(maxsize=4096)
+def infer_denier_from_description(descripcion: Optional[str]) -> Optional[Denier]:
+    """Infer the denier from a product description when the denier column is null.
+    E.g. 'CABUYA ECO 12x1K VERDE' -> '12000', 'CABUYA CLA 9X1' -> '9000'
+    """
+    if not descripcion:
+        return None
+    match = _DESCRIPTION_RE.search(descripcion)
+    if match:
+        return Denier(int(match.group(1)) * 1000)
+    return None
+
+
+def resolve_denier(value: Any, descripcion: Optional[str] = None) -> Optional[Denier]:
+    """Canonical Denier for a raw denier value, falling back to the description"""
+    if value is not None and value != '':
+        denier = value if isinstance(value, Denier) else _parse(value)
+        if denier is not None:
+            return denier
+    return infer_denier_from_description(descripcion)
+
+
+def denier_key(value: Any, descripcion: Optional[str] = None) -> Optional[str]:
+    """resolve_denier(), keeping names that are not numeric ('Especial') as their own key"""
+    if value is not None and not isinstance(value, (bool, int, float)) and str(value).strip():
+        denier = _parse(value)
+        return denier if denier is not None else str(value).strip()
+    return resolve_denier(value, descripcion)
+
+
+def denier_sort_key(value: Any):
+    """Sort key for denier names: numeric base, then variant; unparseable names first"""
+    denier = resolve_denier(value)
+    return denier.sort_key if denier is not None else (0, str(value))
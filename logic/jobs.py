@@ -0,0 +1,163 @@
+"""
+Background jobs for long-running work (schedule generation).
+
+A job is submitted under a key; while a job with the same key is queued or running
+(or finished less than JOB_TTL seconds ago) the existing job is returned instead of
+starting another run, so identical requests from several users share one result.
+Keys that do not pin the input data (reuse_finished=False) only share in-flight jobs.
+A shared job counts its subscribers: cancel() detaches one of them and only stops
+the run when the last one has left, so closing one tab never cancels it for others.
+
+    SCHEDULE_WORKERS=2   worker threads
+    JOB_TTL=600          seconds a finished job (and its result) stays pollable
+
+The job function receives the Job and may report progress with job.update(...)
+and stop early when job.cancelled is set (any exception raised after a cancel
+request, e.g. JobCancelled, ends the job as cancelled).
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+SCHEDULE_WORKERS = int(os.environ.get("SCHEDULE_WORKERS", 2))
+JOB_TTL = float(os.environ.get("JOB_TTL", 600))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+FINISHED = {DONE, ERROR, CANCELLED}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function to stop after a cancel request"""
+
+
+@dataclass
+class Job:
+    key: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    subscribers: int = 1
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def update(self, **progress) -> None:
+        self.progress = {**self.progress, **progress}
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    def __init__(self, workers: int = SCHEDULE_WORKERS, ttl: float = JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def submit(self, key: str, fn: Callable[[Job], Any], reuse_finished: bool = True) -> Job:
+        """Start fn(job) in the pool, or return the live job already running for key
+        (or its finished result, unless reuse_finished is False)"""
+        with self._lock:
+            self._prune()
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing is not None and existing.status not in (ERROR, CANCELLED):
+                if not existing.finished:
+                    existing.subscribers += 1
+                    return existing
+                if reuse_finished:
+                    return existing
+            job = Job(key=key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Detach one subscriber; the run is cancelled when none is left"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.subscribers = max(0, job.subscribers - 1)
+            if job.subscribers:
+                return job
+            job.cancel_event.set()
+            queued = job.status == QUEUED
+        if queued:
+            self._finish(job, CANCELLED)
+        return job
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: str = None) -> None:
+        with self._lock:
+            if job.finished:
+                return
+            job.result, job.error = result, error
+            job.finished_at = time.time()
+            job.status = status
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]) -> None:
+        with self._lock:
+            if job.finished:
+                return
+            job.status = RUNNING
+        try:
+            result = fn(job)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            if job.cancelled:
+                self._finish(job, CANCELLED)
+                return
+            traceback.print_exc()
+            self._finish(job, ERROR, error=str(e))
+        else:
+            self._finish(job, CANCELLED if job.cancelled else DONE, result=result)
+
+
+# Process-wide queue for schedule generation
+schedule_jobs = JobQueue()
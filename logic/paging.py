@@ -0,0 +1,58 @@
+"""
+Paging, sorting and prefix search over cached row lists (JSON list endpoints).
+
+    paginate(rows, q='ECO', fields=('codigo', 'descripcion'), sort='kg', desc=True, offset=0, limit=50)
+    -> {items, total, offset, limit, next_offset}
+
+The search is a case-insensitive prefix match on the whole field or on any word
+of it ('eco' matches 'CABUYA ECO 12x1K'). next_offset is None on the last page.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from logic.deniers import denier_sort_key
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+def _matches(row: Dict[str, Any], fields: Iterable[str], prefix: str) -> bool:
+    for f in fields:
+        value = row.get(f)
+        if value is not None and f" {prefix}" in " " + " ".join(str(value).upper().split()):
+            return True
+    return False
+
+
+def _sort_key(sort: str) -> Callable[[Dict[str, Any]], Any]:
+    if sort == "denier":
+        return lambda r: denier_sort_key(r["denier"])
+
+    def key(row):
+        value = row[sort]
+        # Numbers before text so mixed columns still sort
+        if isinstance(value, (int, float)):
+            return (0, value, "")
+        return (1, 0, str(value).upper())
+    return key
+
+
+def _sorted(rows: List[Dict[str, Any]], sort: str, desc: bool) -> List[Dict[str, Any]]:
+    """Rows ordered by `sort`; rows missing the field go last in both directions"""
+    present = [r for r in rows if r.get(sort) not in (None, "")]
+    missing = [r for r in rows if r.get(sort) in (None, "")]
+    return sorted(present, key=_sort_key(sort), reverse=desc) + missing
+
+
+def paginate(rows: List[Dict[str, Any]], q: str = None, fields: Iterable[str] = ("codigo", "descripcion"),
+             sort: str = None, desc: bool = False, offset: int = 0, limit: int = DEFAULT_PAGE_LIMIT) -> Dict[str, Any]:
+    prefix = (q or "").strip().upper()
+    if prefix:
+        rows = [r for r in rows if _matches(r, fields, prefix)]
+    if sort:
+        rows = _sorted(rows, sort, desc)
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), MAX_PAGE_LIMIT)
+    total = len(rows)
+    end = offset + limit
+    next_offset: Optional[int] = end if end < total else None
+    return {"items": rows[offset:end], "total": total, "offset": offset, "limit": limit, "next_offset": next_offset}
@@ -0,0 +1,105 @@
+// Lazy table: loads rows page by page from a JSON list endpoint
+// ({items, total, next_offset}) as the user scrolls, with debounced prefix search.
+//
+//   const table = new LazyTable({
+//       url: '/api/cabuyas',
+//       tbody: document.getElementById('rows'),
+//       renderRow: item => `<tr>...</tr>`,
+//       searchInput: document.getElementById('search'),   // optional
+//       params: { sort: 'codigo' },                        // optional extra query args
+//       columns: 9, pageSize: 50,
+//       onTotal: total => ...,                             // optional
+//   });
+
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    }[c]));
+}
+
+function formatNumber(value) {
+    return (value || 0).toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+}
+
+class LazyTable {
+    constructor(options) {
+        this.url = options.url;
+        this.tbody = options.tbody;
+        this.renderRow = options.renderRow;
+        this.params = options.params || {};
+        this.columns = options.columns || 1;
+        this.pageSize = options.pageSize || 50;
+        this.onTotal = options.onTotal || (() => { });
+        this.emptyText = options.emptyText || 'Sin resultados.';
+        this.query = '';
+        this.generation = 0;
+
+        // Sentinel row after the table: loading the next page when it scrolls into view
+        this.sentinel = document.createElement('div');
+        this.sentinel.style.height = '1px';
+        this.tbody.closest('table').after(this.sentinel);
+        this.observer = new IntersectionObserver(entries => {
+            if (entries.some(e => e.isIntersecting)) this.loadMore();
+        }, { rootMargin: '400px' });
+
+        if (options.searchInput) {
+            let timer = null;
+            options.searchInput.addEventListener('input', () => {
+                clearTimeout(timer);
+                timer = setTimeout(() => this.search(options.searchInput.value), 250);
+            });
+            // The search box may sit inside a form: Enter searches, never submits
+            options.searchInput.addEventListener('keydown', e => {
+                if (e.key === 'Enter') {
+                    e.preventDefault();
+                    clearTimeout(timer);
+                    this.search(options.searchInput.value);
+                }
+            });
+        }
+        this.reset();
+    }
+
+    reset() {
+        this.generation += 1;
+        this.nextOffset = 0;
+        this.loading = false;
+        this.tbody.innerHTML = '';
+        this.observer.observe(this.sentinel);
+    }
+
+    search(query) {
+        this.query = query.trim();
+        this.reset();
+    }
+
+    async loadMore() {
+        if (this.loading || this.nextOffset === null) return;
+        this.loading = true;
+        const generation = this.generation;
+        const params = new URLSearchParams({ ...this.params, q: this.query, offset: this.nextOffset, limit: this.pageSize });
+        try {
+            const res = await fetch(`${this.url}?${params}`);
+            const page = await res.json();
+            if (generation !== this.generation) return; // a newer search replaced this one
+            this.tbody.insertAdjacentHTML('beforeend', page.items.map(this.renderRow).join(''));
+            if (page.total === 0) {
+                this.tbody.innerHTML = `<tr><td colspan="${this.columns}" style="padding: 2rem; text-align: center; color: #94A3B8;">${this.emptyText}</td></tr>`;
+            }
+            this.nextOffset = page.next_offset;
+            this.onTotal(page.total);
+            if (this.nextOffset === null) this.observer.unobserve(this.sentinel);
+        } catch (e) {
+            console.error('Error cargando filas:', e);
+        } finally {
+            if (generation === this.generation) {
+                this.loading = false;
+                // Sentinel still visible (short page or tall screen): keep filling
+                const rect = this.sentinel.getBoundingClientRect();
+                if (this.nextOffset !== null && this.sentinel.offsetParent && rect.top < window.innerHeight + 400) {
+                    this.loadMore();
+                }
+            }
+        }
+    }
+}
@@ -0,0 +1,82 @@
+"""
+End-to-end route benchmark against the in-memory Supabase fake (no network).
+
+    python tests/bench_routes.py [n_cabuyas] [latency_ms]
+
+Prints per-route wall time and the number of Supabase round trips each request makes.
+"""
+import os
+import sys
+import time
+import random
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ["SUPABASE_BACKEND"] = "memory"
+
+from db.client import get_fake_client
+
+def build_fixtures(n_cabuyas: int):
+    rng = random.Random(42)
+    denier_names = ["2000", "2500", "3000", "4000", "6000", "9000", "12000", "18000", "6000 expo", "12000 expo"]
+    deniers = [{"id": f"d{i}", "name": name, "cycle_time_standard": 37.0} for i, name in enumerate(denier_names)]
+    machines = ["T11", "T12", "T14", "T15", "T16"]
+    cabuyas = []
+    for i in range(n_cabuyas):
+        base = rng.choice([2, 3, 4, 6, 9, 12, 18])
+        cabuyas.append({
+            "codigo": f"CAB{i:05d}",
+            "descripcion": f"CABUYA ECO {base}x1K",
+            "denier": float(base * 1000) if rng.random() < 0.7 else None,
+            "estado": "AC",
+            "existencia": rng.uniform(0, 5000),
+            "inventario_seguridad": 0,
+            "requerimientos": rng.uniform(-3000, 2000),
+            "prioridad": rng.random() < 0.1,
+        })
+    return {
+        "deniers": deniers,
+        "machines_torsion": [{"id": m, "rpm": 8000, "torsions_meter": 150, "husos_activos": 100} for m in machines],
+        "machine_denier_config": [
+            {"machine_id": m, "denier": d, "rpm": 8000, "torsiones_metro": 150, "husos": 100}
+            for m in machines for d in denier_names
+        ],
+        "rewinder_denier_config": [{"denier": d, "mp_segundos": 37.0, "tm_minutos": 4.0} for d in denier_names],
+        "inventarios_cabuyas": cabuyas,
+        "orders": [
+            {"denier_id": "d4", "cabuya_codigo": f"CAB{i:05d}", "total_kg": 500, "produced_kg": 0, "priority": 3}
+            for i in range(0, min(n_cabuyas, 20))
+        ],
+        "shifts": [],
+    }
+
+def run_benchmark(n_cabuyas: int = 2000, latency_ms: float = 0.0):
+    client = get_fake_client()
+    client.latency = latency_ms / 1000
+    for table, rows in build_fixtures(n_cabuyas).items():
+        client.seed(table, rows)
+
+    from app import app
+    routes = [
+        ("GET", "/backlog", None),
+        ("GET", "/config", None),
+        ("GET", "/programming", None),
+        ("POST", "/api/generate_schedule", {"strategy": "torsion_focus"}),
+    ]
+    with app.test_client() as http:
+        with http.session_transaction() as sess:
+            sess['authenticated'] = True
+        print(f"{'Ruta':<28} {'ms':>8} {'llamadas':>9} {'filas':>8} {'bytes':>9}")
+        for method, path, body in routes:
+            client.reset_counters()
+            start = time.perf_counter()
+            response = http.open(path, method=method, json=body)
+            elapsed = (time.perf_counter() - start) * 1000
+            rows = sum(client.rows_returned.values())
+            print(f"{method + ' ' + path:<28} {elapsed:>8.1f} {client.total_calls:>9} {rows:>8} {len(response.data):>9}")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    run_benchmark(n, latency)
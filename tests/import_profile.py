@@ -0,0 +1,72 @@
+"""
+Cold-import profile of the serverless entry point (what every Vercel cold start pays).
+
+    python tests/import_profile.py [module] [top_n]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and prints the
+modules with the highest cumulative import time, the total, and any heavy SDK that
+was loaded eagerly. Exits 1 when the total exceeds IMPORT_BUDGET_MS or a heavy SDK
+was loaded. The unit suite only checks the SDKs (timings vary across machines);
+run this script on a known runner to enforce the time budget.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_MODULE = "api.index"
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 600))
+
+# SDKs that must only load on first use (DB client, AI, Google Sheets)
+LAZY_PACKAGES = ("supabase", "supabase_auth", "postgrest", "gotrue", "httpx", "openai", "gspread")
+
+
+def profile_import(module: str = ENTRY_MODULE) -> Tuple[List[Tuple[str, int, int, int]], List[str]]:
+    """Import `module` in a fresh interpreter -> ([(name, depth, self_us, cumulative_us)], loaded top-level packages)"""
+    code = f"import sys, {module}; print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    env = dict(os.environ, SUPABASE_BACKEND=os.environ.get("SUPABASE_BACKEND", "memory"))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows, proc.stdout.split()
+
+
+def total_ms(rows: List[Tuple[str, int, int, int]]) -> float:
+    """Cumulative time of the top-level imports (interpreter startup plus the module)"""
+    return sum(cumulative_us for _, depth, _, cumulative_us in rows if depth == 0) / 1000
+
+
+def eager_heavy_packages(packages: List[str]) -> List[str]:
+    return sorted(p for p in LAZY_PACKAGES if p in packages)
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else ENTRY_MODULE
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows, packages = profile_import(module)
+
+    by_cumulative: Dict[str, Tuple[int, int]] = {}
+    for name, _, self_us, cumulative_us in rows:
+        by_cumulative[name] = (self_us, cumulative_us)
+    print(f"{'module':50s} {'self ms':>9s} {'cumul ms':>9s}")
+    for name, (self_us, cumulative_us) in sorted(by_cumulative.items(), key=lambda kv: -kv[1][1])[:top_n]:
+        print(f"{name:50s} {self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}")
+
+    total = total_ms(rows)
+    heavy = eager_heavy_packages(packages)
+    print(f"\nTotal: {total:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    if heavy:
+        print("Eagerly imported: " + ", ".join(heavy))
+    sys.exit(1 if total > IMPORT_BUDGET_MS or heavy else 0)
+
+
+if __name__ == "__main__":
+    main()
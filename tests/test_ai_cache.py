@@ -0,0 +1,55 @@
+import time
+import unittest
+from integrations.ai_cache import ResponseCache, normalize
+
+class TestResponseCache(unittest.TestCase):
+    def test_similarity_is_off_by_default(self):
+        cache = ResponseCache()
+        cache.put("¿Qué hay pendiente de 12000?", "v1", "1,200 kg")
+        self.assertEqual(cache.get("que hay pendiente de 12000", "v1"), ("1,200 kg", "exact"))
+        self.assertIsNone(cache.get("Qué está pendiente para 12000", "v1"))
+
+    def test_exact_and_near_duplicate_hits_within_version(self):
+        cache = ResponseCache(similarity=0.85)
+        cache.put("¿Qué hay pendiente de 12000?", "v1", "1,200 kg")
+        self.assertEqual(cache.get("que hay pendiente de 12000", "v1"), ("1,200 kg", "exact"))
+        self.assertEqual(cache.get("Qué está pendiente para 12000", "v1"), ("1,200 kg", "similar"))
+        self.assertIsNone(cache.get("que hay pendiente de 12000", "v2"))
+        self.assertIsNone(cache.get("que hay pendiente de 12000", None))
+        self.assertEqual(cache.stats()["similar_hits"], 1)
+
+    def test_numbers_and_negations_must_match(self):
+        cache = ResponseCache(similarity=0.85)
+        cache.put("que hay pendiente de 12000", "v1", "a")
+        cache.put("cuales referencias son prioritarias", "v1", "b")
+        self.assertIsNone(cache.get("que hay pendiente de 6000", "v1"))
+        self.assertIsNone(cache.get("cuales referencias no son prioritarias", "v1"))
+
+    def test_opposite_qualifiers_never_match(self):
+        cache = ResponseCache(similarity=0.5)
+        pairs = [("¿Cuántos kg pendientes hay de prioridad alta?", "¿Cuántos kg pendientes hay de prioridad baja?"),
+                 ("máquinas con mayor carga de torsión", "máquinas con menor carga de torsión"),
+                 ("qué referencias tienen más kg", "qué referencias tienen menos kg"),
+                 ("cuál es la máquina más lenta", "cuál es la máquina más rápida")]
+        for asked, opposite in pairs:
+            cache.put(asked, "v1", asked)
+            self.assertIsNone(cache.get(opposite, "v1"), opposite)
+
+    def test_lru_bound_ttl_and_version_change(self):
+        cache = ResponseCache(max_entries=2, similarity=0)
+        for q in ("uno", "dos", "tres"):
+            cache.put(q, "v1", q.upper())
+        self.assertIsNone(cache.get("uno", "v1"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.put("cuatro", "v2", "CUATRO")
+        self.assertEqual(cache.stats()["entries"], 1)
+
+        cache.ttl = 0.01
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("cuatro", "v2"))
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  ¿Cuántos KG están atrasados? "), "cuantos kg estan atrasados")
+
+if __name__ == '__main__':
+    unittest.main()
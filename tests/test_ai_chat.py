@@ -0,0 +1,25 @@
+import unittest
+from integrations import ai_chat
+from integrations.fake_openai import FakeOpenAI
+
+MESSAGES = ai_chat.build_messages("¿Qué hay pendiente?", "Backlog pendiente: 0 referencias")
+
+class TestStreaming(unittest.TestCase):
+    def test_stream_yields_chunks_that_join_to_the_answer(self):
+        client = FakeOpenAI(replies=["Hay 1,200 kg pendientes de 12000."])
+        chunks = list(ai_chat.stream_completion(client, MESSAGES))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), "Hay 1,200 kg pendientes de 12000.")
+        self.assertTrue(client.requests[0]["stream"])
+        self.assertTrue(client.streams[0].closed)
+
+    def test_closing_early_closes_upstream_stream(self):
+        client = FakeOpenAI(replies=["uno dos tres cuatro cinco seis"])
+        deltas = ai_chat.stream_completion(client, MESSAGES)
+        self.assertEqual(next(deltas), "uno ")
+        deltas.close()
+        self.assertTrue(client.streams[0].closed)
+        self.assertEqual(client.streams[0].chunks_sent, 1)
+
+if __name__ == '__main__':
+    unittest.main()
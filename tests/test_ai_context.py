@@ -0,0 +1,59 @@
+import unittest
+from integrations import ai_chat
+from integrations.ai_context import ContextBuilder, render_digest, estimate_tokens
+from integrations.fake_openai import FakeOpenAI
+
+def entry(i, denier, kg, prioridad=False):
+    return {"codigo": f"CAB{i:05d}", "descripcion": f"CABUYA ECO {denier}", "denier": denier, "kg": kg,
+            "prioridad": prioridad, "origen": "Automatico", "order_id": None}
+
+CAPACITIES = {"12000": {"total_kgh": 426.7, "machines": [{"machine_id": "T14", "kgh": 426.7}]}}
+
+class StubBacklog:
+    def __init__(self, entries):
+        self._entries = entries
+
+    def entries(self, db, version=None):
+        return self._entries
+
+class StubDB:
+    version = "v1"
+
+    def get_input_version(self):
+        return self.version
+
+    def get_all_scheduling_data(self, version=None):
+        return {"torsion_capacities": CAPACITIES}
+
+class TestAIContext(unittest.TestCase):
+    def test_digest_aggregates_per_denier_and_lists_priorities(self):
+        entries = [entry(1, "12000", 100, True), entry(2, "12000", 50), entry(3, "6000", 300, True), entry(4, "6000", 0.05)]
+        text = render_digest(entries, CAPACITIES)
+        self.assertIn("- 12000: 150 kg | 2 refs | prioridad 100 kg | torsión 426.7 kg/h", text)
+        self.assertIn("- 6000: 300 kg | 1 refs", text)
+        self.assertLess(text.index("CAB00003"), text.index("CAB00001"))
+        self.assertIn("- T14: 12000=426.7", text)
+
+    def test_digest_stays_within_token_budget(self):
+        entries = [entry(i, str(1000 * (i % 40 + 1)), 10 + i, True) for i in range(5000)]
+        text = render_digest(entries, CAPACITIES, budget=300)
+        self.assertLessEqual(estimate_tokens(text), 300)
+        self.assertIn("otros", text)
+
+    def test_cached_per_version_and_sent_to_client(self):
+        db = StubDB()
+        builder = ContextBuilder(StubBacklog([entry(1, "12000", 100, True)]))
+        first = builder.digest(db)
+        self.assertIs(builder.digest(db), first)
+        self.assertEqual(builder.builds, 1)
+        db.version = "v2"
+        builder.digest(db)
+        self.assertEqual(builder.builds, 2)
+
+        client = FakeOpenAI(replies=["100 kg de 12000"])
+        answer = ai_chat.complete(client, ai_chat.build_messages("¿Qué hay de 12000?", first))
+        self.assertEqual(answer, "100 kg de 12000")
+        self.assertIn("CAB00001", client.requests[0]["messages"][0]["content"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from db.fake_client import FakeSupabaseClient
+from db.queries import DBQueries
+from integrations.openai_ia import get_ai_optimization_scenario
+
+DENIERS = ["4000", "6000", "12000"]
+FIXTURES = {
+    "deniers": [{"id": f"d{d}", "name": d} for d in DENIERS],
+    "machine_denier_config": [
+        {"machine_id": m, "denier": d, "rpm": 8000, "torsiones_metro": 150, "husos": 100}
+        for m in ("T11", "T12", "T14", "T15", "T16") for d in DENIERS
+    ],
+    "rewinder_denier_config": [{"denier": d, "mp_segundos": 37.0, "tm_minutos": 4.0} for d in DENIERS],
+    "inventarios_cabuyas": [
+        {"codigo": f"SCN{i:03d}", "descripcion": f"CABUYA ECO {d[:-3]}x1K", "denier": float(d),
+         "requerimientos": -400.0 - i, "existencia": 0, "inventario_seguridad": 0, "estado": "AC"}
+        for i, d in enumerate(DENIERS * 4)
+    ],
+    "orders": [],
+    "shifts": [],
+}
+
+class TestAIScenario(unittest.TestCase):
+    def test_scenario_uses_computed_capacities_and_cached_inputs(self):
+        client = FakeSupabaseClient(FIXTURES)
+        db = DBQueries(client=client)
+        scenario = get_ai_optimization_scenario(db)
+        self.assertNotIn("error", scenario)
+        self.assertGreater(scenario["resumen_programa"]["total_kg"], 0)
+        self.assertEqual({d["denier"] for d in scenario["resumen_denier"]}, set(DENIERS))
+
+        # Same input version: capacities and backlog come from the shared caches
+        client.reset_counters()
+        get_ai_optimization_scenario(db)
+        self.assertEqual(dict(client.calls), {("rpc", "scheduling_input_version"): 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import unittest
+from integrations.ai_tools import Toolbox, build_messages, chat_with_tools
+from integrations.fake_openai import FakeOpenAI
+
+ENTRIES = [
+    {"codigo": "CAB001", "descripcion": "CABUYA ECO 12x1K", "denier": "12000", "kg": 300.0, "prioridad": True, "origen": "Automatico"},
+    {"codigo": "CAB002", "descripcion": "CABUYA ECO 12x1K", "denier": "12000", "kg": 500.0, "prioridad": False, "origen": "Manual"},
+    {"codigo": "CAB003", "descripcion": "CABUYA ECO 6x1K", "denier": "6000", "kg": 80.0, "prioridad": True, "origen": "Automatico"},
+]
+CAPACITIES = {"12000": {"total_kgh": 426.67, "machines": [
+    {"machine_id": "T14", "kgh": 426.67, "rpm": 8000, "torsiones_metro": 150, "husos": 100}]}}
+
+def make_toolbox():
+    toolbox = Toolbox(db=None)
+    toolbox._entries = ENTRIES
+    toolbox._scheduling = {"torsion_capacities": CAPACITIES}
+    return toolbox
+
+def echo_tool_result(messages):
+    return "Dato: " + messages[-1]["content"]
+
+class TestToolbox(unittest.TestCase):
+    def test_backlog_lookup_and_capacity_what_if(self):
+        toolbox = make_toolbox()
+        found = json.loads(toolbox.call("buscar_backlog", {"denier": "12000.0", "limite": 1}))
+        self.assertEqual((found["referencias"], found["kg_total"]), (2, 800.0))
+        self.assertEqual([i["codigo"] for i in found["items"]], ["CAB002"])
+
+        capacity = json.loads(toolbox.call("capacidad_torsion", {"denier": "12000", "rpm": 16000}))
+        self.assertEqual(capacity["kgh_total"], 853.33)
+        self.assertEqual(capacity["horas_para_pendiente"], 0.9)
+
+        self.assertIn("error", json.loads(toolbox.call("borrar_todo", {})))
+        self.assertIn("error", json.loads(toolbox.call("buscar_backlog", {"color": "rojo"})))
+
+    def test_variant_uses_base_denier_machines(self):
+        toolbox = make_toolbox()
+        toolbox._entries = ENTRIES + [{"codigo": "CAB004", "descripcion": "CABUYA EXPO 12x1K", "denier": "12000 expo",
+                                       "kg": 213.3, "prioridad": False, "origen": "Manual"}]
+        capacity = json.loads(toolbox.call("capacidad_torsion", {"denier": "12000 EXPO"}))
+        self.assertEqual(capacity["denier"], "12000 expo")
+        self.assertEqual([m["maquina"] for m in capacity["maquinas"]], ["T14"])
+        self.assertEqual(capacity["horas_para_pendiente"], 0.5)
+
+class TestToolLoop(unittest.TestCase):
+    def test_model_gets_only_the_function_results(self):
+        client = FakeOpenAI(replies=[
+            {"tool_calls": [{"name": "resumen_backlog", "arguments": {}}]},
+            echo_tool_result,
+        ])
+        parts = list(chat_with_tools(client, build_messages("¿Cuánto hay pendiente?"), make_toolbox()))
+        self.assertEqual(parts[0], {"tool": "resumen_backlog", "arguments": {}})
+        self.assertTrue(parts[1]["text"].startswith('Dato: {"kg_total": 880.0'))
+        second = client.requests[1]["messages"]
+        self.assertEqual(second[-2]["tool_calls"][0]["function"]["name"], "resumen_backlog")
+        self.assertEqual(second[-1]["tool_call_id"], second[-2]["tool_calls"][0]["id"])
+
+    def test_streamed_tool_call_fragments_are_reassembled(self):
+        client = FakeOpenAI(replies=[
+            {"tool_calls": [{"name": "buscar_backlog", "arguments": {"codigo": "cab00", "solo_prioritarias": True}}]},
+            "Dos referencias prioritarias.",
+        ])
+        parts = list(chat_with_tools(client, build_messages("prioridades"), make_toolbox(), stream=True))
+        self.assertEqual(parts[0], {"tool": "buscar_backlog", "arguments": {"codigo": "cab00", "solo_prioritarias": True}})
+        self.assertEqual("".join(p["text"] for p in parts[1:]), "Dos referencias prioritarias.")
+        self.assertIn('"referencias": 2', client.requests[1]["messages"][-1]["content"])
+
+    def test_round_limit_forces_an_answer(self):
+        call = {"tool_calls": [{"name": "resumen_backlog", "arguments": {}}]}
+        client = FakeOpenAI(replies=[call, call, "Listo."])
+        parts = list(chat_with_tools(client, build_messages("?"), make_toolbox(), max_rounds=2))
+        self.assertEqual(parts[-1], {"text": "Listo."})
+        self.assertEqual([r["tool_choice"] for r in client.requests], ["auto", "auto", "none"])
+
+if __name__ == '__main__':
+    unittest.main()
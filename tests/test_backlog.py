@@ -0,0 +1,81 @@
+import unittest
+from db.catalog import catalog
+from db.fake_client import FakeSupabaseClient
+from db.queries import DBQueries
+from logic.backlog import BacklogMaterializer
+
+def fixtures():
+    return {
+        "deniers": [{"id": "d6", "name": "6000"}],
+        "inventarios_cabuyas": [
+            {"codigo": "CAB1", "descripcion": "CABUYA ECO 6x1K", "denier": 6000, "requerimientos": -300.0, "prioridad": False},
+            {"codigo": "CAB2", "descripcion": "CABUYA ECO 6x1K", "denier": 6000, "requerimientos": -100.0, "prioridad": False},
+        ],
+        "orders": [],
+        "rewinder_denier_config": [{"denier": "6000", "mp_segundos": 37.0, "tm_minutos": 4.0}],
+    }
+
+class TestBacklogMaterializer(unittest.TestCase):
+    def setUp(self):
+        catalog.invalidate()
+        self.client = FakeSupabaseClient(fixtures())
+        self.db = DBQueries(client=self.client)
+        self.backlog = BacklogMaterializer()
+
+    def view_reads(self):
+        return self.client.calls[("pending_backlog", "select")]
+
+    def test_entries_are_reused_while_the_version_is_unchanged(self):
+        first = self.backlog.entries(self.db)
+        self.assertEqual([e['codigo'] for e in first], ["CAB1", "CAB2"])
+        self.assertIs(self.backlog.entries(self.db), first)
+        self.assertEqual(self.backlog.builds, 1)
+
+        self.db.update_cabuya_priority("CAB2", True)
+        self.assertTrue(self.backlog.entries(self.db)[1]['prioridad'])
+        self.assertEqual(self.backlog.builds, 2)
+
+    def test_single_row_writes_are_patched_without_a_rebuild(self):
+        self.backlog.entries(self.db)
+        base = self.db.get_input_version()
+        order_id = self.db.create_order("d6", 50.0, "2024-01-01", "CAB1").data[0]['id']
+        self.backlog.refresh_order(self.db, order_id, base)
+
+        base = self.db.get_input_version()
+        self.db.update_cabuya_priority("CAB1", True)
+        self.backlog.refresh_requirement(self.db, "CAB1", base)
+
+        reads = self.view_reads()
+        entries = self.backlog.entries(self.db)
+        self.assertEqual(self.view_reads(), reads)
+        self.assertEqual(self.backlog.builds, 1)
+        self.assertEqual([(e['codigo'], e['origen'], e['prioridad']) for e in entries],
+                         [("CAB1", "Automatico", True), ("CAB2", "Automatico", False), ("CAB1", "Manual", True)])
+
+        base = self.db.get_input_version()
+        self.db.delete_order(order_id)
+        self.backlog.refresh_order(self.db, order_id, base)
+        self.assertEqual(len(self.backlog.entries(self.db)), 2)
+        self.assertEqual(self.backlog.builds, 1)
+
+    def test_change_made_elsewhere_invalidates_instead_of_patching(self):
+        self.backlog.entries(self.db)
+        # Another instance changes the inputs after this cache was built
+        self.db.update_cabuya_priority("CAB2", True)
+        base = self.db.get_input_version()
+        order_id = self.db.create_order("d6", 50.0, "2024-01-01", "CAB1").data[0]['id']
+        self.backlog.refresh_order(self.db, order_id, base)
+
+        entries = self.backlog.entries(self.db)
+        self.assertEqual(self.backlog.builds, 2)
+        self.assertTrue(entries[1]['prioridad'])
+        self.assertEqual(len(entries), 3)
+
+    def test_patch_without_a_base_version_invalidates(self):
+        self.backlog.entries(self.db)
+        self.backlog.refresh_requirement(self.db, "CAB1", None)
+        self.backlog.entries(self.db)
+        self.assertEqual(self.backlog.builds, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from db.catalog import CatalogIndex, catalog
+from db.fake_client import FakeSupabaseClient
+from db.queries import DBQueries
+from web import metrics
+
+FIXTURES = {
+    "deniers": [{"id": "d6", "name": "6000"}, {"id": "d12e", "name": "12000 Expo"}],
+    "inventarios_cabuyas": [
+        {"codigo": "CAB1", "descripcion": "CABUYA ECO 6x1K", "denier": 6000, "inventario_seguridad": 0},
+        {"codigo": "CAB2", "descripcion": "CABUYA EXPO 12x1K", "denier": "12000 EXPO", "inventario_seguridad": 0},
+    ],
+    "rewinder_denier_config": [{"denier": "6000", "mp_segundos": 37.0, "tm_minutos": 4.0}],
+}
+
+class TestCatalogIndex(unittest.TestCase):
+    def setUp(self):
+        catalog.invalidate()
+        self.client = FakeSupabaseClient(FIXTURES)
+        self.db = DBQueries(client=self.client)
+
+    def selects(self, table):
+        return self.client.calls[(table, "select")]
+
+    def test_parts_expire_after_ttl(self):
+        index = CatalogIndex(ttl=0.02)
+        index.deniers(self.db)
+        index.deniers(self.db)
+        self.assertEqual(self.selects("deniers"), 1)
+        time.sleep(0.03)
+        index.deniers(self.db)
+        self.assertEqual(self.selects("deniers"), 2)
+        self.assertEqual(index.stats(), {"hits": 1, "misses": 2, "hit_ratio": 0.333})
+
+    def test_writes_invalidate_their_parts(self):
+        catalog.deniers(self.db)
+        self.db.create_denier("9000", 37.0)
+        self.assertIn("9000", catalog.deniers(self.db))
+
+        self.assertEqual(catalog.rewinder_kgh(self.db)["6000"], 12.0)
+        self.db.upsert_rewinder_denier_config("6000", 37.0, 8.0)
+        self.assertEqual(catalog.rewinder_kgh(self.db)["6000"], 6.0)
+        self.db.bulk_upsert_rewinder_denier_configs([{"denier": "9000", "mp_segundos": 37.0, "tm_minutos": 4.0}])
+        self.assertIn("9000", catalog.rewinder_kgh(self.db))
+
+        catalog.cabuyas(self.db)
+        catalog.inventory(self.db)
+        self.db.bulk_insert_cabuyas([{"codigo": "CAB3", "descripcion": "CABUYA ECO 9x1K", "denier": 9000}])
+        self.assertIn("CAB3", catalog.cabuyas(self.db))
+        self.assertEqual(len(catalog.inventory(self.db)), 3)
+
+        self.db.bulk_update_cabuya_inventory_security({"CAB1": 50.0})
+        self.assertEqual(catalog.inventory(self.db)[0]["inventario_seguridad"], 50.0)
+        self.db.update_cabuya_inventory_security("CAB2", 25.0)
+        self.assertEqual(catalog.inventory(self.db)[1]["inventario_seguridad"], 25.0)
+
+    def test_point_lookups(self):
+        # Cold cache: one single-row query, then served from the point entry
+        self.assertEqual(catalog.cabuya(self.db, "CAB2")["denier"], "12000 EXPO")
+        catalog.cabuya(self.db, "CAB2")
+        self.assertEqual(self.selects("inventarios_cabuyas"), 1)
+        self.assertIsNone(catalog.cabuya(self.db, "NOPE"))
+
+        for name in ("12000 EXPO", "12000 expo", " 12000  Expo "):
+            self.assertEqual(catalog.denier(self.db, name)["id"], "d12e")
+        self.assertEqual(catalog.denier(self.db, 6000.0)["id"], "d6")
+        self.assertIsNone(catalog.denier(self.db, "4000"))
+        self.assertEqual(self.selects("deniers"), 1)
+
+    def test_counters_are_consistent_across_threads_and_exported(self):
+        index = CatalogIndex()
+        index.deniers(self.db)
+        threads = [threading.Thread(target=lambda: [index.deniers(self.db) for _ in range(500)]) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(index.counts(), (2000, 1))
+
+        metrics.cache_sources["catalog_test"] = index.counts
+        try:
+            self.assertIn('cache_hit_ratio{cache="catalog_test"} 0.9995', metrics.registry.render())
+        finally:
+            del metrics.cache_sources["catalog_test"]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import pickle
+import unittest
+from db.catalog import CatalogIndex
+from logic.backlog import build_entry
+from logic.deniers import Denier, denier_key, resolve_denier, infer_denier_from_description, denier_sort_key
+from integrations.openai_ia import generate_torsion_schedule
+
+class TestDeniers(unittest.TestCase):
+    def test_equivalent_inputs_share_one_interned_key(self):
+        keys = [resolve_denier(v) for v in (6000, 6000.0, "6000", "6000.0", " 6000 ")]
+        for k in keys:
+            self.assertIs(k, keys[0])
+        self.assertEqual(keys[0], "6000")
+        self.assertEqual({"6000": 1}[keys[0]], 1)
+        self.assertIs(pickle.loads(pickle.dumps(keys[0])), keys[0])
+
+    def test_variants_keep_base_and_sort_numerically(self):
+        expo = resolve_denier("12000 EXPO")
+        self.assertEqual(expo, "12000 expo")
+        self.assertEqual((expo.base, expo.variant), (12000, "expo"))
+        names = ["12000", "2500", "Especial", "12000 EXPO", "9000"]
+        self.assertEqual(sorted(names, key=denier_sort_key), ["Especial", "2500", "9000", "12000", "12000 EXPO"])
+        self.assertEqual(json.dumps({"d": expo}), '{"d": "12000 expo"}')
+
+    def test_description_fallback(self):
+        self.assertEqual(infer_denier_from_description("CABUYA ECO 12x1K VERDE"), "12000")
+        self.assertEqual(resolve_denier(None, "CABUYA CLA 9X1"), "9000")
+        self.assertIsNone(resolve_denier("", "SIN DENIER"))
+
+    def test_non_numeric_names_are_kept(self):
+        self.assertEqual(denier_key(" Especial "), "Especial")
+        self.assertEqual(denier_key("12000 EXPO"), "12000 expo")
+        self.assertEqual(denier_key(None, "CABUYA CLA 9X1"), "9000")
+        self.assertEqual(build_entry({"codigo": "X", "denier": "Especial", "kg": 5}, {})["denier"], "Especial")
+
+    def test_catalog_finds_denier_under_any_spelling(self):
+        class StubDB:
+            def get_deniers(self, columns):
+                return [{"id": 1, "name": "12000 Expo"}, {"id": 2, "name": "Especial"}]
+        catalog, db = CatalogIndex(), StubDB()
+        self.assertEqual(catalog.denier(db, resolve_denier("12000 EXPO"))["id"], 1)
+        self.assertEqual(catalog.denier(db, "12000 expo")["id"], 1)
+        self.assertEqual(catalog.denier(db, "Especial")["id"], 2)
+        self.assertIsNone(catalog.denier(db, "9000"))
+
+    def test_schedule_accepts_mixed_denier_keys(self):
+        capacities = {
+            "6000.0": {"machines": [{"machine_id": "T11", "kgh": 50, "husos": 1}]},
+            "4000": {"machines": [{"machine_id": "T12", "kgh": 40, "husos": 1}]},
+        }
+        backlog = {
+            "A": {"description": "", "kg_total": 400, "denier": 6000},
+            "B": {"description": "", "kg_total": 300, "denier": "6000 EXPO"},
+            "C": {"description": "", "kg_total": 200, "denier": Denier(4000)},
+        }
+        result = generate_torsion_schedule(backlog, capacities, max_days=5)
+        refs = {d["ref"] for t in result["tabla_turnos"] for d in t["detalles"]}
+        self.assertEqual(refs, {"A", "B", "C"})
+
+if __name__ == '__main__':
+    unittest.main()
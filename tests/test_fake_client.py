@@ -0,0 +1,74 @@
+import unittest
+from db.fake_client import FakeSupabaseClient
+from db.queries import DBQueries
+
+FIXTURES = {
+    "deniers": [{"id": "d6", "name": "6000"}, {"id": "d12", "name": "12000"}],
+    "inventarios_cabuyas": [
+        {"codigo": f"CAB{i:04d}", "descripcion": "CABUYA ECO 12x1K", "denier": None, "requerimientos": -10.0 * i if i % 2 else 5.0}
+        for i in range(1, 26)
+    ],
+    "orders": [{"id": "o1", "denier_id": "d6", "cabuya_codigo": "CAB0002", "total_kg": 300, "produced_kg": 100}],
+    "rewinder_denier_config": [{"denier": "12000", "mp_segundos": 37.0, "tm_minutos": 4.0}],
+    "machine_denier_config": [{"machine_id": "T14", "denier": "12000", "rpm": 8000, "torsiones_metro": 150, "husos": 100}],
+}
+
+class TestFakeSupabaseClient(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeSupabaseClient(FIXTURES)
+        self.db = DBQueries(client=self.client)
+
+    def test_filters_order_and_limit(self):
+        rows = self.client.table("inventarios_cabuyas").select("codigo").lt("requerimientos", 0).order("requerimientos").limit(3).execute().data
+        self.assertEqual(rows, [{"codigo": "CAB0025"}, {"codigo": "CAB0023"}, {"codigo": "CAB0021"}])
+
+    def test_embedded_relation(self):
+        order = self.db.get_orders()[0]
+        self.assertEqual(order["deniers"], {"name": "6000"})
+
+    def test_keyset_pagination_counts_round_trips(self):
+        rows = list(self.db.iter_inventarios_cabuyas(page_size=10))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(self.client.calls[("inventarios_cabuyas", "select")], 3)
+
+    def test_page_size_above_server_cap_does_not_truncate(self):
+        client = FakeSupabaseClient({"inventarios_cabuyas": [{"codigo": f"C{i:05d}"} for i in range(2500)]}, max_rows=1000)
+        rows = list(DBQueries(client=client).iter_inventarios_cabuyas(page_size=5000))
+        self.assertEqual(len(rows), 2500)
+
+    def test_pending_backlog_is_read_in_pages_above_the_server_cap(self):
+        fixtures = dict(FIXTURES, inventarios_cabuyas=[{"codigo": f"C{i:05d}", "descripcion": "CABUYA ECO 6x1K", "requerimientos": -1.0 - i}
+                                                       for i in range(1200)],
+                        orders=[{"id": f"o{i:04d}", "denier_id": "d6", "cabuya_codigo": "C00001", "total_kg": 10 + i, "produced_kg": 0}
+                                for i in range(1100)])
+        db = DBQueries(client=FakeSupabaseClient(fixtures, max_rows=1000))
+        rows = db.get_pending_backlog()
+        self.assertEqual(len(rows), 2300)
+        self.assertEqual([r["origen"] for r in rows[1199:1201]], ["Automatico", "Manual"])
+        self.assertEqual((rows[0]["codigo"], rows[1200]["order_id"]), ("C01199", "o1099"))
+        self.assertEqual(len(db.get_pending_backlog(order_id="o0005")), 1)
+
+    def test_upsert_update_delete(self):
+        self.db.bulk_upsert_shifts([{"date": "2024-01-01", "working_hours": 8}, {"date": "2024-01-02", "working_hours": 24}])
+        self.db.bulk_upsert_shifts([{"date": "2024-01-01", "working_hours": 16}])
+        self.assertEqual([s["working_hours"] for s in self.db.get_shifts()], [16, 24])
+        self.db.update_cabuya_priority("CAB0001", True)
+        self.db.delete_order("o1")
+        self.assertEqual(self.db.get_orders(), [])
+        self.assertEqual(self.client.calls[("shifts", "upsert")], 2)
+
+    def test_pending_backlog_view_resolves_deniers(self):
+        rows = self.db.get_pending_backlog()
+        manual = [r for r in rows if r["origen"] == "Manual"]
+        self.assertEqual(manual[0]["denier"], "6000")
+        self.assertEqual(manual[0]["kg"], 200)
+        self.assertTrue(all(r["denier"] == "12000" for r in rows if r["origen"] == "Automatico"))
+
+    def test_input_version_changes_on_write(self):
+        before = self.db.get_input_version()
+        self.assertEqual(before, self.db.get_input_version())
+        self.db.create_denier("9000", 37.0)
+        self.assertNotEqual(before, self.db.get_input_version())
+
+if __name__ == '__main__':
+    unittest.main()
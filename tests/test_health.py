@@ -0,0 +1,50 @@
+import unittest
+from flask import Flask
+from web import health
+
+class TestHealth(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.fail = False
+        app = Flask(__name__)
+        self.probe = health.init_app(app, probe_fn=self.ping)
+        self.probe.start = lambda: None  # drive the probe by hand
+        self.http = app.test_client()
+
+    def ping(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("timeout")
+
+    def test_liveness_never_probes_and_readiness_probes_inline_when_cold(self):
+        self.assertEqual(self.http.get('/health/live').status_code, 200)
+        self.assertEqual(self.calls, 0)
+        r = self.http.get('/health/ready')
+        self.assertEqual((r.status_code, r.json["status"]), (200, "ok"))
+        self.assertEqual(self.calls, 1)
+
+    def test_readiness_serves_last_probe_without_querying(self):
+        self.probe.run_once()
+        for _ in range(3):
+            r = self.http.get('/health')
+            self.assertEqual((r.status_code, r.json["status"]), (200, "ok"))
+        self.assertEqual(self.calls, 1)
+
+        self.fail = True
+        self.probe.run_once()
+        r = self.http.get('/health/ready')
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.json["database"]["error"], "ConnectionError: timeout")
+        self.assertNotIn("traceback", r.json)
+        self.assertEqual(self.probe.gauge("up"), {(): 0.0})
+
+    def test_stale_probe_is_refreshed_inline(self):
+        self.probe.run_once()
+        self.probe.checked_at -= self.probe.stale_after + 1
+        self.assertEqual(self.probe.status()[1]["status"], "stale")
+        r = self.http.get('/health/ready')
+        self.assertEqual((r.status_code, r.json["status"]), (200, "ok"))
+        self.assertEqual(self.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
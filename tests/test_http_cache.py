@@ -0,0 +1,45 @@
+import gzip
+import unittest
+from flask import Flask, jsonify
+from web import http_cache
+
+def make_app():
+    app = Flask(__name__)
+    http_cache.init_app(app)
+
+    @app.route('/big')
+    def big():
+        return jsonify({"rows": [{"codigo": f"CAB{i:04d}", "kg": i} for i in range(200)]})
+
+    @app.route('/small')
+    def small():
+        return jsonify({"ok": True})
+    return app
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.http = make_app().test_client()
+
+    def test_gzip_above_threshold_with_encoded_strong_etag(self):
+        r = self.http.get('/big', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', r.headers['Vary'])
+        etag = r.headers['ETag']
+        self.assertTrue(etag.endswith('-gzip"') and not etag.startswith('W/'))
+        plain = self.http.get('/big')
+        self.assertEqual(gzip.decompress(r.data), plain.data)
+        self.assertEqual(plain.headers['ETag'], etag.replace('-gzip', ''))
+
+    def test_small_bodies_are_not_compressed(self):
+        r = self.http.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', r.headers)
+
+    def test_if_none_match_returns_304_for_any_variant(self):
+        etag = self.http.get('/big', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        for encoding in ('gzip', 'identity'):
+            r = self.http.get('/big', headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+            self.assertEqual(r.status_code, 304)
+            self.assertEqual(r.data, b'')
+
+if __name__ == '__main__':
+    unittest.main()
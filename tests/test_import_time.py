@@ -0,0 +1,11 @@
+import unittest
+from tests.import_profile import profile_import, eager_heavy_packages
+
+class TestColdImport(unittest.TestCase):
+    # The wall-clock budget is machine dependent: it is checked by `python tests/import_profile.py`
+    def test_entry_point_imports_without_heavy_sdks(self):
+        _, packages = profile_import("api.index")
+        self.assertEqual(eager_heavy_packages(packages), [])
+
+if __name__ == '__main__':
+    unittest.main()
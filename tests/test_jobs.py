@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from logic.jobs import JobQueue, JobCancelled, DONE, ERROR, CANCELLED
+from integrations.openai_ia import generate_torsion_schedule, PlanCancelled
+
+CAPACITIES = {"6000": {"machines": [{"machine_id": "T11", "kgh": 50, "husos": 1}]}}
+BACKLOG = {"A": {"description": "", "kg_total": 4000, "denier": "6000"}}
+
+def wait(job, timeout=2.0):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = JobQueue(workers=2)
+
+    def test_identical_requests_share_one_job(self):
+        release = threading.Event()
+        runs = []
+
+        def fn(job):
+            runs.append(job.id)
+            job.update(stage='simulacion')
+            release.wait(2)
+            return {"kg": 10}
+
+        first = self.queue.submit("k", fn)
+        second = self.queue.submit("k", fn)
+        other = self.queue.submit("k2", fn)
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        release.set()
+        self.assertEqual(wait(first).status, DONE)
+        wait(other)
+        self.assertEqual(first.to_dict()["result"], {"kg": 10})
+        self.assertEqual(len(runs), 2)
+        # Finished jobs keep serving their result within the TTL
+        self.assertIs(self.queue.submit("k", fn), first)
+
+    def test_unversioned_keys_only_share_running_jobs(self):
+        first = self.queue.submit("k", lambda job: 1, reuse_finished=False)
+        self.assertEqual(wait(first).status, DONE)
+        again = self.queue.submit("k", lambda job: 2, reuse_finished=False)
+        self.assertIsNot(again, first)
+        self.assertEqual(wait(again).result, 2)
+
+    def test_errors_are_reported_and_retried(self):
+        failing = self.queue.submit("k", lambda job: 1 / 0)
+        self.assertEqual(wait(failing).status, ERROR)
+        self.assertIn("division", failing.to_dict()["error"])
+        retry = self.queue.submit("k", lambda job: "ok")
+        self.assertIsNot(retry, failing)
+        self.assertEqual(wait(retry).result, "ok")
+
+    def test_cancel_stops_running_job(self):
+        started = threading.Event()
+
+        def fn(job):
+            started.set()
+            while True:
+                if job.cancelled:
+                    raise JobCancelled()
+                time.sleep(0.01)
+
+        job = self.queue.submit("k", fn)
+        started.wait(2)
+        self.queue.cancel(job.id)
+        self.assertEqual(wait(job).status, CANCELLED)
+        self.assertNotIn("result", job.to_dict())
+
+    def test_shared_job_runs_until_every_subscriber_cancels(self):
+        release = threading.Event()
+
+        def fn(job):
+            while not release.wait(0.01):
+                if job.cancelled:
+                    raise JobCancelled()
+            return "plan"
+
+        job = self.queue.submit("k", fn)
+        self.assertIs(self.queue.submit("k", fn), job)
+        self.queue.cancel(job.id)  # first tab closed
+        self.assertFalse(job.cancelled)
+        release.set()
+        self.assertEqual(wait(job).status, DONE)
+
+        release.clear()
+        job = self.queue.submit("k2", fn)
+        self.queue.submit("k2", fn)
+        self.queue.cancel(job.id)
+        self.queue.cancel(job.id)
+        self.assertEqual(wait(job).status, CANCELLED)
+
+    def test_planner_progress_and_cancel(self):
+        events = []
+        generate_torsion_schedule(BACKLOG, CAPACITIES, max_days=5, progress_callback=events.append)
+        self.assertEqual(events[-1]["pct_kg"], 100.0)
+        self.assertEqual(events[0]["maquinas_activas"], 1)
+        self.assertTrue(all(a["pct_kg"] <= b["pct_kg"] for a, b in zip(events, events[1:])))
+
+        cancel = threading.Event()
+        def stop_after_three(p):
+            if p["turno"] == 3:
+                cancel.set()
+        with self.assertRaises(PlanCancelled):
+            generate_torsion_schedule(BACKLOG, CAPACITIES, max_days=5, progress_callback=stop_after_three, cancel_event=cancel)
+
+        job = self.queue.submit("plan", lambda job: generate_torsion_schedule(
+            BACKLOG, CAPACITIES, max_days=5, cancel_event=job.cancel_event))
+        self.queue.cancel(job.id)
+        self.assertIn(wait(job).status, (DONE, CANCELLED))
+
+if __name__ == '__main__':
+    unittest.main()
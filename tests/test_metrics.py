@@ -0,0 +1,44 @@
+import threading
+import unittest
+from flask import Flask
+from web.metrics import Counter, Histogram, Registry, init_app
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_sums_thread_shards_after_threads_exit(self):
+        counter = Counter("calls_total", "Calls", ("table",))
+        def work():
+            for _ in range(100):
+                counter.inc("orders")
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counter.inc("deniers", amount=2)
+        self.assertEqual(counter.collect(), {("orders",): 400, ("deniers",): 2})
+        self.assertIn('calls_total{table="orders"} 400', counter.render())
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = Registry()
+        hist = registry.register(Histogram("latency_seconds", "Latency", ("endpoint",), (0.1, 1)))
+        for value in (0.05, 0.5, 3):
+            hist.observe(value, "backlog")
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{endpoint="backlog",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{endpoint="backlog",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="backlog",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{endpoint="backlog"} 3', text)
+        self.assertIn('latency_seconds_sum{endpoint="backlog"} 3.55', text)
+
+    def test_endpoint_requires_token_or_session(self):
+        app = Flask(__name__)
+        init_app(app, token="secret", is_authenticated=lambda: False)
+        http = app.test_client()
+        self.assertEqual(http.get('/metrics').status_code, 401)
+        self.assertEqual(http.get('/metrics', headers={'Authorization': 'Bearer secreto'}).status_code, 401)
+        r = http.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{endpoint="metrics",method="GET",status="401"}', r.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from logic.paging import paginate, MAX_PAGE_LIMIT
+from logic.backlog import pending_kg_by_denier
+
+ROWS = [
+    {"codigo": "CAB0001", "descripcion": "CABUYA ECO 12x1K VERDE", "denier": "12000", "kg": 50.0},
+    {"codigo": "CAB0002", "descripcion": "CABUYA CLA 9X1", "denier": 9000, "kg": None},
+    {"codigo": "ZZ0003", "descripcion": "HILO ECONOMICO", "denier": "6000 expo", "kg": 10.0},
+    {"codigo": "CAB0004", "descripcion": "CABUYA ECO 2500", "denier": "2500", "kg": 80.0},
+]
+
+class TestPaging(unittest.TestCase):
+    def test_pages_and_next_offset(self):
+        first = paginate(ROWS, limit=3)
+        self.assertEqual((first["total"], first["next_offset"], len(first["items"])), (4, 3, 3))
+        last = paginate(ROWS, offset=first["next_offset"], limit=3)
+        self.assertEqual([r["codigo"] for r in last["items"]], ["CAB0004"])
+        self.assertIsNone(last["next_offset"])
+        self.assertEqual(paginate(ROWS, limit=10_000)["limit"], MAX_PAGE_LIMIT)
+
+    def test_prefix_search_on_field_and_words(self):
+        self.assertEqual([r["codigo"] for r in paginate(ROWS, q="cab000")["items"]], ["CAB0001", "CAB0002", "CAB0004"])
+        self.assertEqual([r["codigo"] for r in paginate(ROWS, q="eco")["items"]], ["CAB0001", "ZZ0003", "CAB0004"])
+        # Prefix, not substring
+        self.assertEqual(paginate(ROWS, q="0001")["total"], 0)
+
+    def test_sorting_numbers_missing_and_deniers(self):
+        self.assertEqual([r["kg"] for r in paginate(ROWS, sort="kg")["items"]], [10.0, 50.0, 80.0, None])
+        # Missing values stay last when descending too
+        self.assertEqual([r["kg"] for r in paginate(ROWS, sort="kg", desc=True)["items"]], [80.0, 50.0, 10.0, None])
+        rows = ROWS + [{"codigo": "NODEN", "descripcion": "", "denier": None, "kg": 1.0}]
+        self.assertEqual([r["denier"] for r in paginate(rows, sort="denier", desc=True)["items"]], ["12000", 9000, "6000 expo", "2500", None])
+        self.assertEqual([r["denier"] for r in paginate(ROWS, sort="denier")["items"]], ["2500", "6000 expo", 9000, "12000"])
+
+    def test_pending_kg_by_denier(self):
+        rows = [
+            {"denier": 6000.0, "descripcion": "", "requerimientos": -10},
+            {"denier": "6000", "descripcion": "", "requerimientos": -5},
+            {"denier": None, "descripcion": "CABUYA ECO 12x1K", "requerimientos": -2},
+            {"denier": None, "descripcion": "SIN DATOS", "requerimientos": -1},
+        ]
+        self.assertEqual(pending_kg_by_denier(rows), {"6000": 15, "12000": 2, "Desconocido": 1})
+
+if __name__ == '__main__':
+    unittest.main()
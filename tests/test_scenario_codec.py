@@ -0,0 +1,56 @@
+import json
+import unittest
+from db.scenario_codec import encode_plan, decode_plan, diff, patch, ENCODING_FULL, ENCODING_DELTA
+
+def make_plan(days, kg=500.0):
+    return {
+        "resumen_programa": {"total_kg": kg * days, "alertas": "Planificación centrada en Torsión"},
+        "tabla_turnos": [
+            {
+                "fecha": f"2024-01-{d + 1:02d} Turno A",
+                "detalles": [
+                    {"maquina": m, "denier": 6000, "ref": "CAB00629", "kg": kg, "estado": "Normal"}
+                    for m in ["T11", "T12", "T14", "T15"]
+                ],
+                "total_kg": kg * 4,
+                "maquinas_activas": 4
+            }
+            for d in range(days)
+        ]
+    }
+
+class TestScenarioCodec(unittest.TestCase):
+    def test_full_roundtrip_is_compressed(self):
+        plan = make_plan(60)
+        encoded = encode_plan(plan)
+        self.assertEqual(encoded["plan_encoding"], ENCODING_FULL)
+        self.assertEqual(decode_plan(encoded), plan)
+        self.assertLess(len(encoded["plan_blob"]), len(json.dumps(plan)) / 5)
+
+    def test_delta_roundtrip_against_base(self):
+        base = make_plan(60)
+        plan = make_plan(61)
+        plan["tabla_turnos"][3]["detalles"][1]["kg"] = 123.4
+        del plan["resumen_programa"]["alertas"]
+        encoded = encode_plan(plan, base)
+        self.assertEqual(encoded["plan_encoding"], ENCODING_DELTA)
+        self.assertLess(len(encoded["plan_blob"]), len(encode_plan(plan)["plan_blob"]))
+        self.assertEqual(decode_plan(encoded, base), plan)
+
+    def test_delta_handles_shorter_lists_and_type_changes(self):
+        base = {"a": [1, 2, 3], "b": {"x": 1}, "c": 1}
+        new = {"a": [1, 5], "b": [1], "c": 1.5}
+        self.assertEqual(patch(base, diff(base, new)), new)
+        self.assertIsNone(diff(base, dict(base)))
+
+    def test_legacy_rows_are_returned_as_is(self):
+        plan = make_plan(2)
+        self.assertEqual(decode_plan({"plan_encoding": None, "plan_data": plan}), plan)
+
+    def test_delta_without_base_fails(self):
+        encoded = encode_plan(make_plan(30), make_plan(29))
+        with self.assertRaises(ValueError):
+            decode_plan(encoded)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+import app as app_module
+from db.catalog import catalog
+from db.client import get_fake_client
+from db.queries import DBQueries
+from logic.backlog import backlog_cache
+
+DENIERS = ["6000", "12000"]
+FIXTURES = {
+    "deniers": [{"id": f"d{d}", "name": d} for d in DENIERS],
+    "machine_denier_config": [
+        {"machine_id": m, "denier": d, "rpm": 8000, "torsiones_metro": 150, "husos": 100}
+        for m in ("T11", "T14") for d in DENIERS
+    ],
+    "rewinder_denier_config": [{"denier": d, "mp_segundos": 37.0, "tm_minutos": 4.0} for d in DENIERS],
+    "inventarios_cabuyas": [
+        {"codigo": f"RT{i:02d}", "descripcion": "CABUYA ECO 6x1K", "denier": 6000.0, "requerimientos": -200.0 - i,
+         "existencia": 0, "inventario_seguridad": 0, "estado": "AC", "prioridad": False}
+        for i in range(4)
+    ],
+    "orders": [],
+    "shifts": [],
+}
+
+class TestScheduleRoutes(unittest.TestCase):
+    """/api/generate_schedule conditional requests against the in-memory backend (SUPABASE_BACKEND=memory)"""
+
+    def setUp(self):
+        patcher = mock.patch("db.client.SUPABASE_BACKEND", "memory")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = get_fake_client()
+        self.client.tables.clear()
+        for table, rows in FIXTURES.items():
+            self.client.seed(table, rows)
+        catalog.invalidate()
+        backlog_cache.invalidate()
+        app_module._plan_cache.clear()
+        self.addCleanup(app_module._plan_cache.clear)
+
+        self.builds = mock.patch.object(app_module, "_build_schedule", wraps=app_module._build_schedule).start()
+        self.addCleanup(mock.patch.stopall)
+        self.http = app_module.app.test_client()
+        with self.http.session_transaction() as s:
+            s['authenticated'] = True
+
+    def generate(self, params=None, etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        return self.http.post('/api/generate_schedule', json=params or {}, headers=headers)
+
+    def test_if_none_match_returns_304_and_cache_serves_repeats(self):
+        first = self.generate()
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+        self.assertGreater(first.json["resumen_programa"]["total_kg"], 0)
+
+        not_modified = self.generate(etag=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers["ETag"], etag)
+        repeat = self.generate()
+        self.assertEqual((repeat.status_code, repeat.headers["ETag"]), (200, etag))
+        self.assertEqual(repeat.json, first.json)
+        self.assertEqual(self.builds.call_count, 1)
+
+    def test_input_change_yields_new_etag(self):
+        etag = self.generate().headers["ETag"]
+        DBQueries(client=self.client).update_cabuya_priority("RT01", True)
+        changed = self.generate(etag=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+        self.assertEqual(self.builds.call_count, 2)
+
+    def test_plan_cache_evicts_least_recently_used(self):
+        with mock.patch.object(app_module, "PLAN_CACHE_SIZE", 2):
+            etags = [self.generate({"strategy": s}).headers["ETag"].strip('"') for s in ("a", "b")]
+            self.generate({"strategy": "a"})  # touch "a": "b" is now the oldest
+            self.generate({"strategy": "c"})
+            self.assertEqual(len(app_module._plan_cache), 2)
+            self.assertIsNotNone(app_module._cached_plan(etags[0]))
+            self.assertIsNone(app_module._cached_plan(etags[1]))
+            self.assertEqual(self.builds.call_count, 3)
+            self.generate({"strategy": "b"})
+            self.assertEqual(self.builds.call_count, 4)
+
+if __name__ == '__main__':
+    unittest.main()
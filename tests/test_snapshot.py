@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from db.snapshot import export_snapshot, SnapshotQueries, ReadOnlySnapshotError
+
+class StubSource:
+    """Minimal live backend with the read methods export_snapshot uses"""
+    def get_deniers(self):
+        return [{"id": "d1", "name": "6000"}, {"id": "d2", "name": "6000 expo"}]
+
+    def get_machines_torsion(self):
+        return [{"id": "T11", "rpm": 8000}]
+
+    def get_orders(self):
+        return [{"id": "o1", "cabuya_codigo": "CAB2", "total_kg": 100, "deniers": {"name": "6000"}}]
+
+    def get_machine_denier_configs(self):
+        return [{"machine_id": "T11", "denier": "6000", "rpm": 8000, "torsiones_metro": 150, "husos": 100}]
+
+    def get_rewinder_denier_configs(self):
+        return [{"denier": "6000", "mp_segundos": 37.0, "tm_minutos": 4.0}]
+
+    def get_shifts(self):
+        return [{"date": "2024-01-02", "working_hours": 24}, {"date": "2024-01-01", "working_hours": 16}]
+
+    def iter_inventarios_cabuyas(self):
+        yield {"codigo": "CAB1", "denier": 6000.0, "descripcion": "CABUYA 6X1", "requerimientos": -50}
+        yield {"codigo": "CAB2", "denier": None, "descripcion": "CABUYA 6X1", "requerimientos": 10}
+
+    def get_pending_backlog(self):
+        return [{"codigo": "CAB1", "denier": "6000", "kg": 50, "origen": "Automatico"}]
+
+    def get_input_version(self):
+        return "v1"
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "snap.sqlite")
+        self.counts = export_snapshot(StubSource(), self.path)
+        self.db = SnapshotQueries(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_export_counts(self):
+        self.assertEqual(self.counts["inventarios_cabuyas"], 2)
+        self.assertEqual(self.counts["orders"], 1)
+
+    def test_reads_match_source(self):
+        self.assertEqual(self.db.get_orders()[0]["deniers"], {"name": "6000"})
+        self.assertEqual([s["date"] for s in self.db.get_shifts("2024-01-01")], ["2024-01-01", "2024-01-02"])
+        self.assertEqual([r["codigo"] for r in self.db.get_pending_requirements()], ["CAB1"])
+        self.assertEqual(self.db.get_deniers("name"), [{"name": "6000"}, {"name": "6000 expo"}])
+        self.assertEqual(self.db.get_input_version(), "snapshot:v1")
+
+    def test_scheduling_data_from_snapshot(self):
+        data = self.db.get_all_scheduling_data()
+        self.assertIn("6000", data["torsion_capacities"])
+        self.assertGreater(data["rewinder_capacities"]["6000"]["kg_per_hour"], 0)
+
+    def test_ping_uses_sqlite(self):
+        self.db.ping()
+
+    def test_writes_are_rejected(self):
+        with self.assertRaises(ReadOnlySnapshotError):
+            self.db.create_denier("9000", 37.0)
+
+if __name__ == '__main__':
+    unittest.main()
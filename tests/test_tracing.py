@@ -0,0 +1,47 @@
+import unittest
+from flask import Flask, Response, request, stream_with_context
+from db import tracing
+from db.fake_client import FakeSupabaseClient
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        tracing.reset_stats()
+        client = tracing.TracingClient(FakeSupabaseClient({"deniers": [{"id": 1, "name": "6000"}]}))
+        app = Flask(__name__)
+        app.before_request(tracing.start_request)
+
+        @app.after_request
+        def finish(response):
+            tracing.finish_response(request.endpoint, response)
+            return response
+
+        @app.route('/plain')
+        def plain():
+            client.table("deniers").select("id").execute()
+            return "ok"
+
+        @app.route('/stream')
+        def stream():
+            def events():
+                for _ in range(3):
+                    client.table("deniers").select("id").execute()
+                    yield "data: x\n\n"
+            return Response(stream_with_context(events()), mimetype='text/event-stream')
+
+        self.http = app.test_client()
+
+    def stats(self):
+        return {r["route"]: r for r in tracing.top_routes()}
+
+    def test_plain_request_is_traced(self):
+        self.http.get('/plain')
+        self.assertEqual(self.stats()["plain"]["max_calls"], 1)
+
+    def test_streamed_queries_are_traced_when_the_stream_ends(self):
+        response = self.http.get('/stream')
+        self.assertEqual(response.get_data(as_text=True).count("data:"), 3)
+        response.close()
+        self.assertEqual(self.stats()["stream"]["max_calls"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
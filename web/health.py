@@ -0,0 +1,166 @@
+"""
+Liveness and readiness endpoints backed by a background database probe.
+
+    GET /health/live    the process is up and serving (never touches the database)
+    GET /health/ready   last result of the background DB probe; 503 after a failure
+    GET /health         alias of /health/ready for existing uptime checks
+
+One daemon thread runs a trivial query every HEALTH_PROBE_INTERVAL seconds and the
+endpoints serve its last result. When there is no result yet, or it is older than
+HEALTH_PROBE_STALE (serverless instances freeze the thread between invocations),
+readiness runs one probe inline before answering. Probe latency and status are
+exported on /metrics.
+
+    HEALTH_PROBE_INTERVAL=15   seconds between probes
+    HEALTH_PROBE_STALE=60      readiness re-probes inline when the last probe is older than this
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Flask, jsonify
+
+from web import metrics
+
+HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", 15))
+HEALTH_PROBE_STALE = float(os.environ.get("HEALTH_PROBE_STALE", 60))
+
+HEALTH_ENDPOINTS = {"health", "health_live", "health_ready"}
+
+PROBE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+probe_latency = metrics.registry.register(metrics.Histogram(
+    "db_probe_duration_seconds", "Background database probe latency", ("result",), PROBE_BUCKETS))
+
+
+class DBProbe:
+    """Runs probe_fn() every `interval` seconds on a daemon thread and keeps the last result"""
+
+    def __init__(self, probe_fn: Callable[[], Any], interval: float = HEALTH_PROBE_INTERVAL,
+                 stale_after: float = HEALTH_PROBE_STALE):
+        self.probe_fn = probe_fn
+        self.interval = interval
+        self.stale_after = stale_after
+        self.ok: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def run_once(self) -> bool:
+        start = time.perf_counter()
+        try:
+            self.probe_fn()
+            ok, error = True, None
+        except Exception as e:
+            # Only the exception type and message: no tracebacks on an unauthenticated endpoint
+            ok, error = False, f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - start
+        probe_latency.observe(elapsed, "ok" if ok else "error")
+        with self._lock:
+            self.ok, self.error = ok, error
+            self.latency_ms = round(elapsed * 1000, 1)
+            self.checked_at = time.time()
+            self.failures = 0 if ok else self.failures + 1
+        return ok
+
+    def start(self) -> None:
+        """Start the probe thread once (lazily, so importing the app stays cheap)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="db-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def _fresh(self) -> bool:
+        with self._lock:
+            return self.checked_at is not None and time.time() - self.checked_at <= self.stale_after
+
+    def ensure_fresh(self) -> None:
+        """Probe inline when there is no result yet or the last one is stale"""
+        if self._fresh():
+            return
+        # Concurrent requests wait for a single probe instead of each running one
+        with self._refresh_lock:
+            if not self._fresh():
+                self.run_once()
+
+    def status(self) -> Tuple[bool, Dict[str, Any]]:
+        """(ready, details) from the last probe"""
+        with self._lock:
+            age = time.time() - self.checked_at if self.checked_at is not None else None
+            if self.ok is None:
+                state = "starting"
+            elif not self.ok:
+                state = "error"
+            elif age > self.stale_after:
+                state = "stale"
+            else:
+                state = "ok"
+            details = {
+                "status": state,
+                "database": {
+                    "ok": self.ok,
+                    "latency_ms": self.latency_ms,
+                    "checked_seconds_ago": round(age, 1) if age is not None else None,
+                    "consecutive_failures": self.failures,
+                },
+            }
+            if self.error:
+                details["database"]["error"] = self.error
+        return state == "ok", details
+
+    def gauge(self, field: str) -> Dict[Tuple[str, ...], float]:
+        """Scrape-time value for /metrics: up, age_seconds or consecutive_failures"""
+        with self._lock:
+            if self.checked_at is None:
+                return {}
+            value = {"up": 1.0 if self.ok else 0.0,
+                     "age_seconds": time.time() - self.checked_at,
+                     "consecutive_failures": float(self.failures)}[field]
+        return {(): value}
+
+
+def init_app(app: Flask, probe_fn: Callable[[], Any]) -> DBProbe:
+    """Register the health endpoints; the probe thread starts on the first request"""
+    probe = DBProbe(probe_fn)
+    for field, help in (("up", "1 if the last database probe succeeded"),
+                        ("age_seconds", "Seconds since the last database probe"),
+                        ("consecutive_failures", "Database probes failed in a row")):
+        metrics.registry.register(metrics.GaugeFunc(
+            f"db_probe_{field}", help, (), lambda field=field: probe.gauge(field)))
+
+    @app.before_request
+    def start_probe():
+        if probe._thread is None:
+            probe.start()
+
+    @app.route("/health/live", endpoint="health_live")
+    def live():
+        return jsonify({"status": "alive"})
+
+    @app.route("/health/ready", endpoint="health_ready")
+    @app.route("/health", endpoint="health")
+    def ready():
+        probe.ensure_fresh()
+        ok, details = probe.status()
+        response = jsonify(details)
+        response.status_code = 200 if ok else 503
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    return probe
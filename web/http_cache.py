@@ -0,0 +1,149 @@
+"""
+Response compression, ETags and cache headers.
+
+    COMPRESS_MIN_SIZE=1024   only compress bodies at least this large (bytes)
+    COMPRESS_LEVEL=6         gzip level (brotli uses quality 5)
+    STATIC_MAX_AGE=3600      max-age for unversioned static assets
+
+- GET JSON and HTML responses get a strong ETag (hash of the body) and answer
+  If-None-Match with 304. HTML is per-user, so it is marked private/no-cache
+  (always revalidated, never re-downloaded when unchanged).
+- Bodies are compressed with brotli (when the package is installed) or gzip,
+  following Accept-Encoding. Compressed variants carry the encoding in the ETag
+  ("<hash>-gzip") as required for strong validators.
+- url_for('static'/'style') appends ?v=<file hash>; versioned asset URLs are
+  served with a one-year immutable Cache-Control.
+"""
+import gzip
+import hashlib
+import os
+from typing import Dict, Tuple
+
+from flask import Flask, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 3600))
+IMMUTABLE_MAX_AGE = 31536000
+
+COMPRESSIBLE = {
+    "text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+    "application/json", "image/svg+xml",
+}
+ETAG_MIMETYPES = {"application/json", "text/html"}
+ASSET_ENDPOINTS = {"static", "style"}
+
+_asset_versions: Dict[str, Tuple[float, str]] = {}  # path -> (mtime, short hash)
+
+
+def _asset_version(path: str) -> str:
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return ""
+    cached = _asset_versions.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        version = hashlib.md5(f.read()).hexdigest()[:10]
+    _asset_versions[path] = (mtime, version)
+    return version
+
+
+def matching_etag(etag: str):
+    """The tag in If-None-Match naming `etag` or one of its compressed variants, or None"""
+    inm = request.if_none_match
+    for tag in (etag, f"{etag}-gzip", f"{etag}-br"):
+        if tag in inm:
+            return tag
+    return None
+
+
+def not_modified(response, etag: str):
+    """Bare 304 for `response` keeping the validator and cache headers"""
+    result = response.__class__(status=304)
+    result.set_etag(etag)
+    for header in ("Cache-Control", "Vary"):
+        if header in response.headers:
+            result.headers[header] = response.headers[header]
+    return result
+
+
+def _choose_encoding() -> str:
+    accept = request.accept_encodings
+    if brotli is not None and accept["br"]:
+        return "br"
+    if accept["gzip"]:
+        return "gzip"
+    return ""
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def finalize_response(response):
+    """after_request hook: cache headers, strong ETags/304 and compression"""
+    if (request.endpoint or "") in ASSET_ENDPOINTS:
+        if request.args.get("v"):
+            response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+        if response.status_code == 200:
+            # send_file streams from disk; load it so the body can be compressed
+            response.direct_passthrough = False
+            response.get_data()
+    if response.is_streamed:
+        return response
+    if response.status_code != 200 or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+
+    if request.method in ("GET", "HEAD"):
+        if response.mimetype == "text/html":
+            response.headers.setdefault("Cache-Control", "private, no-cache")
+        if response.mimetype in ETAG_MIMETYPES and not response.get_etag()[0]:
+            response.set_etag(hashlib.sha256(response.get_data()).hexdigest()[:32])
+        etag = response.get_etag()[0]
+        matched = matching_etag(etag) if etag else None
+        if matched:
+            return not_modified(response, matched)
+
+    if response.mimetype not in COMPRESSIBLE:
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    encoding = _choose_encoding()
+    if len(data) < COMPRESS_MIN_SIZE or not encoding:
+        return response
+    response.set_data(_compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+
+def init_app(app: Flask, style_folder: str = None) -> None:
+    """Register compression/caching on `app` and serve style/ at /style/"""
+    style_folder = style_folder or os.path.join(app.root_path, "style")
+
+    @app.route("/style/<path:filename>", endpoint="style")
+    def style(filename):
+        return send_from_directory(style_folder, filename)
+
+    @app.url_defaults
+    def version_assets(endpoint, values):
+        if endpoint in ASSET_ENDPOINTS and "filename" in values and "v" not in values:
+            folder = app.static_folder if endpoint == "static" else style_folder
+            version = _asset_version(os.path.join(folder, values["filename"]))
+            if version:
+                values["v"] = version
+
+    app.after_request(finalize_response)
@@ -0,0 +1,292 @@
+"""
+Runtime metrics in the Prometheus text format (GET /metrics).
+
+Counters, gauges and histograms keep one shard per thread, so recording a value
+never takes a lock: each thread only writes its own dict and the scrape sums the
+shards. When a thread exits its shard is folded into a retired total, so servers
+that spawn a thread per request do not grow without bound.
+
+    METRICS_TOKEN=<token>   also accept 'Authorization: Bearer <token>' (scrapers);
+                            otherwise /metrics requires a logged-in session
+
+Metrics recorded by the app:
+
+    http_request_duration_seconds{endpoint,method,status}   histogram
+    http_requests_in_flight{endpoint}                       gauge
+    supabase_calls_total{table,operation}                   counter
+    supabase_call_duration_seconds{table,operation}         histogram
+    schedule_generation_seconds{backlog_size}               histogram
+    planner_kg_per_shift                                    histogram
+    cache_requests_total{cache,result}                      counter
+    cache_hit_ratio{cache}                                  gauge (at scrape)
+"""
+import hmac
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SCHEDULE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+KG_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 3000, 5000)
+
+# Backlog size buckets for schedule durations (number of references)
+BACKLOG_SIZE_BUCKETS = ((50, "0-49"), (200, "50-199"), (1000, "200-999"))
+
+
+def backlog_size_label(n: int) -> str:
+    for limit, label in BACKLOG_SIZE_BUCKETS:
+        if n < limit:
+            return label
+    return "1000+"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Shard:
+    """Per-thread values of one metric; folded into the retired total on thread exit"""
+    __slots__ = ("values", "metric")
+
+    def __init__(self, metric: "_Metric"):
+        self.values: Dict[Tuple[str, ...], object] = {}
+        self.metric = metric
+
+    def __del__(self):
+        self.metric._retire(self)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live: Dict[int, Dict] = {}
+        self._retired: Dict[Tuple[str, ...], object] = {}
+
+    def _values(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(self)
+            with self._lock:
+                self._live[id(shard)] = shard.values
+            self._local.shard = shard
+        return shard.values
+
+    def _retire(self, shard: _Shard) -> None:
+        with self._lock:
+            self._live.pop(id(shard), None)
+            for key, value in shard.values.items():
+                self._retired[key] = self._merge(self._retired.get(key), value)
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def collect(self) -> Dict[Tuple[str, ...], object]:
+        """Sum of all shards (live and retired) per label tuple"""
+        with self._lock:
+            shards = [dict(values) for values in self._live.values()]
+            totals = dict(self._retired)
+        for values in shards:
+            for key, value in values.items():
+                totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Up/down gauge (e.g. in-flight requests): inc and dec from any thread, summed at scrape"""
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class GaugeFunc(_Metric):
+    """Gauge computed at scrape time: fn() -> {label tuple: value}"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], fn: Callable[[], Dict[Tuple[str, ...], float]]):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def collect(self):
+        return self.fn()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        values = self._values()
+        state = values.get(labels)
+        if state is None:
+            # Non-cumulative bucket counts (+Inf last), then sum and count
+            state = values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        state[i] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def _merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for key, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state):
+                cumulative += count
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(state[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint", ("endpoint", "method", "status")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being served", ("endpoint",)))
+supabase_calls = registry.register(Counter(
+    "supabase_calls_total", "Supabase queries executed", ("table", "operation")))
+supabase_latency = registry.register(Histogram(
+    "supabase_call_duration_seconds", "Supabase query latency", ("table", "operation")))
+schedule_duration = registry.register(Histogram(
+    "schedule_generation_seconds", "Schedule generation time by backlog size (references)",
+    ("backlog_size",), SCHEDULE_BUCKETS))
+planner_kg_per_shift = registry.register(Histogram(
+    "planner_kg_per_shift", "Planned torsion kg per shift in generated schedules", (), KG_BUCKETS))
+cache_requests = registry.register(Counter(
+    "cache_requests_total", "Cache lookups by result (hit/miss)", ("cache", "result")))
+
+# Extra scrape-time sources of cache hit ratios: name -> fn() -> (hits, misses)
+cache_sources: Dict[str, Callable[[], Tuple[float, float]]] = {}
+
+
+def _cache_ratios() -> Dict[Tuple[str, ...], float]:
+    counts: Dict[str, List[float]] = {}
+    for (cache, result), n in cache_requests.collect().items():
+        counts.setdefault(cache, [0, 0])[0 if result == "hit" else 1] += n
+    for cache, fn in cache_sources.items():
+        hits, misses = fn()
+        counts[cache] = [hits, misses]
+    return {(cache, ): hits / (hits + misses) for cache, (hits, misses) in counts.items() if hits + misses}
+
+
+registry.register(GaugeFunc("cache_hit_ratio", "Cache hit ratio since start", ("cache",), _cache_ratios))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache, "hit" if hit else "miss")
+
+
+def record_schedule(seconds: float, backlog_refs: int, result: Dict) -> None:
+    schedule_duration.observe(seconds, backlog_size_label(backlog_refs))
+    for turn in result.get("tabla_turnos") or []:
+        planner_kg_per_shift.observe(turn.get("total_kg") or 0)
+
+
+def _record_db_call(call) -> None:
+    supabase_calls.inc(call.table, call.operation)
+    supabase_latency.observe(call.latency_ms / 1000, call.table, call.operation)
+
+
+def init_app(app: Flask, token: str = None, is_authenticated: Callable[[], bool] = None) -> None:
+    """Time every request, count Supabase calls and serve GET /metrics"""
+    from db import tracing
+    tracing.call_listeners.append(_record_db_call)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_endpoint = request.endpoint or "unknown"
+        http_in_flight.inc(g.metrics_endpoint)
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            http_latency.observe(time.perf_counter() - start, g.metrics_endpoint, request.method, str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def end_request(exc=None):
+        endpoint = g.pop("metrics_endpoint", None)
+        if endpoint is not None:
+            http_in_flight.dec(endpoint)
+
+    @app.route("/metrics", endpoint="metrics")
+    def metrics():
+        bearer = request.headers.get("Authorization", "")
+        # Constant-time comparison: response timing must not leak the token
+        authorized = ((token and hmac.compare_digest(bearer.encode(), f"Bearer {token}".encode()))
+                      or (is_authenticated and is_authenticated()))
+        if not authorized:
+            return Response("unauthorized\n", status=401, mimetype="text/plain",
+                            headers={"WWW-Authenticate": "Bearer"})
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")